@@ -0,0 +1,71 @@
+"""
+Rows/sec for the Transaction construction paths.
+
+- model_validate per row: the old path (json.loads + one model_validate per dict)
+- TRANSACTIONS_ADAPTER.validate_json: the current path (one pydantic-core pass over the raw bytes)
+- model_construct: unvalidated construction, kept for reference
+
+Run from the project root:
+    python -m benchmarks.bench_transaction_construct [rows]
+"""
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from src.schemas import TRANSACTIONS_ADAPTER, Merchant, Transaction
+
+_DATA_FILE = Path(__file__).resolve().parents[1] / "data/txns_A123.json"
+
+
+def _load_rows(n: int) -> List[Dict[str, Any]]:
+    with open(_DATA_FILE, "r") as f:
+        base = json.load(f)
+    return [base[i % len(base)] for i in range(n)]
+
+
+def _per_row_validate(raw: bytes) -> List[Transaction]:
+    return [Transaction.model_validate(x) for x in json.loads(raw)]
+
+
+def _batch_validate_json(raw: bytes) -> List[Transaction]:
+    return TRANSACTIONS_ADAPTER.validate_json(raw)
+
+
+def _construct(raw: bytes) -> List[Transaction]:
+    out: List[Transaction] = []
+    for x in json.loads(raw):
+        x = dict(x)
+        x["postedAt"] = datetime.fromisoformat(x["postedAt"])
+        x["merchant"] = Merchant.model_construct(**x["merchant"])
+        out.append(Transaction.model_construct(**x))
+    return out
+
+
+def _rows_per_sec(build: Callable[[bytes], List[Transaction]], raw: bytes, n: int, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        build(raw)
+        best = min(best, time.perf_counter() - t0)
+    return n / best
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    raw = json.dumps(_load_rows(n)).encode()
+
+    # Sanity check: the paths must agree
+    assert _batch_validate_json(raw)[:100] == _per_row_validate(raw)[:100]
+
+    rates = [
+        ("model_validate per row", _rows_per_sec(_per_row_validate, raw, n)),
+        ("adapter validate_json", _rows_per_sec(_batch_validate_json, raw, n)),
+        ("model_construct", _rows_per_sec(_construct, raw, n)),
+    ]
+    baseline = rates[0][1]
+    print(f"rows: {n}")
+    for name, rate in rates:
+        print(f"{name:<24} {rate:>12,.0f} rows/sec ({rate / baseline:.2f}x)")
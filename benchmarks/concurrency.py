@@ -0,0 +1,92 @@
+"""
+Latency of small requests while large ones are being computed, with the compute
+handlers on the event loop vs in the compute thread pool (COMPUTE_OFFLOAD_MIN_ROWS).
+
+For each setting the API is started against a generated dataset; `--large` clients
+keep asking for 5000 transactions over 5 years (served from the fetch cache after
+the first call, so the handler is the work), while `--concurrency` clients send
+/health and a 30-day /chat and record their latency.
+
+    python -m benchmarks.concurrency --rows 20000 --large 2 --requests 300 [--offload-rows 0 1000]
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.datagen import account_ids, ensure_dataset
+from benchmarks.load import servers
+from benchmarks.report import print_table, summarize
+
+LARGE_MESSAGE = "show me 5000 transactions from the last 5 years"
+SMALL_MESSAGE = "show me my transactions for the last 30 days"
+
+
+async def run(base: str, accounts: List[str], requests: int, concurrency: int, large: int) -> Dict[str, Dict[str, float]]:
+    big, small = accounts
+    async with httpx.AsyncClient(base_url=base, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency + large)) as client:
+        # Fill the fetch cache and the store indexes first
+        await client.post("/chat", json={"accountId": big, "message": LARGE_MESSAGE})
+        await client.post("/chat", json={"accountId": small, "message": SMALL_MESSAGE})
+
+        done = False
+        large_latencies: List[float] = []
+
+        async def large_client() -> None:
+            while not done:
+                t0 = time.perf_counter()
+                await client.post("/chat", json={"accountId": big, "message": LARGE_MESSAGE})
+                large_latencies.append(time.perf_counter() - t0)
+
+        async def small_clients(method: str, path: str, **kwargs: object) -> Dict[str, float]:
+            latencies: List[float] = []
+            remaining = requests
+
+            async def worker() -> None:
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    t0 = time.perf_counter()
+                    r = await client.request(method, path, **kwargs)  # type: ignore[arg-type]
+                    r.raise_for_status()
+                    latencies.append(time.perf_counter() - t0)
+
+            wall0 = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return summarize(latencies, time.perf_counter() - wall0)
+
+        bg_t0 = time.perf_counter()
+        background = [asyncio.ensure_future(large_client()) for _ in range(large)]
+        await asyncio.sleep(0.5)
+        results = {
+            "health": await small_clients("GET", "/health"),
+            "chat 30d": await small_clients("POST", "/chat", json={"accountId": small, "message": SMALL_MESSAGE}),
+        }
+        done = True
+        await asyncio.gather(*background)
+        results["chat 5000 rows (background)"] = summarize(large_latencies, time.perf_counter() - bg_t0)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="rows per account")
+    parser.add_argument("--requests", type=int, default=300, help="small requests per case")
+    parser.add_argument("--concurrency", type=int, default=4, help="small-request clients")
+    parser.add_argument("--large", type=int, default=2, help="clients sending large requests meanwhile")
+    parser.add_argument("--offload-rows", type=int, nargs="*", default=[0, 1000],
+                        help="COMPUTE_OFFLOAD_MIN_ROWS values to compare (0 = handlers on the event loop)")
+    args = parser.parse_args()
+
+    data_dir = ensure_dataset(2, args.rows)
+    os.environ["WARMUP_ACCOUNTS"] = ",".join(account_ids(2))
+    for offload_rows in args.offload_rows:
+        os.environ["COMPUTE_OFFLOAD_MIN_ROWS"] = str(offload_rows)
+        with servers(data_dir) as base_url:
+            results = asyncio.run(run(base_url, account_ids(2), args.requests, args.concurrency, args.large))
+        label = "inline" if offload_rows <= 0 else f"offload >= {offload_rows} rows"
+        print_table(f"concurrency ({label})", results)
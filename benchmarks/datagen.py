@@ -0,0 +1,136 @@
+"""
+Synthetic transaction generator that scales the data/txns_A123.json schema to
+N accounts x M rows.
+
+Each account gets the same kind of mix as the sample file: payroll every two
+weeks, monthly rent / utilities / subscriptions, a yearly membership, and
+discretionary card spend (groceries, rideshare, coffee, shopping) drawn with
+realistic weights. Output is deterministic for a given seed.
+
+    python -m benchmarks.datagen --accounts 10 --rows 5000 --out benchmarks/.data/10x5000
+"""
+import argparse
+import json
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# (name, category, subcategory, descriptions, rail, direction, (min, max) amount)
+Merchant = Tuple[str, str, str, List[str], str, str, Tuple[float, float]]
+
+# Recurring: merchant + cadence in days
+_RECURRING: List[Tuple[Merchant, int]] = [
+    (("Payroll", "Income", "Salary", ["Payroll Deposit"], "ACH", "credit", (2450.0, 2450.0)), 14),
+    (("Main Street Apartments", "Housing", "Rent", ["Monthly Rent"], "ACH", "debit", (1950.0, 1950.0)), 30),
+    (("Verizon Fios", "Utilities", "Internet", ["Verizon Fios Internet"], "ACH", "debit", (79.99, 79.99)), 30),
+    (("PECO", "Utilities", "Electric", ["PECO Electric Bill"], "ACH", "debit", (62.0, 148.0)), 30),
+    (("Netflix", "Subscriptions", "Streaming", ["Netflix.com"], "Card", "debit", (15.49, 15.49)), 30),
+    (("Spotify", "Subscriptions", "Music", ["Spotify Premium"], "Card", "debit", (10.99, 10.99)), 30),
+    (("State Farm", "Insurance", "Auto", ["State Farm Insurance"], "ACH", "debit", (412.0, 412.0)), 91),
+    (("Costco", "Shopping", "Membership", ["Costco Annual Membership"], "Card", "debit", (65.0, 65.0)), 365),
+]
+
+# Discretionary: merchant + relative weight
+_DISCRETIONARY: List[Tuple[Merchant, int]] = [
+    (("Whole Foods", "Groceries", "Supermarket", ["Whole Foods Market"], "Card", "debit", (18.0, 160.0)), 20),
+    (("Uber", "Transport", "Rideshare", ["Uber Trip"], "Card", "debit", (8.0, 48.0)), 14),
+    (("Starbucks", "Food", "Coffee", ["Starbucks"], "Card", "debit", (3.5, 12.0)), 12),
+    (("La Colombe Coffee", "Food", "Coffee", ["La Colombe"], "Card", "debit", (3.5, 9.0)), 6),
+    (("Amazon", "Shopping", "Online Retail", ["Amazon.com", "AMZN Mktp US", "AMZN Digital", "Amazon Marketplace"], "Card", "debit", (9.0, 240.0)), 10),
+    (("Sweetgreen", "Food", "Restaurant", ["Sweetgreen"], "Card", "debit", (11.0, 19.0)), 6),
+    (("Federal Donuts", "Food", "Fast Food", ["Federal Donuts"], "Card", "debit", (5.0, 16.0)), 4),
+    (("CVS Pharmacy", "Health", "Pharmacy", ["CVS Pharmacy"], "Card", "debit", (6.0, 70.0)), 5),
+    (("Shell", "Transport", "Fuel", ["Shell Oil"], "Card", "debit", (28.0, 72.0)), 6),
+    (("Target", "Shopping", "Department Store", ["Target T-1234"], "Card", "debit", (12.0, 180.0)), 6),
+    (("ATM Withdrawal", "Cash", "ATM", ["ATM Cash Withdrawal"], "ATM", "debit", (20.0, 200.0)), 3),
+    (("Venmo Transfer", "Transfers", "P2P", ["Zelle to friend"], "Zelle", "debit", (10.0, 150.0)), 3),
+]
+
+
+def _row(rng: random.Random, account_id: str, seq: int, m: Merchant, when: datetime, card: str,
+         pending: bool) -> Dict[str, Any]:
+    name, category, subcategory, descriptions, rail, direction, (lo, hi) = m
+    amount = round(lo if lo == hi else rng.uniform(lo, hi), 2)
+    return {
+        "id": f"t{seq:03d}",
+        "accountId": account_id,
+        "postedAt": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "direction": direction,
+        "amount": amount,
+        "signedAmount": -amount if direction == "debit" else amount,
+        "merchant": {"name": name, "category": category, "subcategory": subcategory},
+        "description": rng.choice(descriptions),
+        "isPending": pending,
+        "paymentRail": rail,
+        "cardLast4": card if rail == "Card" else None,
+    }
+
+
+def generate_account(account_id: str, rows: int, seed: int = 0, end: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    ~rows transactions ending at `end` (default: today). The history span grows
+    with `rows` so recurring cadences stay realistic (about 3 rows/day).
+    """
+    rng = random.Random(f"{seed}:{account_id}")
+    end = end or date.today()
+    span_days = max(30, rows // 3)
+    start = end - timedelta(days=span_days)
+    card = f"{rng.randint(0, 9999):04d}"
+
+    events: List[Tuple[datetime, Merchant]] = []
+    for m, every in _RECURRING:
+        d = start + timedelta(days=rng.randint(0, every - 1))
+        while d <= end:
+            events.append((datetime.combine(d, time(rng.randint(5, 9), rng.randint(0, 59)), timezone.utc), m))
+            d += timedelta(days=every)
+
+    weights = [w for _, w in _DISCRETIONARY]
+    for _ in range(max(0, rows - len(events))):
+        m = rng.choices(_DISCRETIONARY, weights=weights)[0][0]
+        d = start + timedelta(days=rng.randint(0, span_days))
+        events.append((datetime.combine(d, time(rng.randint(7, 22), rng.randint(0, 59)), timezone.utc), m))
+
+    events = sorted(events, key=lambda e: e[0])[-rows:]
+    out: List[Dict[str, Any]] = []
+    pending_cutoff = datetime.combine(end - timedelta(days=2), time(0), timezone.utc)
+    for seq, (when, m) in enumerate(events, start=1):
+        pending = when >= pending_cutoff and m[4] == "Card"
+        out.append(_row(rng, account_id, seq, m, when, card, pending))
+    return out
+
+
+def account_ids(accounts: int) -> List[str]:
+    return [f"B{i:04d}" for i in range(1, accounts + 1)]
+
+
+def write_dataset(out_dir: Path, accounts: int, rows: int, seed: int = 0) -> List[str]:
+    """Write txns_<id>.json for each account into out_dir; returns the account ids."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ids = account_ids(accounts)
+    for account_id in ids:
+        with open(out_dir / f"txns_{account_id}.json", "w") as f:
+            json.dump(generate_account(account_id, rows, seed=seed), f)
+    return ids
+
+
+def ensure_dataset(accounts: int, rows: int, seed: int = 0) -> Path:
+    """Cached dataset under benchmarks/.data/<accounts>x<rows>-s<seed> (regenerated daily so ranges hit data)."""
+    out_dir = Path(__file__).resolve().parent / ".data" / f"{accounts}x{rows}-s{seed}"
+    stamp = out_dir / ".generated"
+    today = date.today().isoformat()
+    if not stamp.exists() or stamp.read_text() != today:
+        write_dataset(out_dir, accounts, rows, seed=seed)
+        stamp.write_text(today)
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=1000, help="rows per account")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=Path("benchmarks/.data/custom"))
+    args = parser.parse_args()
+    ids = write_dataset(args.out, args.accounts, args.rows, seed=args.seed)
+    print(f"wrote {len(ids)} accounts x {args.rows} rows to {args.out}")
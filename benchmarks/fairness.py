@@ -0,0 +1,113 @@
+"""
+Isolation between accounts: latency of light accounts while one heavy account bursts,
+with the pipeline stages in arrival order vs fair queuing (SCHEDULER_FAIR), and with
+the per-account rate limit (ACCOUNT_RATE_PER_S) on top.
+
+For each mode the API is started against a generated dataset with QuerySpec reuse off,
+so every message goes through the (fake) LLM. `--heavy` clients on one account keep
+asking YTD and 5-year questions; one client per `--light` account sends 30-day
+questions. Every message gets a distinct suffix so that no two share an LLM call. A 429
+is counted, and the client waits its Retry-After before going on.
+
+    python -m benchmarks.fairness --rows 20000 --heavy 16 --light 3 --seconds 15 [--modes fifo fair limited]
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.datagen import account_ids, ensure_dataset
+from benchmarks.load import servers
+from benchmarks.report import print_table, summarize
+
+HEAVY_MESSAGES = (
+    "what are my top spendings this year?",
+    "show me 5000 transactions from the last 5 years",
+)
+LIGHT_MESSAGE = "show me my transactions for the last 30 days"
+
+# mode -> (SCHEDULER_FAIR, rate limit on)
+MODES = {"fifo": ("false", False), "fair": ("true", False), "limited": ("true", True)}
+
+
+def _tag(n: int) -> str:
+    """n in letters ("ba"): digits would be parsed as a count or a date."""
+    out = ""
+    while True:
+        n, r = divmod(n, 26)
+        out = chr(ord("a") + r) + out
+        if n == 0:
+            return out
+
+
+async def run(base: str, accounts: List[str], heavy: int, seconds: float) -> Dict[str, Dict[str, float]]:
+    big, small = accounts[0], accounts[1:]
+    async with httpx.AsyncClient(base_url=base, timeout=60,
+                                 limits=httpx.Limits(max_connections=heavy + len(small))) as client:
+        deadline = time.perf_counter() + seconds
+        latencies: Dict[str, List[float]] = {"heavy": [], "light": []}
+        throttled = {"heavy": 0, "light": 0}
+
+        sent = 0
+
+        async def user(kind: str, account_id: str, messages: tuple) -> None:
+            nonlocal sent
+            while time.perf_counter() < deadline:
+                message = f"{messages[sent % len(messages)]} ref {_tag(sent)}"
+                sent += 1
+                t0 = time.perf_counter()
+                r = await client.post("/chat", json={"accountId": account_id, "message": message})
+                if r.status_code == 429:
+                    throttled[kind] += 1
+                    await asyncio.sleep(float(r.headers.get("Retry-After", "1")))
+                    continue
+                r.raise_for_status()
+                latencies[kind].append(time.perf_counter() - t0)
+
+        wall0 = time.perf_counter()
+        await asyncio.gather(
+            *(user("heavy", big, HEAVY_MESSAGES) for _ in range(heavy)),
+            *(user("light", a, (LIGHT_MESSAGE,)) for a in small),
+        )
+        wall = time.perf_counter() - wall0
+
+    results = {}
+    for kind in ("light", "heavy"):
+        results[f"chat {kind}"] = summarize(latencies[kind], wall)
+        results[f"chat {kind}"]["429s"] = float(throttled[kind])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="rows per account")
+    parser.add_argument("--heavy", type=int, default=16, help="concurrent clients of the heavy account")
+    parser.add_argument("--light", type=int, default=3, help="light accounts, one client each")
+    parser.add_argument("--seconds", type=float, default=15, help="duration per mode")
+    parser.add_argument("--llm-latency", default="fixed:200", help="fake Ollama latency spec")
+    parser.add_argument("--rate", type=float, default=4, help="ACCOUNT_RATE_PER_S in the 'limited' mode")
+    parser.add_argument("--burst", type=float, default=8, help="ACCOUNT_BURST in the 'limited' mode")
+    parser.add_argument("--modes", nargs="*", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    accounts = account_ids(1 + args.light)
+    data_dir = ensure_dataset(len(accounts), args.rows)
+    os.environ.update({
+        "WARMUP_ACCOUNTS": ",".join(accounts),
+        "SPEC_CACHE_SIZE": "0",
+        # Room for the whole burst in the LLM queue: what is measured is the order it is served in
+        "LLM_MAX_QUEUE": str(args.heavy + args.light),
+        "ACCOUNT_BURST": str(args.burst),
+    })
+    for mode in args.modes:
+        fair, limited = MODES[mode]
+        os.environ["SCHEDULER_FAIR"] = fair
+        os.environ["ACCOUNT_RATE_PER_S"] = str(args.rate) if limited else "0"
+        with servers(data_dir, args.llm_latency) as base_url:
+            results = asyncio.run(run(base_url, accounts, args.heavy, args.seconds))
+        label = {"fifo": "arrival order", "fair": "fair queuing"}.get(mode, f"fair queuing, {args.rate:g}/s per account")
+        print_table(f"fairness ({label})", results)
+        print("429s: " + ", ".join(f"{case} {m['429s']:.0f}" for case, m in results.items()))
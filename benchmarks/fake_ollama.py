@@ -0,0 +1,178 @@
+"""
+Deterministic local stand-in for Ollama.
+
+Answers POST /v1/chat/completions (OpenAI shape) and POST /api/chat (Ollama
+shape), non-streaming or streaming ("stream": true -> SSE / NDJSON chunks).
+
+Content comes from a recording made with LLM_RECORD_FILE (see
+src/llm_recorder.py) when --replay is given; messages that were never recorded
+(or all messages, without --replay) get the QuerySpec the rules compiler would
+produce, wrapped the way the real model answers.
+
+Latency is drawn from a seeded distribution, so a run is reproducible:
+    fixed:MS | uniform:LO,HI | normal:MEAN,STD | lognormal:MEDIAN,SIGMA | replay
+
+    python -m benchmarks.fake_ollama --port 11435 --latency lognormal:400,0.5 --replay llm.jsonl
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from src.llm_recorder import load_recording, normalize_message, prompt_sha
+
+app = FastAPI(title="fake-ollama")
+
+
+class ReplayState:
+    def __init__(self) -> None:
+        self.exchanges: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self.by_message: Dict[str, List[Dict[str, Any]]] = {}
+        self.match_prompt = True
+        self.on_miss = "rules"
+        self.latency = "fixed:0"
+        self.seed = 0
+        self.ttft_share = 0.6
+        self.chunk_chars = 4
+        self.seen: Counter = Counter()  # occurrences per message -> deterministic per-request RNG / round-robin
+
+    def load(self, path: Path) -> None:
+        _, self.exchanges = load_recording(path)
+        for (_, msg), recs in self.exchanges.items():
+            self.by_message.setdefault(msg, []).extend(recs)
+
+
+STATE = ReplayState()
+
+
+def _sampler(spec: str) -> Callable[[random.Random, Optional[float]], float]:
+    """Parse a latency spec into f(rng, recorded_ms) -> seconds."""
+    kind, _, args = spec.partition(":")
+    nums = [float(x) for x in args.split(",") if x]
+    if kind == "fixed":
+        return lambda rng, rec: nums[0] / 1000
+    if kind == "uniform":
+        return lambda rng, rec: rng.uniform(nums[0], nums[1]) / 1000
+    if kind == "normal":
+        return lambda rng, rec: max(0.0, rng.gauss(nums[0], nums[1])) / 1000
+    if kind == "lognormal":
+        return lambda rng, rec: rng.lognormvariate(math.log(nums[0]), nums[1]) / 1000
+    if kind == "replay":
+        return lambda rng, rec: (rec or 0.0) / 1000
+    raise ValueError(f"unknown latency spec: {spec}")
+
+
+def _rules_answer(user: str) -> str:
+    from src.query_spec_builder import _compile_rules
+
+    spec = _compile_rules(user, None).model_dump(exclude={"is_banking_domain"})
+    return json.dumps({"is_banking_domain": True, "clarification_needed": False, "query": spec})
+
+
+def _resolve(payload: Dict[str, Any]) -> Tuple[str, float]:
+    """Pick (content, latency seconds) for a request, deterministically."""
+    messages = payload.get("messages", [])
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    key = normalize_message(user)
+    n = STATE.seen[key]
+    STATE.seen[key] += 1
+    rng = random.Random(f"{STATE.seed}:{key}:{n}")
+
+    if STATE.match_prompt:
+        recs = STATE.exchanges.get((prompt_sha(system), key))
+    else:
+        recs = STATE.by_message.get(key)
+    if recs:
+        rec = recs[n % len(recs)]
+        return rec["content"], _sampler(STATE.latency)(rng, rec.get("latency_ms"))
+    if STATE.on_miss == "error":
+        raise HTTPException(status_code=404, detail=f"no recording for message: {user!r}")
+    return _rules_answer(user), _sampler(STATE.latency)(rng, None)
+
+
+async def _chunks(content: str, latency_s: float) -> AsyncIterator[Tuple[str, bool]]:
+    """Yield (piece, is_last): first piece after ttft, the rest spread over the remaining time."""
+    pieces = [content[i:i + STATE.chunk_chars] for i in range(0, len(content), STATE.chunk_chars)] or [""]
+    await asyncio.sleep(latency_s * STATE.ttft_share)
+    gap = latency_s * (1 - STATE.ttft_share) / max(1, len(pieces) - 1)
+    for i, piece in enumerate(pieces):
+        if i:
+            await asyncio.sleep(gap)
+        yield piece, i == len(pieces) - 1
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request) -> Any:
+    payload = await request.json()
+    content, latency_s = _resolve(payload)
+    model = payload.get("model")
+    created = int(time.time())
+
+    if payload.get("stream"):
+        async def sse() -> AsyncIterator[str]:
+            async for piece, last in _chunks(content, latency_s):
+                chunk = {"object": "chat.completion.chunk", "model": model, "created": created,
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": "stop" if last else None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    await asyncio.sleep(latency_s)
+    return {
+        "object": "chat.completion",
+        "model": model,
+        "created": created,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+    }
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request) -> Any:
+    payload = await request.json()
+    content, latency_s = _resolve(payload)
+    model = payload.get("model")
+
+    # Ollama streams by default
+    if payload.get("stream", True):
+        async def ndjson() -> AsyncIterator[str]:
+            async for piece, _ in _chunks(content, latency_s):
+                yield json.dumps({"model": model, "message": {"role": "assistant", "content": piece}, "done": False}) + "\n"
+            yield json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    await asyncio.sleep(latency_s)
+    return {"model": model, "message": {"role": "assistant", "content": content}, "done": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", default="fixed:0", help="latency distribution spec (see above)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", type=Path, help="JSONL recording from LLM_RECORD_FILE")
+    parser.add_argument("--match", choices=["prompt+message", "message"], default="prompt+message",
+                        help="match recordings on system prompt hash + message, or message only")
+    parser.add_argument("--on-miss", choices=["rules", "error"], default="rules")
+    parser.add_argument("--ttft-share", type=float, default=0.6, help="share of latency before the first streamed chunk")
+    args = parser.parse_args()
+
+    _sampler(args.latency)  # fail fast on a bad spec
+    if args.replay:
+        STATE.load(args.replay)
+    STATE.match_prompt = args.match == "prompt+message"
+    STATE.on_miss = args.on_miss
+    STATE.latency = args.latency
+    STATE.seed = args.seed
+    STATE.ttft_share = args.ttft_share
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,169 @@
+"""
+End-to-end async load driver for /chat and /tool/transactions.
+
+Starts the API (uvicorn src.app:app) and benchmarks/fake_ollama.py as
+subprocesses on free local ports, pointed at a generated dataset, then fires
+requests at a fixed concurrency and reports p50/p95/p99 and RPS per case.
+
+    python -m benchmarks.load --accounts 20 --rows 2000 --requests 400 --concurrency 16 [--llm-latency lognormal:400,0.5] [--save-baseline]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.datagen import account_ids, ensure_dataset
+from benchmarks.micro import RULES_MESSAGES
+from benchmarks.report import compare_to_baseline, print_table, save_baseline, summarize
+
+_ROOT = Path(__file__).resolve().parents[1]
+
+# (method, path, kwargs) for one request
+RequestFactory = Callable[[random.Random], Tuple[str, str, Dict[str, Any]]]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+@contextmanager
+def servers(data_dir: Path, llm_latency: str = "fixed:0", llm_replay: Optional[Path] = None) -> Iterator[str]:
+    """Run fake Ollama + the API; yields the API base URL."""
+    llm_port, api_port = _free_port(), _free_port()
+    base = f"http://127.0.0.1:{api_port}"
+    env = {
+        **os.environ,
+        "DATA_DIR": str(data_dir),
+        "TOOL_BASE_URL": base,
+        "OLLAMA_URL": f"http://127.0.0.1:{llm_port}/v1/chat/completions",
+        "LOG_LEVEL": "WARNING",
+        # Throughput runs measure the pipeline, not admission: no per-account limit unless set
+        "ACCOUNT_RATE_PER_S": os.environ.get("ACCOUNT_RATE_PER_S", "0"),
+    }
+    llm_cmd = [sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(llm_port), "--latency", llm_latency]
+    if llm_replay:
+        llm_cmd += ["--replay", str(llm_replay)]
+    procs = [
+        subprocess.Popen(llm_cmd, cwd=_ROOT, env=env),
+        subprocess.Popen([sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(api_port),
+                          "--log-level", "warning"], cwd=_ROOT, env=env),
+    ]
+    try:
+        _wait_ready(f"http://127.0.0.1:{llm_port}/docs")
+        _wait_ready(f"{base}/ready")
+        yield base
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+
+
+def _cases(accounts: List[str]) -> Dict[str, RequestFactory]:
+    today = date.today()
+
+    def chat(rng: random.Random) -> Tuple[str, str, Dict[str, Any]]:
+        return "POST", "/chat", {"json": {"accountId": rng.choice(accounts), "message": rng.choice(RULES_MESSAGES)}}
+
+    def tool(days: int, limit: int) -> RequestFactory:
+        def make(rng: random.Random) -> Tuple[str, str, Dict[str, Any]]:
+            return "GET", "/tool/transactions", {"params": {
+                "accountId": rng.choice(accounts),
+                "start": (today - timedelta(days=days)).isoformat(),
+                "end": today.isoformat(),
+                "limit": limit,
+            }}
+        return make
+
+    return {
+        "chat mix": chat,
+        "tool transactions 30d": tool(30, 500),
+        "tool transactions 5y": tool(365 * 5, 5000),
+    }
+
+
+async def _drive(base: str, make: RequestFactory, requests: int, concurrency: int, seed: int) -> Dict[str, float]:
+    rng = random.Random(seed)
+    planned = [make(rng) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async with httpx.AsyncClient(base_url=base, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker() -> None:
+            nonlocal next_index, errors
+            while next_index < len(planned):
+                method, path, kwargs = planned[next_index]
+                next_index += 1
+                t0 = time.perf_counter()
+                r = await client.request(method, path, **kwargs)
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code >= 400:
+                    errors += 1
+
+        wall0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - wall0
+
+    out = summarize(latencies, wall)
+    out["errors"] = float(errors)
+    return out
+
+
+async def run(base: str, accounts: List[str], requests: int, concurrency: int, seed: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name, make in _cases(accounts).items():
+        await _drive(base, make, min(requests, 4 * concurrency), concurrency, seed)  # warm-up (store load, connections)
+        results[name] = await _drive(base, make, requests, concurrency, seed)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000, help="rows per account")
+    parser.add_argument("--requests", type=int, default=400, help="requests per case")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", default="fixed:0", help="fake Ollama latency spec, e.g. lognormal:400,0.5")
+    parser.add_argument("--llm-replay", type=Path, help="replay a LLM_RECORD_FILE recording instead of rules answers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    data_dir = ensure_dataset(args.accounts, args.rows, seed=args.seed)
+    with servers(data_dir, args.llm_latency, args.llm_replay) as base_url:
+        results = asyncio.run(run(base_url, account_ids(args.accounts), args.requests, args.concurrency, args.seed))
+
+    print_table("load", results)
+    if any(r["errors"] for r in results.values()):
+        print("\nerrors: " + ", ".join(f"{k}={int(v['errors'])}" for k, v in results.items()))
+    if args.save_baseline:
+        save_baseline("load", results)
+    elif not compare_to_baseline("load", results, args.tolerance):
+        sys.exit(1)
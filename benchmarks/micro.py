@@ -0,0 +1,105 @@
+"""
+Micro-benchmarks for the CPU-bound pieces of the /chat pipeline, run in-process
+against a generated dataset (see benchmarks/datagen.py).
+
+    python -m benchmarks.micro --rows 5000 --iterations 200 [--save-baseline]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+from benchmarks.datagen import account_ids, ensure_dataset
+from benchmarks.report import compare_to_baseline, print_table, save_baseline, summarize
+
+# Phrasings taken from tests/manual_testing.md and tests/run_tests.sh
+RULES_MESSAGES: List[str] = [
+    "What are my top spendings this year?",
+    "show me transactions for 2 weeks",
+    "show me 10 most recent transactions",
+    "list my transactions for the last 30 days",
+    "last 10 transactions",
+    "transactions from last month",
+    "what are my subscriptions?",
+    "show me recurring payments",
+    "I don't recognize transaction t007",
+    "what is this transaction t007?",
+]
+
+
+# Called directly (not through FastAPI), so every Query/Header default must be passed
+_TOOL_DEFAULTS: Dict[str, Any] = {"fields": None, "shape": "rows", "accept": None}
+
+
+def _bench(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    fn()  # warm-up
+    latencies: List[float] = []
+    wall0 = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - wall0)
+
+
+def run(rows: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    data_dir = ensure_dataset(accounts=1, rows=rows)
+    os.environ["DATA_DIR"] = str(data_dir)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    # Imported after DATA_DIR is set: src.config reads it at import time
+    from src.compute import detect_recurring_payments, handle_top_spending_ytd
+    from src.mock_store import get_transactions
+    from src.query_spec_builder import _compile_rules
+    from src.schemas import QuerySpec, TimeRange
+    from src.tools_api import get_spending_series, list_transactions, search
+
+    account_id = account_ids(1)[0]
+    txs = get_transactions(account_id)
+    ytd = QuerySpec(is_banking_domain=True, intent="top_spending_ytd",
+                    time_range=TimeRange(mode="preset", preset="ytd"), params={"top_k": 5})
+    today = date.today()
+
+    messages = iter(RULES_MESSAGES * (iterations // len(RULES_MESSAGES) + 2))
+
+    return {
+        f"detect_recurring_payments[{rows}]": _bench(lambda: detect_recurring_payments(txs), iterations),
+        f"handle_top_spending_ytd[{rows}]": _bench(lambda: handle_top_spending_ytd(ytd, txs), iterations),
+        f"list_transactions 30d[{rows}]": _bench(lambda: list_transactions(
+            accountId=account_id, start=today - timedelta(days=30), end=today, includePending=True, limit=500, **_TOOL_DEFAULTS,
+        ), iterations),
+        f"list_transactions 5y[{rows}]": _bench(lambda: list_transactions(
+            accountId=account_id, start=today - timedelta(days=365 * 5), end=today, includePending=True, limit=5000, **_TOOL_DEFAULTS,
+        ), iterations),
+        f"list_transactions newest10[{rows}]": _bench(lambda: list_transactions(
+            accountId=account_id, start=None, end=None, includePending=True, limit=10, **_TOOL_DEFAULTS,
+        ), iterations),
+        f"spending_series 5y month[{rows}]": _bench(lambda: get_spending_series(
+            accountId=account_id, start=today - timedelta(days=365 * 5), end=today, granularity="month", category=None,
+        ), iterations),
+        f"spending_series 5y day[{rows}]": _bench(lambda: get_spending_series(
+            accountId=account_id, start=today - timedelta(days=365 * 5), end=today, granularity="day", category=None,
+        ), iterations),
+        f"search whole foods[{rows}]": _bench(lambda: search(
+            accountId=account_id, q="whole foods", start=None, end=None, includePending=True, limit=50,
+        ), iterations),
+        "compile_rules": _bench(lambda: _compile_rules(next(messages), None), iterations),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="rows in the benchmark account")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = run(args.rows, args.iterations)
+    print_table("micro", results)
+    if args.save_baseline:
+        save_baseline("micro", results)
+    elif not compare_to_baseline("micro", results, args.tolerance):
+        sys.exit(1)
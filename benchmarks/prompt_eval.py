@@ -0,0 +1,129 @@
+"""
+Accuracy + latency of each system prompt variant (src/prompts.PROMPT_VARIANTS)
+on the tests/manual_testing.md cases.
+
+Calls query_spec_call_llm directly (no gateway, no post-processing fixes), so
+the score reflects the prompt alone. Point OLLAMA_URL / OLLAMA_MODEL at a real
+Ollama for meaningful numbers; against benchmarks/fake_ollama.py every variant
+gets the rules answer and only plumbing overhead is measured.
+
+    OLLAMA_URL=http://localhost:11434/api/chat python -m benchmarks.prompt_eval --repeat 3
+"""
+import argparse
+import asyncio
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.report import summarize
+
+_CASES_FILE = Path(__file__).resolve().parents[1] / "tests/manual_testing.md"
+
+# What each manual_testing.md message should compile to. Time ranges are compared
+# after resolve_time_range(), so "2 weeks" and "14 days" are the same answer.
+GOLD: Dict[str, Dict[str, Any]] = {
+    "what are my top spendings this year?": {
+        "intent": "top_spending_ytd", "time_range": {"mode": "preset", "preset": "ytd"},
+    },
+    "show me transactions for 2 weeks": {
+        "intent": "transactions_list", "time_range": {"mode": "relative", "last": 2, "unit": "weeks"},
+    },
+    "show me 10 most recent transactions": {
+        "intent": "transactions_list", "time_range": None, "params": {"limit": 10},
+    },
+    "what is this transaction t007?": {
+        "intent": "unrecognized_transaction",
+    },
+    "what are my subscriptions?": {
+        "intent": "recurring_payments",
+    },
+}
+
+
+def load_cases(path: Path = _CASES_FILE) -> List[str]:
+    """The chat messages used in the manual test write-up, in file order."""
+    return re.findall(r'"message"\s*:\s*"([^"]+)"', path.read_text())
+
+
+def _score(message: str, spec: Any, gold: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
+    from src.compute import resolve_time_range
+    from src.schemas import TimeRange
+
+    gold = gold or GOLD.get(message.lower())
+    if gold is None:
+        return True, "no gold label"
+    if not spec.is_banking_domain:
+        return False, f"is_banking_domain={spec.is_banking_domain}"
+    if spec.intent != gold["intent"]:
+        return False, f"intent={spec.intent}"
+    if "time_range" in gold:
+        want_tr = TimeRange(**gold["time_range"]) if gold["time_range"] else None
+        limit_only = bool(spec.params.get("limit_only"))
+        if resolve_time_range(spec.time_range, limit_only) != resolve_time_range(want_tr, want_tr is None):
+            return False, f"time_range={spec.time_range}"
+    for k, v in gold.get("params", {}).items():
+        if spec.params.get(k) != v:
+            return False, f"params.{k}={spec.params.get(k)}"
+    return True, "ok"
+
+
+async def evaluate(variant: str, prompt: str, cases: List[str], repeat: int) -> Dict[str, Any]:
+    from src.llm import query_spec_call_llm
+
+    latencies: List[float] = []
+    correct = 0
+    failures: List[str] = []
+    wall0 = time.perf_counter()
+    for _ in range(repeat):
+        for message in cases:
+            t0 = time.perf_counter()
+            spec: Optional[Any] = None
+            try:
+                spec = await query_spec_call_llm(prompt, message)
+            except Exception as e:  # invalid JSON / schema from the model counts as a miss
+                reason = f"error: {e}"
+            latencies.append(time.perf_counter() - t0)
+            if spec is not None:
+                ok, reason = _score(message, spec)
+                correct += ok
+                if ok:
+                    continue
+            failures.append(f"{message!r}: {reason}")
+    stats = summarize(latencies, time.perf_counter() - wall0)
+    return {
+        "variant": variant,
+        "prompt_chars": len(prompt),
+        "accuracy": correct / (len(cases) * repeat) if cases else 0.0,
+        **stats,
+        "failures": failures,
+    }
+
+
+async def main(variants: List[str], repeat: int) -> None:
+    from src.prompts import PROMPT_VARIANTS
+
+    cases = load_cases()
+    print(f"{len(cases)} cases from {_CASES_FILE.name}, repeat={repeat}\n")
+    print(f"{'variant':<10} {'chars':>7} {'accuracy':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    results = []
+    for name in variants:
+        # First call per variant loads the prompt prefix into the KV cache; keep it out of the numbers
+        await evaluate(name, PROMPT_VARIANTS[name], cases[:1], 1)
+        r = await evaluate(name, PROMPT_VARIANTS[name], cases, repeat)
+        results.append(r)
+        print(f"{name:<10} {r['prompt_chars']:>7} {r['accuracy']:>8.0%} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}")
+    for r in results:
+        for f in sorted(set(r["failures"])):
+            print(f"  [{r['variant']}] {f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="*", default=None, help="default: all PROMPT_VARIANTS")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from src.prompts import PROMPT_VARIANTS
+
+    asyncio.run(main(args.variants or list(PROMPT_VARIANTS), args.repeat))
@@ -0,0 +1,84 @@
+"""
+Latency summaries and baseline comparison shared by the benchmark scripts.
+
+Baselines live in benchmarks/baseline.json as {suite: {case: {metric: value}}}.
+Save one on a reference machine with --save-baseline, then later runs print the
+delta per metric and flag regressions beyond the tolerance.
+"""
+import json
+import math
+import statistics
+from pathlib import Path
+from typing import Dict, List
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+
+# Metrics where a bigger number is better; everything else is a latency
+_HIGHER_IS_BETTER = {"rps", "ops_per_sec", "rows_per_sec"}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies_s: List[float], wall_s: float) -> Dict[str, float]:
+    """p50/p95/p99/mean in ms plus throughput for a list of per-call latencies (seconds)."""
+    values = sorted(latencies_s)
+    return {
+        "count": float(len(values)),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "mean_ms": (statistics.fmean(values) * 1000) if values else 0.0,
+        "rps": len(values) / wall_s if wall_s > 0 else 0.0,
+    }
+
+
+def print_table(suite: str, results: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n== {suite} ==")
+    print(f"{'case':<34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>10}")
+    for case, m in results.items():
+        print(f"{case:<34} {m['p50_ms']:>9.2f} {m['p95_ms']:>9.2f} {m['p99_ms']:>9.2f} {m['rps']:>10.1f}")
+
+
+def load_baseline() -> Dict[str, Dict[str, Dict[str, float]]]:
+    if not BASELINE_FILE.exists():
+        return {}
+    with open(BASELINE_FILE, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(suite: str, results: Dict[str, Dict[str, float]]) -> None:
+    data = load_baseline()
+    data[suite] = results
+    with open(BASELINE_FILE, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    print(f"\nsaved baseline for '{suite}' to {BASELINE_FILE}")
+
+
+def compare_to_baseline(suite: str, results: Dict[str, Dict[str, float]], tolerance: float = 0.10) -> bool:
+    """Print deltas vs the stored baseline; returns False if any metric regressed beyond tolerance."""
+    baseline = load_baseline().get(suite)
+    if not baseline:
+        print(f"\n(no baseline for '{suite}'; run with --save-baseline to store one)")
+        return True
+
+    ok = True
+    print(f"\n-- vs baseline (tolerance {tolerance:.0%}) --")
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            if metric not in metrics or not base.get(metric):
+                continue
+            delta = (metrics[metric] - base[metric]) / base[metric]
+            worse = -delta if metric in _HIGHER_IS_BETTER else delta
+            flag = "REGRESSION" if worse > tolerance else ""
+            ok = ok and not flag
+            print(f"{case:<34} {metric:<7} {base[metric]:>10.2f} -> {metrics[metric]:>10.2f} ({delta:+.1%}) {flag}")
+    return ok
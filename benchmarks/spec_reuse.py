@@ -0,0 +1,152 @@
+"""
+Hit rate and wrong reuses of the QuerySpec reuse cache (src/spec_cache.py) per
+similarity threshold, on the tests/manual_testing.md phrasing.
+
+The cache is seeded with a correct LLM answer for each manual_testing.md message
+(and a few more, for near misses to aim at), then probed with paraphrases of them and with near-miss messages that need a
+different answer (other numbers, units, intents, negations, antonyms, categories). A probe that reuses a spec is
+post-processed like a fresh LLM answer and scored against its gold label, so a
+"wrong" reuse is one that changes the /chat answer. No Ollama needed.
+
+    python -m benchmarks.spec_reuse
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.prompt_eval import GOLD, _score, load_cases
+
+# What a correct model answers for each manual_testing.md message and the extra seeds
+SEED_ANSWERS: Dict[str, Dict[str, Any]] = {
+    "what are my top spendings this year?": {
+        "intent": "top_spending_ytd", "time_range": {"mode": "preset", "preset": "ytd"}, "params": {"top_k": 5},
+    },
+    "show me transactions for 2 weeks": {
+        "intent": "transactions_list", "time_range": {"mode": "relative", "last": 2, "unit": "weeks"},
+        "params": {"limit": 50},
+    },
+    "show me 10 most recent transactions": {
+        "intent": "transactions_list", "time_range": None, "params": {"limit": 10, "limit_only": True},
+    },
+    "what is this transaction t007?": {
+        "intent": "unrecognized_transaction", "time_range": None, "params": {"transaction_id": "t007"},
+    },
+    "what are my subscriptions?": {
+        "intent": "recurring_payments", "time_range": {"mode": "relative", "last": 3, "unit": "months"},
+        "params": {"min_occurrences": 3},
+    },
+    "i don't recognize this transaction": {
+        "intent": "unrecognized_transaction", "time_range": None, "params": {"transaction_id": None},
+    },
+    "show me recurring payments": {
+        "intent": "recurring_payments", "time_range": {"mode": "relative", "last": 3, "unit": "months"},
+        "params": {"min_occurrences": 3},
+    },
+    "how much did i spend on groceries?": {
+        "intent": "spending_trend", "time_range": {"mode": "relative", "last": 6, "unit": "months"},
+        "params": {"category": "Groceries"},
+    },
+}
+
+_TOP = GOLD["what are my top spendings this year?"]
+_SUBSCRIPTIONS = GOLD["what are my subscriptions?"]
+# Another question than any seed: only a fresh LLM answer is right, every reuse is wrong
+_FRESH = {"intent": "(fresh LLM answer)"}
+
+# (message, gold label in prompt_eval.GOLD form)
+PROBES: List[Tuple[str, Dict[str, Any]]] = [
+    # paraphrases: reuse is welcome
+    ("What are my top spendings this year", _TOP),
+    ("what are my top spending this year?", _TOP),
+    ("what were my top spendings this year?", _TOP),
+    ("what are my top spendings for this year?", _TOP),
+    ("What did I spend most on this year?", _TOP),
+    ("top spending ytd", _TOP),
+    ("show me my transactions for 2 weeks", GOLD["show me transactions for 2 weeks"]),
+    ("show me transactions for 2 weeks please", GOLD["show me transactions for 2 weeks"]),
+    ("show me the 10 most recent transactions", GOLD["show me 10 most recent transactions"]),
+    ("show me 25 most recent transactions", {"intent": "transactions_list", "time_range": None, "params": {"limit": 25}}),
+    ("show me 5 most recent transactions!", {"intent": "transactions_list", "time_range": None, "params": {"limit": 5}}),
+    ("what is this transaction t012?", {"intent": "unrecognized_transaction", "params": {"transaction_id": "t012"}}),
+    ("What is this transaction t007", {"intent": "unrecognized_transaction", "params": {"transaction_id": "t007"}}),
+    ("what are my subscriptions", _SUBSCRIPTIONS),
+    ("what are all my subscriptions?", _SUBSCRIPTIONS),
+    ("what are my current subscriptions?", _SUBSCRIPTIONS),
+    ("I don't recognize this transaction!", {"intent": "unrecognized_transaction", "params": {"transaction_id": None}}),
+    ("show me my recurring payments", _SUBSCRIPTIONS),
+    # near misses: reuse must not change the answer
+    ("show me transactions for 3 weeks", {"intent": "transactions_list", "time_range": {"mode": "relative", "last": 3, "unit": "weeks"}}),
+    ("show me transactions for 2 months", {"intent": "transactions_list", "time_range": {"mode": "relative", "last": 2, "unit": "months"}}),
+    ("show me transactions for the last 2 days", {"intent": "transactions_list", "time_range": {"mode": "relative", "last": 2, "unit": "days"}}),
+    ("show me 10 most recent subscriptions", _SUBSCRIPTIONS),
+    ("what are my transactions?", {"intent": "transactions_list"}),
+    ("what are my top spendings this month?", {"intent": "top_spending_ytd"}),
+    ("what is this transaction?", {"intent": "unrecognized_transaction", "params": {"transaction_id": None}}),
+    ("i do recognize this transaction", _FRESH),
+    ("show me non recurring payments", _FRESH),
+    ("what are my lowest spendings this year?", _FRESH),
+    ("what are my highest spendings this year?", _FRESH),
+    ("how much did i spend on gas?", _FRESH),
+    ("how much did i spend on dining?", _FRESH),
+]
+
+
+def _seed_spec(answer: Dict[str, Any]) -> Any:
+    from src.schemas import QuerySpec
+
+    return QuerySpec.model_validate({"is_banking_domain": True, **answer})
+
+
+def run(thresholds: List[float]) -> Dict[str, Dict[str, Any]]:
+    from src.message_features import extract_features
+    from src.query_spec_builder import _postprocess
+    from src.spec_cache import SpecCache
+
+    seeds = [m.lower() for m in load_cases()]
+    missing = [m for m in seeds if m not in SEED_ANSWERS]
+    if missing:
+        raise SystemExit(f"no seed answer for {missing}; add them to SEED_ANSWERS")
+    seeds = list(SEED_ANSWERS)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for threshold in thresholds:
+        cache = SpecCache(max_entries=1024, min_similarity=threshold)
+        for message in seeds:
+            cache.store(message, extract_features(message), _seed_spec(SEED_ANSWERS[message]))
+        hits, wrong, lookup_s = 0, [], []
+        for message, gold in PROBES:
+            text = message.lower()
+            features = extract_features(text)
+            t0 = time.perf_counter()
+            reused = cache.lookup(text, features)
+            lookup_s.append(time.perf_counter() - t0)
+            if reused is None:
+                continue
+            hits += 1
+            ok, reason = _score(message, _postprocess(reused, features, None), gold)
+            if not ok:
+                wrong.append(f"{message!r}: {reason}")
+        results[f"{threshold:.2f}"] = {
+            "hits": hits,
+            "wrong": wrong,
+            "lookup_us": statistics.median(lookup_s) * 1e6,
+        }
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"\n== spec reuse ({len(PROBES)} probes, {len(SEED_ANSWERS)} seeds) ==")
+    print(f"{'threshold':>9} {'hits':>5} {'hit rate':>9} {'wrong':>6} {'lookup us':>10}")
+    for threshold, r in results.items():
+        print(f"{threshold:>9} {r['hits']:>5} {r['hits'] / len(PROBES):>8.0%} {len(r['wrong']):>6} {r['lookup_us']:>10.1f}")
+    for threshold, r in results.items():
+        for w in r["wrong"]:
+            print(f"  [{threshold}] {w}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", type=float, nargs="*", default=[0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95])
+    args = parser.parse_args()
+    print_results(run(args.thresholds))
@@ -0,0 +1,72 @@
+"""
+Payload size, encode and parse time of the /tool/transactions response shapes.
+
+- rows: today's default, an array of full Transaction objects
+- columns: one array per field, merchants dictionary-encoded (shape=columns)
+- columns + fields=: only what one handler reads (compute.HANDLER_FIELDS)
+- binary: the same columns, Accept: application/vnd.txn-columns
+
+Encode is the tool API side (store rows -> bytes); parse is the orchestrator side
+(bytes -> List[Transaction]), as in tool_get_transactions.
+
+    python -m benchmarks.wire --rows 5000 --iterations 20
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.datagen import generate_account
+
+
+def _median_ms(fn: Callable[[], Any], iterations: int) -> float:
+    fn()  # warm-up
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def run(rows: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    from src.compute import HANDLER_FIELDS
+    from src.schemas import TRANSACTIONS_ADAPTER
+    from src.wire import decode_columns, decode_columns_binary, encode_columns, encode_columns_binary, encode_rows
+
+    txs = TRANSACTIONS_ADAPTER.validate_python(generate_account("B0001", rows))
+    cases: List[Tuple[str, Callable[[], bytes], Callable[[bytes], Any]]] = [
+        ("rows", lambda: encode_rows(txs), TRANSACTIONS_ADAPTER.validate_json),
+        ("columns", lambda: encode_columns(txs), decode_columns),
+        ("binary", lambda: encode_columns_binary(txs), decode_columns_binary),
+    ]
+    for intent, fields in HANDLER_FIELDS.items():
+        cases.append((f"columns {intent}", (lambda f=fields: encode_columns(txs, f)), decode_columns))
+        cases.append((f"binary {intent}", (lambda f=fields: encode_columns_binary(txs, f)), decode_columns_binary))
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, encode, parse in cases:
+        body = encode()
+        results[name] = {
+            "bytes": float(len(body)),
+            "encode_ms": _median_ms(encode, iterations),
+            "parse_ms": _median_ms(lambda: parse(body), iterations),
+        }
+    return results
+
+
+def print_results(rows: int, results: Dict[str, Dict[str, float]]) -> None:
+    base = results["rows"]
+    print(f"\n== wire ({rows} rows) ==")
+    print(f"{'shape':<34} {'KiB':>9} {'vs rows':>8} {'encode ms':>10} {'parse ms':>9} {'vs rows':>8}")
+    for name, m in results.items():
+        print(f"{name:<34} {m['bytes'] / 1024:>9.1f} {m['bytes'] / base['bytes']:>7.0%} "
+              f"{m['encode_ms']:>10.2f} {m['parse_ms']:>9.2f} {m['parse_ms'] / base['parse_ms']:>7.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    print_results(args.rows, run(args.rows, args.iterations))
@@ -1,11 +1,71 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .config import PROFILING_ENABLED
+from .metrics import (
+    REQUEST_SECONDS,
+    RequestProfiler,
+    get_profile,
+    render_prometheus,
+    server_timing_header,
+    start_request_timings,
+)
 from .tools_api import router as tools_router
 from .chat_api import router as chat_router
+from .warmup import WARMUP
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: /health answers right away, /ready once WARMUP is done
+    task = asyncio.create_task(WARMUP.run())
+    yield
+    task.cancel()
 
-app = FastAPI(title="Orchestrator (QuerySpec -> tools -> compute -> UISpec)")
+
+app = FastAPI(title="Orchestrator (QuerySpec -> tools -> compute -> UISpec)", lifespan=lifespan)
 app.include_router(tools_router)
 app.include_router(chat_router)
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Per-request stage timings -> Server-Timing header + request histogram; optional cProfile."""
+    timings = start_request_timings()
+    t0 = time.perf_counter()
+    if PROFILING_ENABLED and request.headers.get("x-profile"):
+        with RequestProfiler() as profiler:
+            response = await call_next(request)
+        profile_id = profiler.save()
+        if profile_id:
+            response.headers["X-Profile-Id"] = profile_id
+    else:
+        response = await call_next(request)
+    total = time.perf_counter() - t0
+
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(getattr(route, "path", "unmatched"), total)
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    return response
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Startup warm-up progress; 503 until it is done (health checks route traffic on this)."""
+    return JSONResponse(WARMUP.status(), status_code=200 if WARMUP.ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_prometheus()
+
+@app.get("/debug/profiles/{profileId}", response_class=PlainTextResponse)
+def debug_profile(profileId: str):
+    report = get_profile(profileId)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
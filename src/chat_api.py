@@ -1,20 +1,62 @@
-from fastapi import APIRouter
+import math
 
-from src.orchestrator import orchestrate_chat
-from src.schemas import ChatRequest, ChatResponse
+from fastapi import APIRouter, HTTPException, Response
+
+from src.config import ACCOUNT_BURST, ACCOUNT_RATE_PER_S
+from src.metrics import stage
+from src.orchestrator import orchestrate_chat, orchestrate_chat_batch
+from src.scheduler import RateLimiter, set_tenant
+from src.schemas import ChatBatchRequest, ChatBatchResponse, ChatRequest, ChatResponse
 
 router = APIRouter(tags=["chat"])
 
+RATE_LIMITER = RateLimiter(ACCOUNT_RATE_PER_S, ACCOUNT_BURST)
+
+
+def _admit(account_id: str, messages: int) -> None:
+    """
+    Per-account token bucket (429 + Retry-After past it); admitted requests run as the
+    account's tenant, so the LLM, fetch and compute queues share their slots fairly.
+    """
+    retry_after = RATE_LIMITER.try_acquire(account_id, messages)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests for this account",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    set_tenant(account_id)
+
 # ----------------------------
 # Chat API endpoint
 # ----------------------------
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest) -> ChatResponse:
+async def chat(req: ChatRequest) -> Response:
     """
     Chat endpoint that delegates to the orchestrator.
     
     Handles user messages, routes them through query compilation,
     and returns UI specifications for the frontend.
     """
-    return await orchestrate_chat(req)
\ No newline at end of file
+    _admit(req.accountId, 1)
+    resp = await orchestrate_chat(req)
+    # Serialize here (instead of via response_model) so the cost shows up as its own stage
+    with stage("serialize"):
+        body = resp.model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(req: ChatBatchRequest) -> Response:
+    """
+    Several messages for one account (e.g. a dashboard) in one call.
+
+    Results come back in message order, each the same as a /chat call with that
+    message would return; the transaction fetch is shared between them.
+    """
+    _admit(req.accountId, len(req.messages))
+    resp = await orchestrate_chat_batch(req)
+    with stage("serialize"):
+        body = resp.model_dump_json()
+    return Response(content=body, media_type="application/json")
@@ -2,12 +2,19 @@ from __future__ import annotations
 
 from datetime import date, timedelta
 from statistics import median
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+from .metrics import timed
 from .schemas import (
+    GRANULARITY_DAYS,
+    SERIES_MAX_BUCKETS,
+    Granularity,
+    MerchantHistory,
     QuerySpec,
+    SpendingSeries,
     TimeRange,
     Transaction,
+    TransactionSearch,
     RecurringPayment,
     UIChart,
     UIForm,
@@ -24,12 +31,6 @@ from .schemas import (
 def money(x: float) -> str:
     return f"${x:,.2f}"
 
-def is_spend(tx: Transaction) -> bool:
-    return tx.direction == "debit"
-
-def is_posted(tx: Transaction) -> bool:
-    return not tx.isPending
-
 def _month_bounds(d: date) -> Tuple[date, date]:
     start = d.replace(day=1)
     if start.month == 12:
@@ -95,12 +96,12 @@ def table_transactions(title: str, txs: List[Transaction], limit: int = 50) -> U
     for t in txs_sorted:
         rows.append([
             t.id,
-            t.postedAt.date().isoformat(),
+            t.dateIso,
             "PENDING" if t.isPending else "POSTED",
             t.merchant.name,
             t.merchant.category,
             t.merchant.subcategory,
-            money(t.amount),
+            t.amountText,
             t.direction,
             t.paymentRail or "",
             t.cardLast4 or "",
@@ -124,8 +125,8 @@ def dispute_form_for_transaction(t: Transaction) -> UIForm:
         fields=[
             UIFormField(name="transactionId", label="Transaction ID", value=t.id, required=True),
             UIFormField(name="merchant", label="Merchant", value=t.merchant.name, required=True),
-            UIFormField(name="date", label="Date", value=t.postedAt.date().isoformat(), required=True),
-            UIFormField(name="amount", label="Amount", value=money(t.amount), required=True),
+            UIFormField(name="date", label="Date", value=t.dateIso, required=True),
+            UIFormField(name="amount", label="Amount", value=t.amountText, required=True),
             UIFormField(name="reason", label="Reason (not mine / duplicate / wrong amount)", value="", required=True),
             UIFormField(name="notes", label="Notes (optional)", value="", required=False),
         ],
@@ -137,6 +138,17 @@ def dispute_form_for_transaction(t: Transaction) -> UIForm:
 # 4 core handlers
 # --------------------------
 
+# Transaction fields each list-based handler reads (names as in wire.TRANSACTION_FIELDS).
+# The orchestrator fetches only these; update the entry when a handler starts reading more.
+HANDLER_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "transactions_list": (
+        "id", "postedAt", "direction", "amount", "merchant.name", "merchant.category",
+        "merchant.subcategory", "isPending", "paymentRail", "cardLast4",
+    ),
+    "top_spending_ytd": ("postedAt", "direction", "amount", "merchant.name", "merchant.category", "isPending"),
+    "recurring_payments": ("postedAt", "direction", "amount", "merchant.name", "isPending"),
+}
+
 def _describe_range(tr: TimeRange | None) -> str:
     if tr is None:
         return "recent history"
@@ -157,6 +169,7 @@ def _describe_range(tr: TimeRange | None) -> str:
     return "recent history"
 
 
+@timed("compute.transactions_list")
 def handle_transactions_list(q: QuerySpec, txs: List[Transaction]) -> UISpec:
     limit = int(q.params.get("limit", 50))
     limit_only = q.params.get("limit_only", False)
@@ -180,9 +193,10 @@ def handle_transactions_list(q: QuerySpec, txs: List[Transaction]) -> UISpec:
     return ui
 
 
+@timed("compute.top_spending_ytd")
 def handle_top_spending_ytd(q: QuerySpec, txs: List[Transaction]) -> UISpec:
     # posted debits only for analytics
-    spend = [t for t in txs if is_spend(t) and is_posted(t)]
+    spend = [t for t in txs if t.isPostedDebit]
 
     total = sum(t.amount for t in spend)
     top_k = int(q.params.get("top_k", 5))
@@ -215,13 +229,40 @@ def handle_top_spending_ytd(q: QuerySpec, txs: List[Transaction]) -> UISpec:
     return ui
 
 
-def handle_unrecognized_transaction(tx: Transaction) -> UISpec:
+def _merchant_history_lines(tx: Transaction, h: MerchantHistory) -> List[str]:
+    # "Is this typical?" from the tool's merchant index: only rows before this one count
+    kind = "charge" if h.direction == "debit" else "payment"
+    if not h.priorCount:
+        return ["", f"**Is this typical?** This is the first {kind} from **{h.merchant}** in your history."]
+
+    lines = [
+        "",
+        "**Is this typical?**",
+        f"- {h.priorCount} earlier {kind}{'s' if h.priorCount != 1 else ''} from **{h.merchant}** ({h.firstSeen} to {h.lastSeen}), "
+        f"average **{money(h.priorMean)}**, range {money(h.priorMin)}–{money(h.priorMax)}",
+    ]
+    if tx.amount > h.priorMax:
+        lines.append("- This amount is **higher than any earlier one** there")
+    elif tx.amount < h.priorMin:
+        lines.append("- This amount is **lower than any earlier one** there")
+    else:
+        lines.append("- This amount is within the usual range")
+    if h.cardSeenBefore is not None and tx.cardLast4:
+        seen = "has been used there before" if h.cardSeenBefore else "has **not** been used there before"
+        lines.append(f"- Card •••• {tx.cardLast4} {seen}")
+    elif h.railSeenBefore is False and tx.paymentRail:
+        lines.append(f"- First **{tx.paymentRail}** payment there")
+    return lines
+
+
+@timed("compute.unrecognized_transaction")
+def handle_unrecognized_transaction(tx: Transaction, history: Optional[MerchantHistory] = None) -> UISpec:
     # No balances/holds in your current schema, so keep explanation simple + bank-real
     lines = [
         "Here’s what I see for that transaction:",
         f"- Merchant: **{tx.merchant.name}** ({tx.merchant.category} / {tx.merchant.subcategory})",
-        f"- Amount: **{money(tx.amount)}** ({tx.direction})",
-        f"- Date: **{tx.postedAt.date().isoformat()}**",
+        f"- Amount: **{tx.amountText}** ({tx.direction})",
+        f"- Date: **{tx.dateIso}**",
         f"- Status: **{'PENDING' if tx.isPending else 'POSTED'}**",
     ]
 
@@ -231,6 +272,9 @@ def handle_unrecognized_transaction(tx: Transaction) -> UISpec:
             rail += f" (card •••• {tx.cardLast4})"
         lines.append(f"- Method: **{rail}**")
 
+    if history is not None:
+        lines.extend(_merchant_history_lines(tx, history))
+
     if tx.isPending:
         lines.append("")
         lines.append("Pending card charges can change slightly when posted, or disappear if canceled.")
@@ -246,6 +290,110 @@ def handle_unrecognized_transaction(tx: Transaction) -> UISpec:
     return ui
 
 
+# --------------------------
+# Session follow-ups
+# --------------------------
+
+@timed("compute.result_page")
+def handle_result_page(q: QuerySpec, rows: List[Transaction], offset: int, size: int,
+                       complete: bool, filters: List[str]) -> UISpec:
+    # rows: the previous answer's result set (newest first) with the follow-up filters applied
+    noun = "transaction" if complete and len(rows) == 1 else "transactions"
+    what = noun + (f" ({', '.join(filters)})" if filters else "")
+    total = f"{len(rows)}" if complete else f"{len(rows)}+"
+    page = rows[offset:offset + size]
+    if not page:
+        if offset == 0:
+            message = f"None of those transactions are **{filters[-1] if filters else 'left'}**."
+        else:
+            message = f"That's all of them: **{total}** {what}."
+        return UISpec(messages=[UIMessage(content=message)])
+    message = f"Showing **{offset + 1}–{offset + len(page)}** of **{total}** {what}."
+    return UISpec(
+        messages=[UIMessage(content=message)],
+        components=[table_transactions("Transactions", page, limit=len(page))],
+    )
+
+
+# --------------------------
+# Merchant search
+# --------------------------
+
+@timed("compute.merchant_search")
+def handle_merchant_search(q: QuerySpec, result: TransactionSearch) -> UISpec:
+    # Matches come from the tool's search index, newest first; only the shown rows are sent
+    label = _describe_range(q.time_range) if q.time_range else "your whole history"
+    if not result.matched:
+        return UISpec(messages=[UIMessage(
+            content=f"I couldn't find transactions matching **\"{result.query}\"** in **{label}**."
+        )])
+    shown = len(result.transactions)
+    message = (
+        f"Found **{result.matched}** transactions matching **\"{result.query}\"** in **{label}**; "
+        f"posted spend **{money(result.postedDebitTotal)}**."
+    )
+    if shown < result.matched:
+        message += f" Showing the **{shown}** most recent."
+
+    return UISpec(
+        messages=[UIMessage(content=message)],
+        components=[table_transactions(f"Transactions matching \"{result.query}\"", result.transactions, limit=shown)],
+    )
+
+
+# --------------------------
+# Spending trend
+# --------------------------
+
+# Range of a spending_trend question that names no period
+TREND_DEFAULT_RANGE = TimeRange(mode="relative", last=6, unit="months")
+
+def trend_window(q: QuerySpec) -> Tuple[date, date, Granularity]:
+    """
+    (start, end_exclusive, granularity) of a spending_trend query. Without
+    params.granularity: daily up to a month, weekly up to ~6 months, monthly beyond.
+    A stated granularity that would give more than SERIES_MAX_BUCKETS buckets is
+    coarsened ("daily over the last 10 years" comes out weekly); if even months are
+    too many, the range keeps its most recent SERIES_MAX_BUCKETS months.
+    """
+    start, end = resolve_time_range(q.time_range or TREND_DEFAULT_RANGE)
+    days = (end - start).days
+    granularity = q.params.get("granularity")
+    if granularity not in ("day", "week", "month"):
+        granularity = "day" if days <= 31 else "week" if days <= 183 else "month"
+    while days // GRANULARITY_DAYS[granularity] > SERIES_MAX_BUCKETS and granularity != "month":
+        granularity = "week" if granularity == "day" else "month"
+    if days // GRANULARITY_DAYS["month"] > SERIES_MAX_BUCKETS:
+        start = end - timedelta(days=SERIES_MAX_BUCKETS * GRANULARITY_DAYS["month"])
+    return start, end, granularity
+
+
+@timed("compute.spending_trend")
+def handle_spending_trend(q: QuerySpec, series: SpendingSeries) -> UISpec:
+    # Buckets come pre-aggregated from the tool's daily prefix sums: work is O(buckets)
+    label = _describe_range(q.time_range or TREND_DEFAULT_RANGE)
+    what = f"{series.category} spending" if series.category else "Spending"
+    unit = series.granularity
+    lines = [f"{what} (posted debits) for **{label}**: **{money(series.total)}** in total"]
+    if series.buckets:
+        lines[0] += f", **{money(series.total / len(series.buckets))}** per {unit} on average."
+        peak = max(series.buckets, key=lambda b: b.total)
+        if peak.total > 0:
+            lines.append(f"Highest {unit}: **{peak.start}** ({money(peak.total)}).")
+
+    ui = UISpec(
+        messages=[UIMessage(content="\n".join(lines))],
+        components=[
+            UIChart(
+                title=f"{what} per {unit}",
+                chartType="line",
+                data=[{"period": b.start, "total": round(b.total, 2)} for b in series.buckets],
+            )
+        ],
+    )
+    return ui
+
+
 # --------------------------
 # Recurring detection (pure deterministic)
 # --------------------------
@@ -274,7 +422,7 @@ def _classify_cadence(median_gap_days: float) -> str:
 
 def detect_recurring_payments(txs: List[Transaction], min_occurrences: int = 3) -> List[RecurringPayment]:
     # posted debits only
-    debits = [t for t in txs if is_spend(t) and is_posted(t)]
+    debits = [t for t in txs if t.isPostedDebit]
 
     by_merchant: Dict[str, List[Transaction]] = {}
     for t in debits:
@@ -289,7 +437,7 @@ def detect_recurring_payments(txs: List[Transaction], min_occurrences: int = 3)
         items.sort(key=lambda t: t.postedAt)
         gaps: List[int] = []
         for i in range(1, len(items)):
-            gaps.append((items[i].postedAt.date() - items[i - 1].postedAt.date()).days)
+            gaps.append(items[i].dateOrdinal - items[i - 1].dateOrdinal)
 
         if not gaps:
             continue
@@ -315,6 +463,7 @@ def detect_recurring_payments(txs: List[Transaction], min_occurrences: int = 3)
     return out
 
 
+@timed("compute.recurring_payments")
 def handle_recurring_payments(q: QuerySpec, txs: List[Transaction]) -> UISpec:
     min_occ = int(q.params.get("min_occurrences", 3))
     rec = detect_recurring_payments(txs, min_occurrences=min_occ)
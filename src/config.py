@@ -2,6 +2,8 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from src.logs import get_logger, setup_logging
+
 # Load .env file from project root
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(env_path)
@@ -10,9 +12,92 @@ load_dotenv(env_path)
 TOOL_BASE_URL = os.getenv("TOOL_BASE_URL", "http://localhost:8000")
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/v1/chat/completions")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
+# Directory holding txns_<accountId>.json files (benchmarks point this at generated data)
+DATA_DIR = Path(os.getenv("DATA_DIR", str(Path(__file__).parent.parent / "data")))
+# System prompt variant from prompts.PROMPT_VARIANTS ("full" | "compact")
+PROMPT_VARIANT = os.getenv("PROMPT_VARIANT", "full")
+# How long Ollama keeps the model (and its prompt KV cache) loaded between requests
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Per-request latency budget for the LLM compile (queue wait included); past it the
+# rules answer is used and an LLM call already running finishes in the background.
+# 0 = no budget
+LLM_LATENCY_BUDGET_S = float(os.getenv("LLM_LATENCY_BUDGET_S", "6"))
+# LLM gateway: max concurrent Ollama calls, max callers waiting for a slot, and how long
+# a caller may wait before it is shed to the rules compiler (default: the budget; a
+# longer wait could only end in a call nobody waits for)
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_MAX_WAIT_S = float(os.getenv("LLM_MAX_WAIT_S", str(LLM_LATENCY_BUDGET_S or 8)))
+# Circuit breaker around Ollama: over the last WINDOW_S seconds, once MIN_CALLS calls
+# completed, open when FAILURE_RATE of them failed (transport/HTTP errors) or SLOW_RATE
+# took SLOW_CALL_S or longer (or overran a caller's budget). While open, callers go
+# straight to the rules compiler; after OPEN_S one probe call is let through
+LLM_BREAKER_WINDOW_S = float(os.getenv("LLM_BREAKER_WINDOW_S", "30"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_S = float(os.getenv("LLM_BREAKER_SLOW_CALL_S", "5"))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_OPEN_S = float(os.getenv("LLM_BREAKER_OPEN_S", "15"))
+# Orchestrator cache of fetched transaction rows: total rows kept across accounts
+# (0 disables it), and how often a cached account's data version is re-checked
+FETCH_CACHE_MAX_ROWS = int(os.getenv("FETCH_CACHE_MAX_ROWS", "200000"))
+FETCH_CACHE_REVALIDATE_S = float(os.getenv("FETCH_CACHE_REVALIDATE_S", "5"))
+# Reuse of LLM QuerySpecs for near-duplicate messages (src/spec_cache.py): messages kept
+# (0 disables it) and the trigram cosine similarity needed for reuse (tuned with
+# benchmarks/spec_reuse.py on the tests/manual_testing.md phrasings)
+SPEC_CACHE_SIZE = int(os.getenv("SPEC_CACHE_SIZE", "1024"))
+SPEC_CACHE_MIN_SIMILARITY = float(os.getenv("SPEC_CACHE_MIN_SIMILARITY", "0.8"))
+# Compute handlers on inputs of at least COMPUTE_OFFLOAD_MIN_ROWS rows run in a pool of
+# COMPUTE_THREADS threads instead of on the event loop (smaller ones are cheaper inline
+# than the hop); 0 rows = always inline
+COMPUTE_OFFLOAD_MIN_ROWS = int(os.getenv("COMPUTE_OFFLOAD_MIN_ROWS", "1000"))
+COMPUTE_THREADS = int(os.getenv("COMPUTE_THREADS", "4"))
+# Per-account admission for /chat and /chat/batch: a token bucket of ACCOUNT_BURST messages
+# refilled at ACCOUNT_RATE_PER_S; past it the request gets 429 + Retry-After (0 = no limit)
+ACCOUNT_RATE_PER_S = float(os.getenv("ACCOUNT_RATE_PER_S", "10"))
+ACCOUNT_BURST = float(os.getenv("ACCOUNT_BURST", "40"))
+# Fair queuing of the LLM, tool fetch and compute stages across accounts (false = arrival
+# order), tool calls the orchestrator has in flight at once, and per-account weights of
+# the fair share ("A123:2,B0001:0.5"; default 1)
+SCHEDULER_FAIR = os.getenv("SCHEDULER_FAIR", "true").lower() == "true"
+FETCH_MAX_IN_FLIGHT = int(os.getenv("FETCH_MAX_IN_FLIGHT", "8"))
+ACCOUNT_WEIGHTS = {
+    account.strip(): float(weight)
+    for account, _, weight in (item.partition(":") for item in os.getenv("ACCOUNT_WEIGHTS", "").split(","))
+    if account.strip() and weight.strip()
+}
+# Chat sessions (ChatRequest.sessionId): idle seconds before a session expires, sessions
+# kept, and transaction rows they may reference in total (0 sessions disables them)
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "900"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_MAX_ROWS = int(os.getenv("SESSION_MAX_ROWS", "200000"))
+# Startup warm-up (src/warmup.py, /ready): accounts loaded into the tool store before the
+# instance reports ready (comma-separated), and how long to wait for Ollama to load the
+# model (past it the instance is ready anyway; the rules compiler answers meanwhile)
+WARMUP_ACCOUNTS = [a.strip() for a in os.getenv("WARMUP_ACCOUNTS", "A123").split(",") if a.strip()]
+WARMUP_LLM_TIMEOUT_S = float(os.getenv("WARMUP_LLM_TIMEOUT_S", "60"))
+# Wire format the orchestrator asks /tool/transactions for: "json", or "binary" (opt-in:
+# compact columns, falls back to JSON if the tool API doesn't offer it)
+TOOL_WIRE_FORMAT = os.getenv("TOOL_WIRE_FORMAT", "json").lower()
+# Append real LLM request/response pairs to this JSONL file (replay with benchmarks/fake_ollama.py)
+LLM_RECORD_FILE = os.getenv("LLM_RECORD_FILE", "")
+# Allow per-request cProfile via the X-Profile header (keep off in production)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+
+# Logging: DEBUG includes full LLM payloads; LOG_FORMAT=text for local dev
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
 
-# Debug logging
-print(f"[CONFIG] TOOL_BASE_URL: {TOOL_BASE_URL}")
-print(f"[CONFIG] OLLAMA_URL: {OLLAMA_URL}")
-print(f"[CONFIG] OLLAMA_MODEL: {OLLAMA_MODEL}")
-print(f"[CONFIG] .env path: {env_path}, exists: {env_path.exists()}")
+setup_logging(LOG_LEVEL, LOG_FORMAT)
+get_logger(__name__).info(
+    "config loaded",
+    extra={
+        "tool_base_url": TOOL_BASE_URL,
+        "ollama_url": OLLAMA_URL,
+        "ollama_model": OLLAMA_MODEL,
+        "prompt_variant": PROMPT_VARIANT,
+        "data_dir": str(DATA_DIR),
+        "env_path": str(env_path),
+        "env_exists": env_path.exists(),
+    },
+)
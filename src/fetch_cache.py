@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from src.logs import get_logger
+from src.metrics import Counter, Gauge, register
+from src.schemas import Transaction
+
+logger = get_logger(__name__)
+
+FETCH_CACHE_EVENTS = register(Counter("fetch_cache_events_total", "Orchestrator transaction fetch cache lookups and evictions", label="event"))
+FETCH_CACHE_STATE = register(Gauge("fetch_cache", "Orchestrator transaction fetch cache size", label="state"))
+
+# (account_id, start, end inclusive, limit) -> (rows newest first, data version)
+PageFetcher = Callable[[str, date, date, int], Awaitable[Tuple[List[Transaction], str]]]
+VersionFetcher = Callable[[str], Awaitable[str]]
+
+
+@dataclass
+class _AccountRows:
+    """
+    Rows of one account for a set of fully fetched day intervals.
+
+    rows are newest first, exactly as /tool/transactions orders them; neg_ords[i] is
+    -rows[i].dateOrdinal (ascending, for bisect). intervals are sorted, disjoint,
+    inclusive (first, last) day ordinals; every row of a covered day is in rows.
+    """
+
+    version: str
+    checked_at: float
+    rows: List[Transaction] = field(default_factory=list)
+    neg_ords: List[int] = field(default_factory=list)
+    intervals: List[Tuple[int, int]] = field(default_factory=list)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def covering(self, day: int) -> Optional[Tuple[int, int]]:
+        i = bisect_right(self.intervals, (day, float("inf"))) - 1
+        if i >= 0 and self.intervals[i][1] >= day:
+            return self.intervals[i]
+        return None
+
+    def gap_start(self, day: int, floor: int) -> int:
+        """First uncovered day of the gap that ends at `day` (not below floor)."""
+        i = bisect_left(self.intervals, (day, day)) - 1
+        return max(floor, self.intervals[i][1] + 1) if i >= 0 else floor
+
+    def span(self, first: int, last: int) -> Tuple[int, int]:
+        """rows[i:j] are the cached rows dated first..last."""
+        return bisect_left(self.neg_ords, -last), bisect_right(self.neg_ords, -first)
+
+    def add(self, first: int, last: int, rows: List[Transaction]) -> None:
+        """Store the complete rows for days first..last (an uncovered gap)."""
+        i, _ = self.span(first, last)
+        self.rows[i:i] = rows
+        self.neg_ords[i:i] = [-t.dateOrdinal for t in rows]
+        intervals = []
+        for lo, hi in self.intervals:
+            if hi + 1 < first or lo > last + 1:
+                intervals.append((lo, hi))
+            else:
+                first, last = min(lo, first), max(hi, last)
+        intervals.append((first, last))
+        self.intervals = sorted(intervals)
+
+
+class FetchCache:
+    """
+    Per-account interval cache in front of /tool/transactions.
+
+    get() answers "newest `limit` rows dated start..end" like one tool call would. Days
+    that are already covered are sliced from memory; only the uncovered gaps are
+    fetched, newest first, and only until `limit` rows are known, so a limit-only
+    query over a 5-year window does not pull the whole history.
+
+    Entries are dropped when the tool reports a different data version (checked on
+    every fetch, and via fetch_version at most every `revalidate_s` on pure hits).
+    The total number of cached rows is capped at max_rows; least recently used
+    accounts are evicted first.
+    """
+
+    def __init__(self, fetch_page: PageFetcher, fetch_version: VersionFetcher, *,
+                 max_rows: int, revalidate_s: float, page_limit: int):
+        self._fetch_page = fetch_page
+        self._fetch_version = fetch_version
+        self.max_rows = max_rows
+        self.revalidate_s = revalidate_s
+        self.page_limit = page_limit
+        self._accounts: "OrderedDict[str, _AccountRows]" = OrderedDict()
+        self._rows = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rows > 0
+
+    async def get(self, account_id: str, start: date, end: date, limit: int) -> List[Transaction]:
+        first, last = start.toordinal(), end.toordinal()
+        entry = await self._entry(account_id)
+        async with entry.lock:
+            rows = await self._fill(account_id, entry, first, last, limit)
+        if rows is None:
+            # A single day holds more rows than one page; not cacheable, ask the tool directly
+            FETCH_CACHE_EVENTS.inc("bypass")
+            return (await self._fetch_page(account_id, start, end, limit))[0]
+        self._evict(keep=account_id)
+        return rows
+
+    async def _entry(self, account_id: str) -> _AccountRows:
+        entry = self._accounts.get(account_id)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at >= self.revalidate_s:
+            version = await self._fetch_version(account_id)
+            if version != entry.version:
+                self._drop(account_id, "invalidated")
+                entry = None
+            else:
+                entry.checked_at = now
+        if entry is None:
+            entry = self._accounts.get(account_id)  # may have been re-created while we awaited
+        if entry is None:
+            entry = _AccountRows(version="", checked_at=now)
+            self._accounts[account_id] = entry
+        self._accounts.move_to_end(account_id)
+        return entry
+
+    async def _fill(self, account_id: str, entry: _AccountRows, first: int, last: int,
+                    limit: int) -> Optional[List[Transaction]]:
+        """Fetch gaps newest first until `limit` rows of first..last are cached; None = bypass."""
+        fetched = reused = False
+        cursor, have = last, 0
+        while cursor >= first and have < limit:
+            iv = entry.covering(cursor)
+            if iv is not None:
+                lo = max(iv[0], first)
+                i, j = entry.span(lo, cursor)
+                have += j - i
+                cursor = lo - 1
+                reused = True
+                continue
+
+            gap_first = entry.gap_start(cursor, first)
+            page = min(self.page_limit, max(2 * (limit - have), limit))
+            rows, version = await self._fetch_page(
+                account_id, date.fromordinal(gap_first), date.fromordinal(cursor), page,
+            )
+            fetched = True
+            if version != entry.version:
+                entry.version, entry.checked_at = version, time.monotonic()
+                if entry.intervals:
+                    # Data changed under us: start over against the new version
+                    FETCH_CACHE_EVENTS.inc("invalidated")
+                    self._clear(account_id, entry)
+                    cursor, have = last, 0
+                    continue
+
+            covered_from = gap_first
+            if len(rows) == page:
+                # Page is full: the oldest day in it may be cut off, keep only whole days
+                cut = rows[-1].dateOrdinal
+                if cut == cursor:
+                    return None
+                rows = [t for t in rows if t.dateOrdinal > cut]
+                covered_from = cut + 1
+            entry.add(covered_from, cursor, rows)
+            if self._accounts.get(account_id) is entry:
+                self._rows += len(rows)
+            have += len(rows)
+            cursor = covered_from - 1
+
+        FETCH_CACHE_EVENTS.inc("hit" if not fetched else "partial" if reused else "miss")
+        FETCH_CACHE_STATE.set("rows", self._rows)
+        i, j = entry.span(first, last)
+        return entry.rows[i:min(j, i + limit)]
+
+    def _clear(self, account_id: str, entry: _AccountRows) -> None:
+        if self._accounts.get(account_id) is entry:
+            self._rows -= len(entry.rows)
+        entry.rows, entry.neg_ords, entry.intervals = [], [], []
+
+    def _drop(self, account_id: str, event: str) -> None:
+        entry = self._accounts.pop(account_id, None)
+        if entry is not None:
+            self._rows -= len(entry.rows)
+            FETCH_CACHE_EVENTS.inc(event)
+
+    def _evict(self, keep: str) -> None:
+        while self._rows > self.max_rows and self._accounts:
+            account_id = next(iter(self._accounts))
+            if account_id == keep and len(self._accounts) == 1:
+                # This account alone is over budget: don't keep it at all
+                self._drop(account_id, "evicted")
+                break
+            if account_id == keep:
+                self._accounts.move_to_end(account_id)
+                continue
+            self._drop(account_id, "evicted")
+        FETCH_CACHE_STATE.set("rows", self._rows)
+        FETCH_CACHE_STATE.set("accounts", len(self._accounts))
@@ -1,65 +1,434 @@
+import asyncio
+import json
 import re
-from typing import Any
-import httpx
-from src.config import OLLAMA_MODEL, OLLAMA_URL
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, Optional, Tuple
+from src.config import (
+    ACCOUNT_WEIGHTS,
+    LLM_BREAKER_FAILURE_RATE,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_OPEN_S,
+    LLM_BREAKER_SLOW_CALL_S,
+    LLM_BREAKER_SLOW_RATE,
+    LLM_BREAKER_WINDOW_S,
+    LLM_MAX_IN_FLIGHT,
+    LLM_MAX_QUEUE,
+    LLM_MAX_WAIT_S,
+    LLM_RECORD_FILE,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_MODEL,
+    OLLAMA_URL,
+    SCHEDULER_FAIR,
+)
+from src.llm_recorder import normalize_message, prompt_sha, recorder_from_env
+from src.logs import LazyJson, get_logger
+from src.metrics import Counter, Gauge, Histogram, register, stage
+from src.scheduler import FairQueue, Preempted, current_tenant
 from src.schemas import QuerySpec
 
+if TYPE_CHECKING:
+    import httpx
+
+logger = get_logger(__name__)
+_RECORDER = recorder_from_env(LLM_RECORD_FILE)
+
+LLM_GATEWAY_EVENTS = register(Counter("llm_gateway_events_total", "LLM gateway admissions, coalesced calls and sheds", label="event"))
+LLM_GATEWAY_STATE = register(Gauge("llm_gateway", "LLM gateway queue depth and in-flight calls", label="state"))
+LLM_QUEUE_WAIT_SECONDS = register(Histogram("llm_queue_wait_seconds", "Time spent waiting for an LLM slot", label="outcome"))
+LLM_BREAKER_EVENTS = register(Counter("llm_breaker_events_total", "LLM circuit breaker transitions and rejected calls", label="event"))
+LLM_BREAKER_STATE = register(Gauge("llm_breaker", "LLM circuit breaker state (0 closed, 1 half open, 2 open) and rolling window", label="stat"))
+
+# One pooled client for all LLM calls (creating an AsyncClient per call costs ~30ms of TLS/pool setup)
+_CLIENT: Optional["httpx.AsyncClient"] = None
+
+
+def _client() -> "httpx.AsyncClient":
+    # httpx is imported on first use (the startup warm-up), not at process start
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        import httpx
+
+        _CLIENT = httpx.AsyncClient(timeout=45, limits=httpx.Limits(max_connections=LLM_MAX_IN_FLIGHT))
+    return _CLIENT
+
+
 async def query_spec_call_llm(system_prompt: str, user_message: str) -> QuerySpec:
-        async with httpx.AsyncClient(timeout=45) as client:
-            payload: dict[str, Any] = {
-                "model": OLLAMA_MODEL,
-                "stream": False,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message},
-                ],
-                "format": "json",
-            }
-            r = await client.post(OLLAMA_URL, json=payload)
-            r.raise_for_status()
-            response_json = r.json()
-            
-            # Handle both Ollama native API and OpenAI-compatible API formats
-            if "choices" in response_json:
-                # OpenAI-compatible format: /v1/chat/completions
-                content = response_json["choices"][0]["message"]["content"]
+    client = _client()
+    payload: dict[str, Any] = {
+        "model": OLLAMA_MODEL,
+        "stream": False,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message},
+        ],
+        "format": "json",
+        # Keep the model resident so the unchanged system-prompt prefix stays in the KV cache
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }
+    t0 = time.perf_counter()
+    with stage("llm.http"):
+        r = await client.post(OLLAMA_URL, json=payload)
+        r.raise_for_status()
+    latency_s = time.perf_counter() - t0
+    response_json = r.json()
+    
+    # Handle both Ollama native API and OpenAI-compatible API formats
+    if "choices" in response_json:
+        # OpenAI-compatible format: /v1/chat/completions
+        content = response_json["choices"][0]["message"]["content"]
+    else:
+        # Ollama native format: /api/chat
+        content = response_json["message"]["content"]
+
+    if _RECORDER is not None:
+        await _RECORDER.record(system_prompt=system_prompt, message=user_message, model=OLLAMA_MODEL,
+                               url=OLLAMA_URL, content=content, latency_s=latency_s)
+    
+    m = re.search(r"\{.*\}", content, flags=re.S)
+    if not m:
+        raise ValueError("No JSON found in Ollama output")
+    
+    response_data = json.loads(m.group(0))
+    logger.debug("LLM raw JSON response: %s", LazyJson(response_data))
+    
+    # Extract the nested query structure
+    query_data = response_data.get("query", {})
+    
+    # Merge is_banking_domain from top level
+    query_data["is_banking_domain"] = response_data.get("is_banking_domain")
+    
+    # Fix TimeRange - must update query_data dict directly
+    time_range = query_data.get("time_range")
+    if time_range is not None:  # Only process if time_range is provided
+        if time_range.get("mode") == "relative" and (not time_range.get("last") or not time_range.get("unit")):
+            # Set defaults for relative mode
+            time_range["last"] = 180
+            time_range["unit"] = "days"
+            query_data["time_range"] = time_range  # Update the dict
+    
+    # Fix params if it's a string instead of dict
+    if isinstance(query_data.get("params"), str):
+        try:
+            query_data["params"] = json.loads(query_data["params"])
+        except:
+            query_data["params"] = {}
+    
+    logger.debug("query_data before validation: %s", LazyJson(query_data))
+    try:
+        with stage("llm.validate"):
+            return QuerySpec.model_validate(query_data)
+    except Exception as validation_error:
+        logger.info("QuerySpec validation failed", extra={"error": str(validation_error)})
+        raise
+
+
+async def prime_model(system_prompt: str) -> None:
+    """
+    Load the model before the first user message: a one-token completion with the same
+    system prompt and keep_alive as real calls, so the prompt prefix is in the KV cache too.
+    """
+    payload: dict[str, Any] = {
+        "model": OLLAMA_MODEL,
+        "stream": False,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "hi"},
+        ],
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "max_tokens": 1,                  # /v1/chat/completions
+        "options": {"num_predict": 1},    # /api/chat
+    }
+    with stage("llm.prime"):
+        r = await _client().post(OLLAMA_URL, json=payload)
+        r.raise_for_status()
+
+
+# ----------------------------
+# Circuit breaker
+# ----------------------------
+
+class LlmOverloaded(Exception):
+    """The gateway shed this call; callers fall back to the rules compiler."""
+
+
+class CircuitOpen(LlmOverloaded):
+    """The breaker is open (or half open with its probe in flight)."""
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class BreakerCall:
+    """One admitted call; report its outcome exactly once (later reports are ignored)."""
+
+    __slots__ = ("_breaker", "_t0", "_probe", "_done")
+
+    def __init__(self, breaker: "CircuitBreaker", probe: bool):
+        self._breaker = breaker
+        self._t0 = time.monotonic()
+        self._probe = probe
+        self._done = False
+
+    def finish(self, failed: bool) -> None:
+        """The call returned (failed=False) or raised a transport/HTTP error (failed=True)."""
+        if not self._done:
+            self._done = True
+            slow = time.monotonic() - self._t0 >= self._breaker.slow_call_s
+            self._breaker._record(self._probe, failed, slow)
+
+    def overrun(self) -> None:
+        """A caller's latency budget ran out first: counts as slow, whatever comes later."""
+        if not self._done:
+            self._done = True
+            self._breaker._record(self._probe, False, True)
+
+    def abandon(self) -> None:
+        """No outcome (cancelled); frees the half-open probe."""
+        if not self._done:
+            self._done = True
+            if self._probe:
+                self._breaker._probing = False
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through; outcomes of the last `window_s` seconds are kept. Once
+    `min_calls` are in the window, it opens when `failure_rate` of them failed or
+    `slow_rate` of them were slow (>= slow_call_s, or overran a caller's budget).
+    Open: check() raises CircuitOpen for `open_s` seconds, then the breaker goes half open.
+    Half open: a single probe call goes through; its success closes the breaker (with an
+    empty window), a failure or slow call opens it again.
+    """
+
+    def __init__(self, *, window_s: float, min_calls: int, failure_rate: float,
+                 slow_call_s: float, slow_rate: float, open_s: float):
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_s = open_s
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self._window: Deque[Tuple[float, bool, bool]] = deque()  # (finished at, failed, slow)
+        self._failures = 0
+        self._slow = 0
+        LLM_BREAKER_STATE.set("state", 0)
+
+    def check(self) -> None:
+        """Raise CircuitOpen unless a call may start now."""
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.open_s:
+            self._set_state("half_open")
+        if self.state == "open" or (self.state == "half_open" and self._probing):
+            LLM_BREAKER_EVENTS.inc("rejected")
+            raise CircuitOpen(f"LLM circuit breaker is {self.state}")
+
+    def begin(self) -> BreakerCall:
+        """check(), then start a call (taking the probe slot when half open)."""
+        self.check()
+        probe = self.state == "half_open"
+        if probe:
+            self._probing = True
+            LLM_BREAKER_EVENTS.inc("probe")
+        return BreakerCall(self, probe)
+
+    def _record(self, probe: bool, failed: bool, slow: bool) -> None:
+        now = time.monotonic()
+        if probe:
+            self._probing = False
+            if failed or slow:
+                self._open(now)
             else:
-                # Ollama native format: /api/chat
-                content = response_json["message"]["content"]
-            
-            m = re.search(r"\{.*\}", content, flags=re.S)
-            if not m:
-                raise ValueError("No JSON found in Ollama output")
-            
-            import json
-            response_data = json.loads(m.group(0))
-            print(f"DEBUG - LLM raw JSON response:\n{json.dumps(response_data, indent=2)}")
-            
-            # Extract the nested query structure
-            query_data = response_data.get("query", {})
-            
-            # Merge is_banking_domain from top level
-            query_data["is_banking_domain"] = response_data.get("is_banking_domain")
-            
-            # Fix TimeRange - must update query_data dict directly
-            time_range = query_data.get("time_range")
-            if time_range is not None:  # Only process if time_range is provided
-                if time_range.get("mode") == "relative" and (not time_range.get("last") or not time_range.get("unit")):
-                    # Set defaults for relative mode
-                    time_range["last"] = 180
-                    time_range["unit"] = "days"
-                    query_data["time_range"] = time_range  # Update the dict
-            
-            # Fix params if it's a string instead of dict
-            if isinstance(query_data.get("params"), str):
-                try:
-                    query_data["params"] = json.loads(query_data["params"])
-                except:
-                    query_data["params"] = {}
-            
-            print(f"DEBUG - query_data before validation:\n{json.dumps(query_data, indent=2)}")
-            try:
-                return QuerySpec.model_validate(query_data)
-            except Exception as validation_error:
-                print(f"DEBUG - QuerySpec validation failed: {validation_error}")
-                raise
\ No newline at end of file
+                self._window.clear()
+                self._failures = self._slow = 0
+                self._set_state("closed")
+            return
+        self._window.append((now, failed, slow))
+        self._failures += failed
+        self._slow += slow
+        while self._window and self._window[0][0] < now - self.window_s:
+            _, f, sl = self._window.popleft()
+            self._failures -= f
+            self._slow -= sl
+        n = len(self._window)
+        LLM_BREAKER_STATE.set("window_calls", n)
+        LLM_BREAKER_STATE.set("failure_rate", self._failures / n)
+        LLM_BREAKER_STATE.set("slow_rate", self._slow / n)
+        if self.state == "closed" and n >= self.min_calls and (
+            self._failures >= self.failure_rate * n or self._slow >= self.slow_rate * n
+        ):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._opened_at = now
+        self._set_state("open")
+        logger.warning("LLM circuit breaker opened", extra={
+            "failures": self._failures, "slow": self._slow, "window_calls": len(self._window),
+        })
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            LLM_BREAKER_EVENTS.inc(state)
+        self.state = state
+        LLM_BREAKER_STATE.set("state", _BREAKER_STATES[state])
+
+
+# ----------------------------
+# Gateway: breaker + concurrency limit + single-flight + admission control + budget
+# ----------------------------
+
+class LlmGateway:
+    """
+    Sits in front of query_spec_call_llm:
+    - calls are refused (CircuitOpen) while the breaker is open
+    - at most `max_in_flight` Ollama calls at once; waiting callers get the slots in fair
+      order across accounts (FairQueue), so one account's burst doesn't queue the others
+    - identical normalized messages in flight share one call (single-flight)
+    - at most `max_queue` callers wait for a slot. When the queue is full, the caller is
+      shed (LlmOverloaded) if its account has the most queued calls; otherwise the newest
+      queued call of the account that has the most is shed to make room for it
+    - a caller is also shed when its expected wait already exceeds `max_wait_s`, or
+      when it actually waits that long
+    - a caller's `timeout` (its latency budget) bounds its own wait. A call already at
+      Ollama keeps running for the other callers and for the breaker's statistics; one
+      still queued for a slot is cancelled once its last caller gave up (abandoned)
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait_s: float, breaker: CircuitBreaker):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self.breaker = breaker
+        self._slots = FairQueue("llm", max_in_flight, weights=ACCOUNT_WEIGHTS, fair=SCHEDULER_FAIR)
+        self._in_flight: Dict[Tuple[str, str], "asyncio.Task[QuerySpec]"] = {}
+        self._calls: Dict[Tuple[str, str], BreakerCall] = {}
+        self._callers: Dict["asyncio.Task[QuerySpec]", int] = {}  # callers waiting on each shared call
+        self._avg_call_s = 1.0  # EWMA of LLM call latency, drives the expected-wait check
+
+    async def call(self, system_prompt: str, user_message: str, timeout: Optional[float] = None) -> QuerySpec:
+        key = (prompt_sha(system_prompt), normalize_message(user_message))
+        task = self._in_flight.get(key)
+        leader = task is None
+        if task is None:
+            self.breaker.check()
+            task = asyncio.ensure_future(self._admit_and_call(key, system_prompt, user_message))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._call_done(key, t))
+        else:
+            LLM_GATEWAY_EVENTS.inc("coalesced")
+
+        self._callers[task] = self._callers.get(task, 0) + 1
+        try:
+            spec = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            LLM_GATEWAY_EVENTS.inc("shed_budget")
+            call = self._calls.get(key)
+            if call is not None:  # already calling Ollama, not just queued
+                call.overrun()
+            raise LlmOverloaded(f"no LLM answer within the {timeout}s budget")
+        finally:
+            self._caller_left(key, task)
+        return spec if leader else spec.model_copy(deep=True)
+
+    def _caller_left(self, key: Tuple[str, str], task: "asyncio.Task[QuerySpec]") -> None:
+        n = self._callers[task] - 1
+        if n > 0:
+            self._callers[task] = n
+            return
+        del self._callers[task]
+        if not task.done() and key not in self._calls:
+            # Nobody waits for the answer and Ollama wasn't called yet: leave the queue
+            task.cancel()
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+            LLM_GATEWAY_EVENTS.inc("abandoned")
+
+    def _call_done(self, key: Tuple[str, str], task: "asyncio.Task[QuerySpec]") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller gave up on it
+
+    async def _admit_and_call(self, key: Tuple[str, str], system_prompt: str, user_message: str) -> QuerySpec:
+        import httpx
+
+        await self._admit()
+        try:
+            call = self.breaker.begin()  # may have opened while we queued
+        except CircuitOpen:
+            self._slots.release()
+            raise
+        LLM_GATEWAY_EVENTS.inc("admitted")
+
+        self._calls[key] = call
+        LLM_GATEWAY_STATE.inc("in_flight")
+        call_t0 = time.perf_counter()
+        try:
+            spec = await query_spec_call_llm(system_prompt, user_message)
+            call.finish(failed=False)
+            return spec
+        except httpx.HTTPError:
+            call.finish(failed=True)
+            raise
+        except Exception:
+            # Ollama answered but the output was unusable: a model problem, not an outage
+            call.finish(failed=False)
+            raise
+        finally:
+            call.abandon()
+            del self._calls[key]
+            self._avg_call_s = 0.8 * self._avg_call_s + 0.2 * (time.perf_counter() - call_t0)
+            LLM_GATEWAY_STATE.dec("in_flight")
+            self._slots.release()
+
+    async def _admit(self) -> None:
+        """Take an LLM slot, or raise LlmOverloaded."""
+        tenant = current_tenant()
+        if not self._slots.locked():
+            await self._slots.acquire(tenant)  # free slot: returns without yielding
+            LLM_QUEUE_WAIT_SECONDS.observe("admitted", 0.0)
+            return
+
+        expected_wait = (self._slots.ahead_of(tenant) + 1) / self.max_in_flight * self._avg_call_s
+        if expected_wait > self.max_wait_s:
+            LLM_GATEWAY_EVENTS.inc("shed_expected_wait")
+            raise LlmOverloaded(f"expected LLM wait {expected_wait:.1f}s exceeds {self.max_wait_s}s")
+        if self._slots.waiting_total >= self.max_queue:
+            # Full: the account with the most queued calls gives up its newest one, which is
+            # this caller if that account is its own
+            heaviest = self._slots.most_waiting()
+            if heaviest is None or self._slots.waiting(tenant) >= self._slots.waiting(heaviest):
+                LLM_GATEWAY_EVENTS.inc("shed_queue_full")
+                raise LlmOverloaded("LLM queue full")
+            self._slots.shed_newest(heaviest)
+
+        LLM_GATEWAY_STATE.set("queued", self._slots.waiting_total + 1)
+        t0 = time.perf_counter()
+        try:
+            # In this task, not wait_for's: the wait is queued before any other caller runs
+            async with asyncio.timeout(self.max_wait_s):
+                await self._slots.acquire(tenant)
+        except asyncio.TimeoutError:
+            LLM_QUEUE_WAIT_SECONDS.observe("shed", time.perf_counter() - t0)
+            LLM_GATEWAY_EVENTS.inc("shed_deadline")
+            raise LlmOverloaded(f"waited {self.max_wait_s}s for an LLM slot")
+        except Preempted:
+            LLM_QUEUE_WAIT_SECONDS.observe("shed", time.perf_counter() - t0)
+            LLM_GATEWAY_EVENTS.inc("shed_preempted")
+            raise LlmOverloaded("LLM queue full: made room for another account") from None
+        finally:
+            LLM_GATEWAY_STATE.set("queued", self._slots.waiting_total)
+        LLM_QUEUE_WAIT_SECONDS.observe("admitted", time.perf_counter() - t0)
+
+
+LLM_BREAKER = CircuitBreaker(
+    window_s=LLM_BREAKER_WINDOW_S,
+    min_calls=LLM_BREAKER_MIN_CALLS,
+    failure_rate=LLM_BREAKER_FAILURE_RATE,
+    slow_call_s=LLM_BREAKER_SLOW_CALL_S,
+    slow_rate=LLM_BREAKER_SLOW_RATE,
+    open_s=LLM_BREAKER_OPEN_S,
+)
+LLM_GATEWAY = LlmGateway(LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE, LLM_MAX_WAIT_S, LLM_BREAKER)
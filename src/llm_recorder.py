@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# JSONL recording of real LLM exchanges, replayed by benchmarks/fake_ollama.py.
+# Two record types:
+#   {"type": "prompt", "prompt_sha": ..., "prompt": <system prompt text>}      (once per distinct prompt)
+#   {"type": "exchange", "ts", "model", "url", "prompt_sha", "message", "content", "latency_ms"}
+
+
+@functools.lru_cache(maxsize=8)
+def prompt_sha(system_prompt: str) -> str:
+    # Keys every gateway call; the few prompt variants are hashed once
+    return hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+
+
+def normalize_message(message: str) -> str:
+    """Key used to match a replayed request to a recorded one."""
+    return " ".join(message.lower().split())
+
+
+class LlmRecorder:
+    def __init__(self, path: Path):
+        self.path = path
+        self._seen_prompts: Set[str] = set()
+        self._lock = threading.Lock()
+        if path.exists():
+            for rec in _read(path):
+                if rec.get("type") == "prompt":
+                    self._seen_prompts.add(rec["prompt_sha"])
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            with open(self.path, "a") as f:
+                for rec in records:
+                    f.write(json.dumps(rec) + "\n")
+
+    async def record(self, *, system_prompt: str, message: str, model: str, url: str,
+                     content: str, latency_s: float) -> None:
+        sha = prompt_sha(system_prompt)
+        records: List[Dict[str, Any]] = []
+        if sha not in self._seen_prompts:
+            self._seen_prompts.add(sha)
+            records.append({"type": "prompt", "prompt_sha": sha, "prompt": system_prompt})
+        records.append({
+            "type": "exchange",
+            "ts": time.time(),
+            "model": model,
+            "url": url,
+            "prompt_sha": sha,
+            "message": message,
+            "content": content,
+            "latency_ms": round(latency_s * 1000, 1),
+        })
+        # File I/O off the event loop
+        await asyncio.to_thread(self._append, records)
+
+
+def _read(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_recording(path: Path) -> Tuple[Dict[str, str], Dict[Tuple[str, str], List[Dict[str, Any]]]]:
+    """
+    Returns (prompts by sha, exchanges keyed by (prompt_sha, normalized message)).
+    A key can hold several exchanges (same message recorded more than once).
+    """
+    prompts: Dict[str, str] = {}
+    exchanges: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for rec in _read(path):
+        if rec.get("type") == "prompt":
+            prompts[rec["prompt_sha"]] = rec["prompt"]
+        elif rec.get("type") == "exchange":
+            exchanges.setdefault((rec["prompt_sha"], normalize_message(rec["message"])), []).append(rec)
+    return prompts, exchanges
+
+
+def recorder_from_env(path: Optional[str]) -> Optional[LlmRecorder]:
+    return LlmRecorder(Path(path)) if path else None
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a field
+_STD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_LISTENER: Optional[QueueListener] = None
+
+
+class LazyJson:
+    """Defers json.dumps until the record is actually formatted (i.e. the level is enabled)."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, default=str)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues a copy of the record as is. The stock prepare() formats the message on the
+    calling thread (rendering LazyJson there) and drops exc_info, so the listener's
+    formatter would never see the traceback.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json") -> None:
+    """
+    Route all src.* loggers through a queue. Message and `extra=` formatting (LazyJson
+    included), tracebacks and the stdout write happen on the QueueListener thread, off the
+    event loop, so they see objects as they are by then: log snapshots, not live state.
+    Idempotent.
+    """
+    global _LISTENER
+    if _LISTENER is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == "text":
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger("src")
+    root.setLevel(level)
+    root.addHandler(_DeferredQueueHandler(q))
+    root.propagate = False
+
+    _LISTENER = QueueListener(q, stream, respect_handler_level=False)
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Loggers live under the `src` namespace so setup_logging() covers them."""
+    if not name.startswith("src"):
+        name = f"src.{name}"
+    return logging.getLogger(name)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .schemas import MerchantHistory, Transaction
+
+
+class _Series:
+    """
+    One merchant's rows in one direction, oldest first, with running statistics:
+    cum_cents[k] is the total of rows[:k]; low[k] / high[k] the smallest / largest
+    amount among rows[:k + 1]; cards / rails map a card last4 or payment rail to the
+    position of its first use. So "everything before rows[k]" is a handful of lookups.
+    """
+
+    __slots__ = ("rows", "cum_cents", "low", "high", "cards", "rails")
+
+    def __init__(self, rows: List[Transaction]):
+        cents = [round(tx.amount * 100) for tx in rows]
+        self.rows = rows
+        self.cum_cents = list(accumulate(cents, initial=0))
+        self.low = list(accumulate(cents, min))
+        self.high = list(accumulate(cents, max))
+        self.cards = _first_use([tx.cardLast4 for tx in rows])
+        self.rails = _first_use([tx.paymentRail for tx in rows])
+
+
+def _first_use(values: List[Optional[str]]) -> Dict[str, int]:
+    """value -> index of its first occurrence (None skipped)."""
+    first = dict(zip(reversed(values), range(len(values) - 1, -1, -1)))
+    first.pop(None, None)
+    return first
+
+
+class MerchantIndex:
+    """
+    Per-merchant history of an account: rows grouped by (merchant name, direction)
+    and transaction id -> series / position maps. Built once per load in O(n); find()
+    and history() do not scan the account.
+    """
+
+    def __init__(self, rows: Sequence[Transaction]):
+        """rows newest first (the store's time index)."""
+        grouped: Dict[Tuple[str, str], List[Transaction]] = {}
+        for tx in reversed(rows):
+            key = (tx.merchant.name.lower(), tx.direction)
+            group = grouped.get(key)
+            if group is None:
+                group = grouped[key] = []
+            group.append(tx)
+        self._series: Dict[str, _Series] = {}
+        self._position: Dict[str, int] = {}
+        for group in grouped.values():
+            series = _Series(group)
+            ids = [tx.id for tx in group]
+            self._series.update(dict.fromkeys(ids, series))
+            self._position.update(zip(ids, range(len(ids))))
+
+    def find(self, tx_id: str) -> Optional[Transaction]:
+        series = self._series.get(tx_id)
+        return series.rows[self._position[tx_id]] if series is not None else None
+
+    def history(self, tx_id: str) -> Optional[MerchantHistory]:
+        """What was seen at the transaction's merchant (same direction) before it; None if unknown id."""
+        series = self._series.get(tx_id)
+        if series is None:
+            return None
+        k = self._position[tx_id]
+        tx = series.rows[k]
+        total = series.cum_cents[k]
+        return MerchantHistory(
+            transactionId=tx.id,
+            merchant=tx.merchant.name,
+            direction=tx.direction,
+            priorCount=k,
+            priorTotal=total / 100,
+            priorMean=round(total / k) / 100 if k else None,
+            priorMin=series.low[k - 1] / 100 if k else None,
+            priorMax=series.high[k - 1] / 100 if k else None,
+            firstSeen=series.rows[0].dateIso if k else None,
+            lastSeen=series.rows[k - 1].dateIso if k else None,
+            laterCount=len(series.rows) - k - 1,
+            cardSeenBefore=series.cards[tx.cardLast4] < k if tx.cardLast4 else None,
+            railSeenBefore=series.rails[tx.paymentRail] < k if tx.paymentRail else None,
+        )
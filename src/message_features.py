@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, cast
+
+from src.schemas import TimeRange, TimeUnit
+
+# ----------------------------
+# Single-pass message matcher
+# ----------------------------
+# Everything _compile_rules and the compile_queryspec fixes look for, in one compiled
+# pattern. Each alternative sits inside a lookahead so finditer tries every position and
+# overlapping hits are all reported (e.g. "transaction" inside "10 transactions"). At any
+# one position the alternatives are mutually exclusive, except keywords that are prefixes
+# of longer keywords; those are listed longest-first and implied via _KEYWORD_PREFIXES.
+
+# Substring checks (same semantics as `kw in text`)
+_KEYWORDS = [
+    "don't recognize", "dont recognize", "unrecognized", "what is this",
+    "charge", "transaction", "recurring", "subscription",
+    "top", "spend", "year to date", "year", "ytd",
+    "this year", "this month", "last month", "last week",
+    "trend", "over time", "per day", "by day", "daily", "per week", "by week", "weekly",
+    "per month", "by month", "monthly",
+]
+_KEYWORDS.sort(key=len, reverse=True)
+_KEYWORD_PREFIXES = {kw: frozenset(k for k in _KEYWORDS if kw.startswith(k)) for kw in _KEYWORDS}
+
+_UNITS = {
+    "day": "days", "days": "days",
+    "week": "weeks", "weeks": "weeks",
+    "month": "months", "months": "months",
+    "year": "years", "years": "years",
+}
+
+# Merchant words after "at"/"from" ("spend at whole foods this year") or between "my" and
+# a noun like "charges" ("my uber charges"). A candidate with a digit or any word below
+# is not a merchant but a way to narrow the list ("from last month", "my latest 10
+# transactions", "my debit transactions", "at night")
+_SEARCH_WORD = r"[a-z0-9&'.\-]+"
+_SEARCH_END = r"charges?|transactions?|purchases?|payments?|bills?|orders?|rides?|trips?"
+_NOT_MERCHANT = frozenset({
+    # function words
+    "a", "an", "the", "my", "me", "your", "this", "that", "last", "past", "previous", "next",
+    "all", "any", "each", "every", "other", "some", "most", "top",
+    # order and size
+    "recent", "latest", "newest", "oldest", "earliest", "first", "new", "old",
+    "big", "bigger", "biggest", "large", "larger", "largest", "huge", "small", "smaller",
+    "smallest", "high", "higher", "highest", "low", "lower", "lowest", "expensive", "cheap",
+    "cheapest", "unusual", "suspicious", "unknown", "weird", "regular", "frequent",
+    # channel, direction and status
+    "online", "in-store", "foreign", "international", "domestic", "cash", "atm", "contactless",
+    "card", "bank", "account", "debit", "debits", "credit", "credits", "incoming", "outgoing",
+    "refund", "refunds", "refunded", "deposit", "deposits", "withdrawal", "withdrawals",
+    "pending", "posted", "cleared", "declined", "failed", "reversed", "disputed",
+    "recurring", "monthly", "weekly", "daily", "yearly", "annual",
+    # dates and times of day
+    "today", "yesterday", "tonight", "morning", "afternoon", "evening", "night", "midnight",
+    "weekend", "weekends", "weekday", "weekdays",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug",
+    "sep", "sept", "oct", "nov", "dec",
+})
+
+_MATCHER = re.compile(
+    "(?=(?:"
+    r"(?P<rel>\b(?:last|past|previous)\s+(\d+)\s+(day|days|week|weeks|month|months|year|years)\b)"
+    r"|(?P<limit_verb>\b(?:give\s+me|show\s+me|show|last|recent|my|need|want)\s+(\d+)\s+transactions?\b)"
+    r"|(?P<limit>\b(\d+)\s+transactions?\b)"
+    r"|(?P<tx_id>\bt\d{3}\b)"
+    rf"|(?P<search_at>\b(?:at|from)\s+({_SEARCH_WORD}(?:\s+{_SEARCH_WORD})*?)"
+    rf"(?=\s+(?:{_SEARCH_END}|this|last|past|in|on|since|during|over|for|between|so\s+far)\b|\s*[?!,;]|\s*\.(?:\s|$)|\s*$))"
+    rf"|(?P<search_my>\bmy\s+([a-z]{_SEARCH_WORD}(?:\s+{_SEARCH_WORD})*?)\s+(?:{_SEARCH_END})\b)"
+    "|(?P<kw>" + "|".join(re.escape(k) for k in _KEYWORDS) + ")"
+    "))"
+)
+
+
+@dataclass(frozen=True)
+class MessageFeatures:
+    """What a lowercased message mentions; built by extract_features()."""
+
+    keywords: FrozenSet[str]
+    rel_last: Optional[int] = None       # first "last|past|previous N <unit>"
+    rel_unit: Optional[str] = None
+    limit: Optional[int] = None          # count of transactions asked for
+    tx_id: Optional[str] = None          # first id like t007
+    search_term: Optional[str] = None    # first merchant-like phrase ("whole foods")
+
+    def has(self, *keywords: str) -> bool:
+        """True if any of the keywords occurs in the message."""
+        return any(k in self.keywords for k in keywords)
+
+    @property
+    def time_range_fields(self) -> Optional[Dict[str, Any]]:
+        """TimeRange fields for the time phrase in the message, or None."""
+        if self.has("this year", "ytd", "year to date"):
+            return {"mode": "preset", "preset": "ytd"}
+        if self.has("this month"):
+            return {"mode": "preset", "preset": "this_month"}
+        if self.has("last month"):
+            return {"mode": "preset", "preset": "last_month"}
+        # Handle "last week" without a number
+        if self.has("last week"):
+            return {"mode": "relative", "last": 1, "unit": "weeks"}
+        if self.rel_last is None:
+            return None
+        return {"mode": "relative", "last": self.rel_last, "unit": cast(TimeUnit, self.rel_unit)}
+
+    @property
+    def time_range(self) -> Optional[TimeRange]:
+        """A fresh TimeRange for the time phrase in the message, or None."""
+        fields = self.time_range_fields
+        return TimeRange(**fields) if fields is not None else None
+
+    @property
+    def granularity(self) -> Optional[str]:
+        """Bucket size a spending trend question asks for ("per month", "weekly"...), or None."""
+        if self.has("per day", "by day", "daily"):
+            return "day"
+        if self.has("per week", "by week", "weekly"):
+            return "week"
+        if self.has("per month", "by month", "monthly"):
+            return "month"
+        return None
+
+    @property
+    def asks_trend(self) -> bool:
+        """Spending over time: "spending trend", "spend per month", "daily spending"..."""
+        return self.has("trend", "over time") or (self.has("spend") and self.granularity is not None)
+
+    @property
+    def has_time_phrase(self) -> bool:
+        return self.has("this year", "ytd", "year to date", "this month", "last month", "last week") or self.rel_last is not None
+
+
+def extract_features(text: str) -> MessageFeatures:
+    """Scan a lowercased message once and collect everything the rules need."""
+    keywords: set[str] = set()
+    rel: Optional[re.Match[str]] = None
+    limit_verb: Optional[int] = None
+    limit: Optional[int] = None
+    tx_id: Optional[str] = None
+    search_term: Optional[str] = None
+
+    for m in _MATCHER.finditer(text):
+        kind = m.lastgroup
+        if kind == "kw":
+            keywords |= _KEYWORD_PREFIXES[m.group("kw")]
+        elif kind == "rel":
+            if rel is None:
+                rel = m
+        elif kind == "limit_verb":
+            if limit_verb is None:
+                limit_verb = int(m.group(m.re.groupindex["limit_verb"] + 1))
+        elif kind == "limit":
+            if limit is None:
+                limit = int(m.group(m.re.groupindex["limit"] + 1))
+        elif kind == "tx_id":
+            if tx_id is None:
+                tx_id = m.group("tx_id")
+        elif kind in ("search_at", "search_my"):
+            if search_term is None:
+                search_term = _merchant_phrase(m.group(m.re.groupindex[kind] + 1))
+
+    rel_last = rel_unit = None
+    if rel is not None:
+        i = _MATCHER.groupindex["rel"]
+        rel_last = int(rel.group(i + 1))
+        rel_unit = _UNITS[rel.group(i + 2)]
+
+    return MessageFeatures(
+        keywords=frozenset(keywords),
+        rel_last=rel_last,
+        rel_unit=rel_unit,
+        limit=limit_verb if limit_verb is not None else limit,
+        tx_id=tx_id,
+        search_term=search_term,
+    )
+
+
+def _merchant_phrase(phrase: str) -> Optional[str]:
+    words = [w.strip(".'-&") for w in phrase.split()]
+    if not all(words) or any(w in _NOT_MERCHANT or any(c.isdigit() for c in w) for w in words):
+        return None
+    return " ".join(phrase.split()).strip(".'-&")
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import functools
+import io
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# ----------------------------
+# Prometheus-style histograms
+# ----------------------------
+
+_DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a single label, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Tuple[float, ...] = _DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series: Dict[str, List[float]] = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._series[label_value] = series
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for value, series in items:
+            lbl = f'{self.label}="{value}"'
+            for i, upper in enumerate(self.buckets):
+                lines.append(f'{self.name}_bucket{{{lbl},le="{upper}"}} {int(series[i])}')
+            lines.append(f'{self.name}_bucket{{{lbl},le="+Inf"}} {int(series[-2])}')
+            lines.append(f"{self.name}_sum{{{lbl}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{lbl}}} {int(series[-2])}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    """Monotonic counter with a single label."""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0.0) + amount
+
+    def value(self, label_value: str) -> float:
+        return self._values.get(label_value, 0.0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f'{self.name}{{{self.label}="{k}"}} {int(v)}' for k, v in items]
+        return "\n".join(lines) + "\n"
+
+
+class Gauge:
+    """Point-in-time values with a single label; set/inc/dec by the owner."""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, label_value: str, value: float) -> None:
+        with self._lock:
+            self._values[label_value] = value
+
+    def inc(self, label_value: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0.0) + amount
+
+    def dec(self, label_value: str, amount: float = 1.0) -> None:
+        self.inc(label_value, -amount)
+
+    def value(self, label_value: str) -> float:
+        return self._values.get(label_value, 0.0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f'{self.name}{{{self.label}="{k}"}} {v:g}' for k, v in items]
+        return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram("chat_stage_duration_seconds", "Time spent per pipeline stage", label="stage")
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "End-to-end HTTP request time", label="path")
+
+_REGISTRY: List[Any] = [STAGE_SECONDS, REQUEST_SECONDS]
+
+
+def register(metric: Any) -> Any:
+    """Add a Histogram/Counter/Gauge to the /metrics output; returns it for module-level assignment."""
+    _REGISTRY.append(metric)
+    return metric
+
+
+def render_prometheus() -> str:
+    return "".join(h.render() for h in _REGISTRY)
+
+
+# ----------------------------
+# Request-scoped stage timers
+# ----------------------------
+
+# (stage, seconds) pairs for the current request; None outside a request scope
+_REQUEST_TIMINGS: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    """Open a timing scope; tasks spawned afterwards share the returned list."""
+    timings: List[Tuple[str, float]] = []
+    _REQUEST_TIMINGS.set(timings)
+    return timings
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(name, seconds)
+    timings = _REQUEST_TIMINGS.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator form of stage() for sync functions (compute handlers)."""
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Format timings as a Server-Timing header value (durations in ms)."""
+    parts = [f"{name.replace('.', '-')};dur={seconds * 1000:.1f}" for name, seconds in timings]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# ----------------------------
+# Opt-in per-request profiler
+# ----------------------------
+
+_MAX_PROFILES = 20
+_PROFILES: "OrderedDict[str, str]" = OrderedDict()
+# cProfile is process-wide for the event loop thread: profile one request at a time
+_PROFILER_LOCK = threading.Lock()
+
+
+class RequestProfiler:
+    """
+    Wraps one request in cProfile. Coroutines of other in-flight requests running
+    on the same loop are included in the report too; use it on a quiet instance.
+    """
+
+    def __init__(self) -> None:
+        # Imported here: only profiled requests need it, not process start
+        import cProfile
+
+        self._profile = cProfile.Profile()
+        self.active = False
+
+    def __enter__(self) -> "RequestProfiler":
+        self.active = _PROFILER_LOCK.acquire(blocking=False)
+        if self.active:
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self.active:
+            self._profile.disable()
+            _PROFILER_LOCK.release()
+
+    def save(self, limit: int = 40) -> Optional[str]:
+        """Store the report and return its id (None if this request wasn't profiled)."""
+        if not self.active:
+            return None
+        import pstats
+        import uuid
+
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        profile_id = uuid.uuid4().hex[:12]
+        _PROFILES[profile_id] = out.getvalue()
+        while len(_PROFILES) > _MAX_PROFILES:
+            _PROFILES.popitem(last=False)
+        return profile_id
+
+
+def get_profile(profile_id: str) -> Optional[str]:
+    return _PROFILES.get(profile_id)
@@ -1,34 +1,155 @@
 from __future__ import annotations
 
-import json
-from pathlib import Path
-from typing import Dict, List, Optional
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import islice
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-from .schemas import Transaction
+from .config import DATA_DIR
+from .merchant_index import MerchantIndex
+from .schemas import TRANSACTIONS_ADAPTER, MerchantHistory, Transaction
+from .search_index import SearchIndex
+from .spend_index import DailySpend
 
-_DATA_DIR = Path(__file__).resolve().parents[1]
-_CACHE: Dict[str, List[Transaction]] = {}
+
+class _TimeIndex:
+    """
+    An account's rows newest first (stable sort on postedAt, the tool API's order)
+    with bisect keys on the day ordinal, so a date range is a slice instead of a scan.
+    """
+
+    def __init__(self, transactions: List[Transaction]):
+        self.rows = sorted(transactions, key=lambda tx: tx.postedAt, reverse=True)
+        self.neg_ords = [-tx.dateOrdinal for tx in self.rows]
+        # Day ordinals follow postedAt unless timestamps mix UTC offsets; then scan instead
+        self.sorted_by_day = all(a <= b for a, b in zip(self.neg_ords, self.neg_ords[1:]))
+
+    def between(self, start: Optional[date], end: Optional[date]) -> List[Transaction]:
+        """Rows dated start..end (inclusive; None = open), newest first."""
+        if start is None and end is None:
+            return self.rows
+        if not self.sorted_by_day:
+            return [tx for tx in self.rows if self.contains(tx, start, end)]
+        i, j = self.span(start, end)
+        return self.rows[i:j]
+
+    def span(self, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        """rows[i:j] are dated start..end (only when sorted_by_day)."""
+        i = bisect_left(self.neg_ords, -end.toordinal()) if end is not None else 0
+        j = bisect_right(self.neg_ords, -start.toordinal()) if start is not None else len(self.rows)
+        return i, j
+
+    @staticmethod
+    def contains(tx: Transaction, start: Optional[date], end: Optional[date]) -> bool:
+        return (start is None or start.toordinal() <= tx.dateOrdinal) and (end is None or tx.dateOrdinal <= end.toordinal())
+
+
+class _Loaded(NamedTuple):
+    version: str
+    transactions: List[Transaction]
+    index: _TimeIndex
+    spend: DailySpend
+    search: SearchIndex      # over index.rows
+    merchants: MerchantIndex # over index.rows
+
+
+_CACHE: Dict[str, _Loaded] = {}
+
+def data_version(account_id: str) -> str:
+    """
+    Changes whenever the account's data file changes ("" if there is none).
+    Served to the orchestrator so it can tell when its fetch cache is stale.
+    """
+    try:
+        st = (DATA_DIR / f"txns_{account_id}.json").stat()
+    except FileNotFoundError:
+        return ""
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def _load(account_id: str) -> _Loaded:
+    """Loaded data for the account; reloads the file when its version changed."""
+    version = data_version(account_id)
+    cached = _CACHE.get(account_id)
+    if cached is not None and cached.version == version:
+        return cached
+    if not version:
+        return _Loaded(version, [], _TimeIndex([]), DailySpend.build([]), SearchIndex([]), MerchantIndex([]))
+    # Single validation point for store data: parse + validate the raw bytes in one pass
+    file_path = DATA_DIR / f"txns_{account_id}.json"
+    transactions = TRANSACTIONS_ADAPTER.validate_json(file_path.read_bytes())
+    spend = None
+    if cached is not None and transactions[:len(cached.transactions)] == cached.transactions:
+        # Rows were only appended: extend the running totals instead of rebuilding them
+        spend = cached.spend.extended(transactions[len(cached.transactions):])
+    if spend is None:
+        spend = DailySpend.build(transactions)
+    index = _TimeIndex(transactions)
+    loaded = _Loaded(version, transactions, index, spend, SearchIndex(index.rows), MerchantIndex(index.rows))
+    _CACHE[account_id] = loaded
+    return loaded
 
 def get_transactions(account_id: str) -> List[Transaction]:
-    if account_id in _CACHE:
-        return _CACHE[account_id]
-    file_path = _DATA_DIR / f"data/txns_{account_id}.json"
-    if not file_path.exists():
-        return []
-    with open(file_path, "r") as f:
-        tx_list = json.load(f)
-    transactions = [Transaction.model_validate(tx) for tx in tx_list]
-    _CACHE[account_id] = transactions
-    return transactions
+    return _load(account_id).transactions
+
+def read_transactions(
+    account_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    include_pending: bool = True,
+    limit: Optional[int] = None,
+) -> Tuple[str, List[Transaction]]:
+    """
+    (data version, newest-first rows dated start..end), read from the time index.
+    Without start/end this is a newest-N read over the whole history.
+    """
+    loaded = _load(account_id)
+    rows = loaded.index.between(start, end)
+    if include_pending:
+        return loaded.version, rows[:limit]
+    posted = (tx for tx in rows if not tx.isPending)
+    return loaded.version, list(islice(posted, limit))
+
+def search_transactions(
+    account_id: str,
+    query: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    include_pending: bool = True,
+    merchant_only: bool = False,
+) -> Tuple[str, List[Transaction]]:
+    """
+    (data version, newest-first rows dated start..end whose merchant name, category,
+    subcategory or description match every word of `query`; with merchant_only, whose
+    merchant name does), from the search index: the work is proportional to the posting
+    lists, not to the rows in the range.
+    """
+    loaded = _load(account_id)
+    index = loaded.index
+    positions = loaded.search.match(query, merchant_only)
+    if start is not None or end is not None:
+        if index.sorted_by_day:
+            i, j = index.span(start, end)
+            positions = positions[bisect_left(positions, i):bisect_left(positions, j)]
+        else:
+            positions = [p for p in positions if index.contains(index.rows[p], start, end)]
+    rows = [index.rows[p] for p in positions]
+    if not include_pending:
+        rows = [tx for tx in rows if not tx.isPending]
+    return loaded.version, rows
+
+def spending(account_id: str) -> Tuple[str, DailySpend]:
+    """(data version, running daily totals of posted debits) for the account."""
+    loaded = _load(account_id)
+    return loaded.version, loaded.spend
 
 def find_transaction(account_id: str, tx_id: str) -> Optional[Transaction]:
-    transactions = get_transactions(account_id)
-    for tx in transactions:
-        if tx.id == tx_id:
-            return tx
-    return None
+    return _load(account_id).merchants.find(tx_id)
+
+def merchant_history(account_id: str, tx_id: str) -> Optional[MerchantHistory]:
+    """Count, amount range and card / rail use at the transaction's merchant before it (None if unknown id)."""
+    return _load(account_id).merchants.history(tx_id)
 
 if __name__ == "__main__":
     txns = get_transactions("A123")
     print(f"Loaded {len(txns)} transactions for account A123")
-    tx = find_transaction("A123", "t002")
\ No newline at end of file
+    tx = find_transaction("A123", "t002")
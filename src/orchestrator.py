@@ -1,38 +1,289 @@
-from typing import List
-import httpx
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Awaitable, Dict, Iterable, List, Optional, Sequence, Tuple
 
-from src.config import TOOL_BASE_URL
+from src.config import (
+    ACCOUNT_WEIGHTS,
+    COMPUTE_OFFLOAD_MIN_ROWS,
+    COMPUTE_THREADS,
+    FETCH_CACHE_MAX_ROWS,
+    FETCH_CACHE_REVALIDATE_S,
+    FETCH_MAX_IN_FLIGHT,
+    SCHEDULER_FAIR,
+    SESSION_MAX,
+    SESSION_MAX_ROWS,
+    SESSION_TTL_S,
+    TOOL_BASE_URL,
+    TOOL_WIRE_FORMAT,
+)
 from src.compute import (
+    HANDLER_FIELDS,
+    handle_merchant_search,
     handle_recurring_payments,
+    handle_result_page,
+    handle_spending_trend,
     handle_top_spending_ytd,
     handle_transactions_list,
     handle_unrecognized_transaction,
-    resolve_time_range
+    resolve_time_range,
+    trend_window,
 )
+from src.fetch_cache import FetchCache
+from src.metrics import stage
 from src.query_spec_builder import compile_queryspec
-from src.schemas import ChatRequest, ChatResponse, Transaction, UIMessage, UISpec
+from src.scheduler import FairQueue
+from src.sessions import LIST_INTENTS, SESSION_EVENTS, FollowUp, Session, SessionStore, parse_follow_up
+from src.schemas import (
+    TRANSACTIONS_ADAPTER,
+    ChatBatchRequest,
+    ChatBatchResponse,
+    ChatRequest,
+    ChatResponse,
+    ConversationContext,
+    Granularity,
+    MerchantHistory,
+    QuerySpec,
+    SpendingSeries,
+    TimeRange,
+    Transaction,
+    TransactionSearch,
+    UIMessage,
+    UISpec,
+)
+from src.wire import BINARY_MEDIA_TYPE, decode_columns, decode_columns_binary, format_fields
+
+if TYPE_CHECKING:
+    import httpx
+
+# /tool/transactions page sizes: what a plain fetch gets, and the most one call can return
+TOOL_DEFAULT_LIMIT = 500
+TOOL_MAX_LIMIT = 5000
+# Most rows one /tool/search call returns (its matched count covers every match)
+SEARCH_MAX_LIMIT = 500
+# Binary columns if the tool API offers them, else whatever JSON it sends
+_TRANSACTIONS_ACCEPT = f"{BINARY_MEDIA_TYPE}, application/json;q=0.5" if TOOL_WIRE_FORMAT == "binary" else "application/json"
 
 # ----------------------------
 # Tool calls
 # ----------------------------
 
-async def tool_get_transactions(account_id: str, start: str, end: str) -> List[Transaction]:
-    """Fetch transactions from the tool API."""
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(f"{TOOL_BASE_URL}/tool/transactions", params={
-            "accountId": account_id,
-            "start": start,
-            "end": end,
-        })
-        r.raise_for_status()
-        return [Transaction.model_validate(x) for x in r.json()]
+_CLIENT: Optional["httpx.AsyncClient"] = None
+# Tool calls in flight, handed out fairly across accounts when they queue
+FETCH_QUEUE = FairQueue("fetch", FETCH_MAX_IN_FLIGHT, weights=ACCOUNT_WEIGHTS, fair=SCHEDULER_FAIR)
+
+
+def _client() -> "httpx.AsyncClient":
+    # One pooled client: building an AsyncClient (SSL context) costs more than a cached fetch.
+    # httpx is imported on first use (the startup warm-up), not at process start
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        import httpx
+
+        _CLIENT = httpx.AsyncClient(timeout=20)
+    return _CLIENT
+
+async def tool_get_transactions(
+    account_id: str,
+    start: Optional[str],
+    end: Optional[str],
+    limit: Optional[int] = None,
+    include_pending: bool = True,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Transaction]:
+    """
+    Fetch transactions from the tool API (newest first, at most `limit`, default
+    TOOL_DEFAULT_LIMIT). start/end None = open bound; both None = newest rows overall.
+    With `fields`, only those are sent (columnar shape); the other fields of the returned
+    rows are placeholders. The body is binary columns when TOOL_WIRE_FORMAT=binary and the
+    tool API supports them.
+    """
+    return (await _tool_get_transactions_page(account_id, start, end, limit, include_pending, fields))[0]
+
+async def _tool_get_transactions_page(
+    account_id: str,
+    start: Optional[str],
+    end: Optional[str],
+    limit: Optional[int] = None,
+    include_pending: bool = True,
+    fields: Optional[Sequence[str]] = None,
+) -> Tuple[List[Transaction], str]:
+    """tool_get_transactions plus the data version the rows came from."""
+    params = {"accountId": account_id}
+    if start is not None:
+        params["start"] = start
+    if end is not None:
+        params["end"] = end
+    if limit is not None:
+        params["limit"] = str(limit)
+    if not include_pending:
+        params["includePending"] = "false"
+    if fields is not None:
+        params["fields"] = format_fields(fields)
+        params["shape"] = "columns"
+    # Weighted by page size: a 5000-row read takes a bigger share than a 50-row one
+    async with FETCH_QUEUE.slot(account_id, cost=(limit or TOOL_DEFAULT_LIMIT) / TOOL_DEFAULT_LIMIT):
+        with stage("fetch"):
+            r = await _client().get(
+                f"{TOOL_BASE_URL}/tool/transactions", params=params, headers={"Accept": _TRANSACTIONS_ACCEPT},
+            )
+            r.raise_for_status()
+    with stage("fetch.validate"):
+        if r.headers.get("content-type", "").startswith(BINARY_MEDIA_TYPE):
+            # Typed columns: the decoder checks the layout and builds rows without a validation pass
+            txs = decode_columns_binary(r.content)
+        elif fields is not None:
+            txs = decode_columns(r.content)
+        else:
+            # Validate straight from the response bytes; still a full schema check for external input
+            txs = TRANSACTIONS_ADAPTER.validate_json(r.content)
+    return txs, r.headers.get("x-data-version", "")
+
+async def tool_get_data_version(account_id: str) -> str:
+    """Current data version of an account (see /tool/data-version)."""
+    async with FETCH_QUEUE.slot(account_id):
+        with stage("fetch.version"):
+            r = await _client().get(f"{TOOL_BASE_URL}/tool/data-version", params={"accountId": account_id})
+            r.raise_for_status()
+    return r.json()["version"]
+
+async def tool_get_spending_series(
+    account_id: str,
+    start: date,
+    end: date,
+    granularity: Granularity,
+    category: Optional[str] = None,
+) -> SpendingSeries:
+    """Posted debit totals per bucket for start..end (inclusive), see /tool/spending-series."""
+    params = {"accountId": account_id, "start": start.isoformat(), "end": end.isoformat(), "granularity": granularity}
+    if category:
+        params["category"] = category
+    async with FETCH_QUEUE.slot(account_id):
+        with stage("fetch"):
+            r = await _client().get(f"{TOOL_BASE_URL}/tool/spending-series", params=params)
+            r.raise_for_status()
+    with stage("fetch.validate"):
+        return SpendingSeries.model_validate_json(r.content)
+
+async def tool_search_transactions(
+    account_id: str,
+    query: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = 50,
+    merchant_only: bool = False,
+) -> TransactionSearch:
+    """Newest `limit` rows matching `query` plus count and spend of all matches, see /tool/search."""
+    params = {"accountId": account_id, "q": query, "limit": str(limit)}
+    if merchant_only:
+        params["merchantOnly"] = "true"
+    if start is not None:
+        params["start"] = start.isoformat()
+    if end is not None:
+        params["end"] = end.isoformat()
+    async with FETCH_QUEUE.slot(account_id):
+        with stage("fetch"):
+            r = await _client().get(f"{TOOL_BASE_URL}/tool/search", params=params)
+            r.raise_for_status()
+    with stage("fetch.validate"):
+        return TransactionSearch.model_validate_json(r.content)
 
 async def tool_get_transaction_by_id(account_id: str, tx_id: str) -> Transaction:
     """Fetch a single transaction by ID from the tool API."""
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(f"{TOOL_BASE_URL}/tool/transactions/{tx_id}", params={"accountId": account_id})
-        r.raise_for_status()
-        return Transaction.model_validate(r.json())
+    async with FETCH_QUEUE.slot(account_id):
+        with stage("fetch"):
+            r = await _client().get(f"{TOOL_BASE_URL}/tool/transactions/{tx_id}", params={"accountId": account_id})
+            r.raise_for_status()
+    with stage("fetch.validate"):
+        return Transaction.model_validate_json(r.content)
+
+async def tool_get_merchant_history(account_id: str, tx_id: str) -> MerchantHistory:
+    """Earlier activity at the transaction's merchant, from the tool's merchant index."""
+    async with FETCH_QUEUE.slot(account_id):
+        with stage("fetch"):
+            r = await _client().get(f"{TOOL_BASE_URL}/tool/transactions/{tx_id}/merchant-history", params={"accountId": account_id})
+            r.raise_for_status()
+    with stage("fetch.validate"):
+        return MerchantHistory.model_validate_json(r.content)
+
+# ----------------------------
+# Cached fetch
+# ----------------------------
+
+# Cached rows may be served to any handler, so they carry every field some handler reads
+FETCH_CACHE_FIELDS: Tuple[str, ...] = tuple(sorted({f for fs in HANDLER_FIELDS.values() for f in fs}))
+
+async def _fetch_page(account_id: str, start: date, end: date, limit: int) -> Tuple[List[Transaction], str]:
+    return await _tool_get_transactions_page(
+        account_id, start.isoformat(), end.isoformat(), limit, fields=FETCH_CACHE_FIELDS,
+    )
+
+FETCH_CACHE = FetchCache(
+    _fetch_page,
+    tool_get_data_version,
+    max_rows=FETCH_CACHE_MAX_ROWS,
+    revalidate_s=FETCH_CACHE_REVALIDATE_S,
+    page_limit=TOOL_MAX_LIMIT,
+)
+
+async def fetch_transactions(account_id: str, start: date, end: date, limit: int = TOOL_DEFAULT_LIMIT) -> List[Transaction]:
+    """
+    The rows tool_get_transactions(start, end, limit) returns, served from FETCH_CACHE when
+    enabled. Rows carry FETCH_CACHE_FIELDS only.
+    """
+    if not FETCH_CACHE.enabled:
+        return await tool_get_transactions(account_id, start.isoformat(), end.isoformat(), limit, fields=FETCH_CACHE_FIELDS)
+    with stage("fetch.cache"):
+        return await FETCH_CACHE.get(account_id, start, end, limit)
+
+# ----------------------------
+# Fetch pushdown
+# ----------------------------
+
+@dataclass(frozen=True)
+class FetchPlan:
+    """What a QuerySpec's handler needs from /tool/transactions."""
+
+    start: Optional[date]    # start and end None: newest `limit` rows, no date range
+    end: Optional[date]
+    limit: int = TOOL_DEFAULT_LIMIT
+    include_pending: bool = True
+    fields: Optional[Tuple[str, ...]] = None  # None: every field
+
+    @property
+    def cacheable(self) -> bool:
+        # FETCH_CACHE holds full days of ranged, pending-inclusive reads with FETCH_CACHE_FIELDS
+        return self.start is not None and self.end is not None and self.include_pending and self.fields is not None
+
+def fetch_plan(q: QuerySpec) -> FetchPlan:
+    limit_only = q.params.get("limit_only", False)
+    fields = HANDLER_FIELDS.get(q.intent)
+    if q.intent == "transactions_list":
+        # The handler shows the newest `limit` rows, so that is all the tool has to send
+        limit = min(max(int(q.params.get("limit", 50)), 1), TOOL_MAX_LIMIT)
+        include_pending = bool(q.params.get("include_pending", True))
+        if limit_only and q.time_range is None:
+            return FetchPlan(None, None, limit, include_pending, fields)
+        start_d, end_d = resolve_time_range(q.time_range, limit_only=limit_only)
+        return FetchPlan(start_d, end_d, limit, include_pending, fields)
+    # Aggregating intents read their whole range (up to the tool's default page)
+    start_d, end_d = resolve_time_range(q.time_range, limit_only=limit_only)
+    return FetchPlan(start_d, end_d, fields=fields)
+
+async def fetch_for_plan(account_id: str, plan: FetchPlan) -> List[Transaction]:
+    if plan.cacheable:
+        return await fetch_transactions(account_id, plan.start, plan.end, plan.limit)  # type: ignore[arg-type]
+    # Newest-N and posted-only reads are index reads on the tool side; not cached here
+    return await tool_get_transactions(
+        account_id,
+        plan.start.isoformat() if plan.start else None,
+        plan.end.isoformat() if plan.end else None,
+        limit=plan.limit,
+        include_pending=plan.include_pending,
+        fields=plan.fields,
+    )
 
 # ----------------------------
 # Orchestration logic
@@ -47,51 +298,340 @@ async def orchestrate_chat(req: ChatRequest) -> ChatResponse:
     2. Validate it's a banking domain query
     3. Route based on intent:
        - unrecognized_transaction: needs tx_id
+       - spending_trend: bucket totals from the tool, no transaction rows
+       - merchant_search: matches from the tool's search index
        - others: fetch transactions and compute UI
     4. Return ChatResponse with UI specification
+
+    With a sessionId, a follow-up to the previous list answer ("show me more", "only the
+    pending ones") is answered from that answer's rows, before step 1.
     """
-    q = await compile_queryspec(req.message, req.context)
+    if req.sessionId and SESSIONS.enabled:
+        session = SESSIONS.get(req.sessionId, req.accountId)
+        follow = parse_follow_up(req.message.lower()) if session is not None else None
+        if session is not None and follow is not None:
+            resp = await _follow_up_response(req.sessionId, session, follow)
+            if resp is not None:
+                return resp
+
+    with stage("compile"):
+        q = await compile_queryspec(req.message, req.context)
     
     if not q.is_banking_domain:
+        if req.sessionId:
+            SESSIONS.drop(req.sessionId)
+        return _off_topic_response(q)
+    
+    # 1) Unrecognized transaction (needs tx id from params OR UI context), trend, search:
+    #    answered by their own tool call
+    if q.intent in OWN_TOOL_INTENTS:
+        return await _own_response(q, req.accountId, req.context, req.sessionId)
+
+    # 2) For the other intents: pull just the transactions the handler needs
+    plan = fetch_plan(q)
+    txs = await fetch_for_plan(req.accountId, plan)
+    if req.sessionId:
+        _remember(req.sessionId, req.accountId, q, txs, complete=len(txs) < plan.limit)
+    return ChatResponse(query=q, ui=await compute_ui(q, txs, req.accountId))
+
+
+async def orchestrate_chat_batch(req: ChatBatchRequest) -> ChatBatchResponse:
+    """
+    Several messages for one account in one round trip.
+
+    Flow:
+    1. Compile all messages concurrently
+    2. Merge the resolved date ranges of the intents that need a transaction list
+       into one tool fetch (validated once); newest-N / posted-only reads and the
+       OWN_TOOL_INTENTS calls go on their own, concurrently
+    3. Give each intent the rows a single /chat call would have fetched, and run
+       the handlers in parallel
+    4. Return one ChatResponse per message, in request order
+    """
+    with stage("compile"):
+        specs = await asyncio.gather(*(compile_queryspec(m, req.context) for m in req.messages))
+
+    results: List[Optional[ChatResponse]] = [None] * len(specs)
+    own: List[int] = []
+    plans: Dict[int, FetchPlan] = {}
+    for i, q in enumerate(specs):
+        if not q.is_banking_domain:
+            results[i] = _off_topic_response(q)
+        elif q.intent in OWN_TOOL_INTENTS:
+            own.append(i)
+        else:
+            plans[i] = fetch_plan(q)
+
+    listed, *answered = await asyncio.gather(
+        _listed_responses(req.accountId, specs, plans),
+        *(_own_response(specs[i], req.accountId, req.context) for i in own),
+    )
+    for i, resp in listed.items():
+        results[i] = resp
+    for i, resp in zip(own, answered):
+        results[i] = resp
+
+    return ChatBatchResponse(results=[r for r in results if r is not None])
+
+
+async def _listed_responses(
+    account_id: str,
+    specs: List[QuerySpec],
+    plans: Dict[int, FetchPlan],
+) -> Dict[int, ChatResponse]:
+    """Fetch rows for every spec in `plans` (ranged ones merged), then run the handlers in parallel."""
+    if not plans:
+        return {}
+    ranged = {i: p for i, p in plans.items() if p.cacheable}
+    direct = [i for i in plans if i not in ranged]
+    merged, *fetched = await asyncio.gather(
+        _merged_fetch(account_id, ranged),
+        *(fetch_for_plan(account_id, plans[i]) for i in direct),
+    )
+    slices = {**merged, **dict(zip(direct, fetched))}
+
+    uis = await asyncio.gather(*(compute_ui(specs[i], slices[i], account_id) for i in plans))
+    return {i: ChatResponse(query=specs[i], ui=ui) for i, ui in zip(plans, uis)}
+
+
+async def _merged_fetch(account_id: str, plans: Dict[int, FetchPlan]) -> Dict[int, List[Transaction]]:
+    """One fetch over the union of the plans' ranges, sliced back into each plan's rows."""
+    if not plans:
+        return {}
+    # End dates go to the tool as-is, like orchestrate_chat does (the tool treats end as inclusive)
+    start_d = min(p.start for p in plans.values())  # type: ignore[type-var]
+    end_d = max(p.end for p in plans.values())  # type: ignore[type-var]
+
+    slices: Dict[int, List[Transaction]] = {}
+    if FETCH_CACHE.enabled:
+        # One merged fill; each plan is then a slice of the cache (plus any gap the fill left)
+        await fetch_transactions(account_id, start_d, end_d, limit=TOOL_MAX_LIMIT)
+        for i, p in plans.items():
+            slices[i] = await fetch_for_plan(account_id, p)
+        return slices
+
+    fields = _union_fields(p.fields for p in plans.values())
+    txs = await tool_get_transactions(account_id, start_d.isoformat(), end_d.isoformat(), limit=TOOL_MAX_LIMIT, fields=fields)
+    for i, p in plans.items():
+        # Rows come back newest first, so filtering keeps the order of a per-range fetch
+        s_ord, e_ord = p.start.toordinal(), p.end.toordinal()  # type: ignore[union-attr]
+        slices[i] = [t for t in txs if s_ord <= t.dateOrdinal <= e_ord][:p.limit]
+
+    if len(txs) == TOOL_MAX_LIMIT:
+        # Merged fetch was truncated: a range reaching back to the cut-off day may be
+        # missing rows (unless it already has a full page); fetch those on their own
+        oldest = txs[-1].dateOrdinal
+        short = [i for i, p in plans.items() if p.start.toordinal() <= oldest and len(slices[i]) < p.limit]  # type: ignore[union-attr]
+        refetched = await asyncio.gather(*(fetch_for_plan(account_id, plans[i]) for i in short))
+        slices.update(zip(short, refetched))
+    return slices
+
+
+def _union_fields(field_sets: Iterable[Optional[Tuple[str, ...]]]) -> Optional[Tuple[str, ...]]:
+    union: set = set()
+    for fs in field_sets:
+        if fs is None:
+            return None
+        union.update(fs)
+    return tuple(sorted(union))
+
+
+def _off_topic_response(q: QuerySpec) -> ChatResponse:
+    ui = UISpec(messages=[UIMessage(
+        content="I can help with banking/account questions (transactions, spending, balance). What would you like to check?"
+    )])
+    return ChatResponse(query=q, ui=ui)
+
+
+async def _unrecognized_response(q: QuerySpec, account_id: str, context: Optional[ConversationContext]) -> ChatResponse:
+    tx_id = None
+    if q.params.get("transaction_id"):
+        tx_id = str(q.params["transaction_id"])
+    elif context and context.selectedTransactionId:
+        tx_id = context.selectedTransactionId
+
+    if not tx_id:
         ui = UISpec(messages=[UIMessage(
-            content="I can help with banking/account questions (transactions, spending, balance). What would you like to check?"
+            content="Which transaction do you mean? Please select a transaction row (or provide its transaction id)."
         )])
         return ChatResponse(query=q, ui=ui)
-    
-    # 1) Unrecognized transaction: needs tx id (from params OR UI context)
-    if q.intent == "unrecognized_transaction":
-        tx_id = None
-        if q.params.get("transaction_id"):
-            tx_id = str(q.params["transaction_id"])
-        elif req.context and req.context.selectedTransactionId:
-            tx_id = req.context.selectedTransactionId
-
-        if not tx_id:
-            ui = UISpec(messages=[UIMessage(
-                content="Which transaction do you mean? Please select a transaction row (or provide its transaction id)."
-            )])
-            return ChatResponse(query=q, ui=ui)
-
-        tx = await tool_get_transaction_by_id(req.accountId, tx_id)
-        ui = handle_unrecognized_transaction(tx)
+
+    tx, history = await asyncio.gather(
+        tool_get_transaction_by_id(account_id, tx_id),
+        tool_get_merchant_history(account_id, tx_id),
+    )
+    ui = handle_unrecognized_transaction(tx, history)
+    return ChatResponse(query=q, ui=ui)
+
+
+async def _trend_response(q: QuerySpec, account_id: str) -> ChatResponse:
+    start, end, granularity = trend_window(q)
+    category = q.params.get("category")
+    series = await tool_get_spending_series(
+        account_id, start, end - timedelta(days=1), granularity, str(category) if category else None,
+    )
+    return ChatResponse(query=q, ui=handle_spending_trend(q, series))
+
+
+def _search_window(q: QuerySpec) -> Tuple[Optional[date], Optional[date]]:
+    if q.time_range is None:
+        return None, None
+    start, end_excl = resolve_time_range(q.time_range)
+    return start, end_excl - timedelta(days=1)
+
+
+async def _search_response(q: QuerySpec, account_id: str, session_id: Optional[str] = None) -> ChatResponse:
+    query = str(q.params.get("query") or "").strip()
+    if not query:
+        if session_id:
+            SESSIONS.drop(session_id)
+        ui = UISpec(messages=[UIMessage(content="Which merchant should I look for?")])
         return ChatResponse(query=q, ui=ui)
+    start, end = _search_window(q)
+    limit = min(max(int(q.params.get("limit", 50)), 1), SEARCH_MAX_LIMIT)
+    merchant_only = bool(q.params.get("merchant_only"))
+    result = await tool_search_transactions(account_id, query, start, end, limit, merchant_only)
+    if not result.matched:
+        # A phrase the rules took for a merchant that isn't one ("my grocery transactions",
+        # "from work"), or nothing there: the list answer instead of a dead end
+        return await _list_instead(q, account_id, session_id, None if merchant_only else query)
+    if session_id:
+        _remember(session_id, account_id, q, result.transactions, complete=result.matched <= len(result.transactions))
+    return ChatResponse(query=q, ui=handle_merchant_search(q, result))
 
-    # 2) For the other intents: pull transactions for a single resolved range
-    limit_only = q.params.get("limit_only", False)
-    start_d, end_d = resolve_time_range(q.time_range, limit_only=limit_only)
-    txs = await tool_get_transactions(req.accountId, start_d.isoformat(), end_d.isoformat())
 
-    if q.intent == "transactions_list":
-        ui = handle_transactions_list(q, txs)
-    elif q.intent == "top_spending_ytd":
-        ui = handle_top_spending_ytd(q, txs)
-    elif q.intent == "recurring_payments":
-        ui = handle_recurring_payments(q, txs)
+async def _list_instead(
+    q: QuerySpec, account_id: str, session_id: Optional[str], missed: Optional[str],
+) -> ChatResponse:
+    """The transactions_list answer for a search's time range (last 30 days without one)."""
+    lq = QuerySpec(
+        is_banking_domain=True,
+        intent="transactions_list",
+        time_range=q.time_range or TimeRange(mode="relative", last=30, unit="days"),
+        params={"limit": 50, "include_pending": True},
+    )
+    plan = fetch_plan(lq)
+    txs = await fetch_for_plan(account_id, plan)
+    if session_id:
+        _remember(session_id, account_id, lq, txs, complete=len(txs) < plan.limit)
+    ui = await compute_ui(lq, txs, account_id)
+    if missed:
+        ui.messages.insert(0, UIMessage(
+            content=f"I couldn't find transactions matching **\"{missed}\"**; here are your recent transactions instead."
+        ))
+    return ChatResponse(query=lq, ui=ui)
+
+
+# Intents answered by their own tool call instead of a transaction list
+OWN_TOOL_INTENTS = ("unrecognized_transaction", "spending_trend", "merchant_search")
+
+def _own_response(
+    q: QuerySpec, account_id: str, context: Optional[ConversationContext], session_id: Optional[str] = None,
+) -> Awaitable[ChatResponse]:
+    if q.intent == "merchant_search":
+        return _search_response(q, account_id, session_id)
+    if session_id:
+        SESSIONS.drop(session_id)
+    if q.intent == "spending_trend":
+        return _trend_response(q, account_id)
+    return _unrecognized_response(q, account_id, context)
+
+
+# ----------------------------
+# Sessions
+# ----------------------------
+
+SESSIONS = SessionStore(ttl_s=SESSION_TTL_S, max_sessions=SESSION_MAX, max_rows=SESSION_MAX_ROWS)
+
+
+def _remember(session_id: str, account_id: str, q: QuerySpec, rows: List[Transaction], complete: bool) -> None:
+    """Keep a list answer's rows for follow-ups; any other answer ends the previous list."""
+    if not SESSIONS.enabled:
+        return
+    if q.intent not in LIST_INTENTS:
+        SESSIONS.drop(session_id)
+        return
+    rows = sorted(rows, key=lambda t: t.postedAt, reverse=True)
+    page_size = min(max(int(q.params.get("limit", 50)), 1), TOOL_MAX_LIMIT)
+    SESSIONS.put(session_id, Session(account_id, q, rows, complete, min(page_size, len(rows)), page_size))
+
+
+async def _grow_session(session_id: str, session: Session, want: int) -> None:
+    """Re-fetch the session's result set with room for `want` rows (after paging past its rows)."""
+    q = session.query
+    if q.intent == "merchant_search":
+        start, end = _search_window(q)
+        limit = min(want, SEARCH_MAX_LIMIT)
+        result = await tool_search_transactions(
+            session.account_id, str(q.params.get("query")), start, end, limit, bool(q.params.get("merchant_only")),
+        )
+        rows, complete = result.transactions, result.matched <= len(result.transactions)
     else:
-        ui = UISpec(messages=[UIMessage(
-            content="I didn't understand that request. Try: top spendings this year, last 30 days transactions, recurring subscriptions, or dispute a transaction."
-        )])
+        plan = replace(fetch_plan(q), limit=min(want, TOOL_MAX_LIMIT))
+        rows = await fetch_for_plan(session.account_id, plan)
+        complete = len(rows) < plan.limit
+    SESSION_EVENTS.inc("refetch")
+    SESSIONS.resized(session_id, sorted(rows, key=lambda t: t.postedAt, reverse=True), complete)
 
-    return ChatResponse(query=q, ui=ui)
-    
 
+async def _follow_up_response(session_id: str, session: Session, follow: FollowUp) -> Optional[ChatResponse]:
+    """
+    The next page of the session's rows, or its rows narrowed by one more filter; None if
+    the follow-up names nothing in them (then the message is compiled as a new question).
+    """
+    if follow.kind == "page":
+        offset, size = session.shown, follow.count or session.page_size
+        rows = session.filtered()
+        if len(rows) < offset + size and not session.complete:
+            await _grow_session(session_id, session, TOOL_MAX_LIMIT if session.filters else offset + size)
+            rows = session.filtered()
+        filters = session.filters
+    else:
+        offset, size = 0, session.page_size
+        if not session.complete:
+            await _grow_session(session_id, session, TOOL_MAX_LIMIT)
+        rows = [t for t in session.filtered() if follow.keep(t)]  # type: ignore[misc]
+        if follow.needs_match and not rows:
+            return None
+        filters = session.filters + (follow,)
+    SESSION_EVENTS.inc(follow.kind)
+    session.filters, session.page_size = filters, size
+    session.shown = min(offset + size, len(rows))
+    labels = [f.label for f in filters]
+    q = session.query.model_copy(update={"params": {**session.query.params, "offset": offset, "limit": size, "filters": labels}})
+    return ChatResponse(query=q, ui=handle_result_page(q, rows, offset, size, session.complete, labels))
+
+
+# ----------------------------
+# Compute
+# ----------------------------
+
+# Handlers are plain CPU work: on a large input one would hold the event loop (and every
+# other in-flight request, /health included) for tens of ms. In a thread it yields the
+# GIL every switch interval instead, so short requests keep being served meanwhile
+_COMPUTE_POOL = ThreadPoolExecutor(max_workers=max(COMPUTE_THREADS, 1), thread_name_prefix="compute")
+# Its threads go to accounts in fair order, a share weighted by rows (one account's
+# 5000-row answers don't queue everyone else's)
+COMPUTE_QUEUE = FairQueue("compute", COMPUTE_THREADS, weights=ACCOUNT_WEIGHTS, fair=SCHEDULER_FAIR)
+
+
+async def compute_ui(q: QuerySpec, txs: List[Transaction], account_id: str) -> UISpec:
+    """_compute_ui, in the compute pool from COMPUTE_OFFLOAD_MIN_ROWS rows on."""
+    if COMPUTE_OFFLOAD_MIN_ROWS <= 0 or len(txs) < COMPUTE_OFFLOAD_MIN_ROWS:
+        return _compute_ui(q, txs)
+    # Copied context: the handler's timed() stage still lands in this request's Server-Timing
+    ctx = contextvars.copy_context()
+    async with COMPUTE_QUEUE.slot(account_id, cost=len(txs) / COMPUTE_OFFLOAD_MIN_ROWS):
+        return await asyncio.get_running_loop().run_in_executor(_COMPUTE_POOL, ctx.run, _compute_ui, q, txs)
+
+
+def _compute_ui(q: QuerySpec, txs: List[Transaction]) -> UISpec:
+    if q.intent == "transactions_list":
+        return handle_transactions_list(q, txs)
+    if q.intent == "top_spending_ytd":
+        return handle_top_spending_ytd(q, txs)
+    if q.intent == "recurring_payments":
+        return handle_recurring_payments(q, txs)
+    return UISpec(messages=[UIMessage(
+        content="I didn't understand that request. Try: top spendings this year, last 30 days transactions, recurring subscriptions, spending per month, or dispute a transaction."
+    )])
@@ -9,7 +9,7 @@ Output ONLY valid JSON. No markdown, no code blocks, no extra text.
   "clarification_question": null,
   "confidence": 0.0,
   "query": {
-    "intent": "top_spending_ytd" | "transactions_list" | "recurring_payments" | "unrecognized_transaction",
+    "intent": "top_spending_ytd" | "transactions_list" | "recurring_payments" | "unrecognized_transaction" | "spending_trend" | "merchant_search",
     "time_range": {
       "mode": "preset" | "relative" | "custom",
       "preset": "ytd" | "this_month" | "last_month" | null,
@@ -63,7 +63,19 @@ Intent Mapping (EXACT phrases):
    => intent="top_spending_ytd"
    => time_range: mode="preset", preset="ytd"
    
-4. Otherwise:
+4. If message asks how spending changes OVER TIME ("trend", "over time", "per month", "by week",
+   "daily spending", "monthly spending", "spend per day"):
+   => intent="spending_trend"
+   => params.granularity="day" | "week" | "month" when stated (omit otherwise)
+   => params.category=<category name> when one is named (e.g. "Groceries")
+   => time_range from the stated period, else mode="relative", last=6, unit="months"
+   
+5. If message asks about charges at ONE named merchant ("at Whole Foods", "from Amazon", "my Uber charges"):
+   => intent="merchant_search"
+   => params.query=<the merchant words as written, e.g. "whole foods">
+   => time_range only if a period is stated, else null (search all history)
+   
+6. Otherwise:
    => intent="transactions_list"
 
 2) If is_banking_domain is false or null:
@@ -90,6 +102,14 @@ For top_spending_ytd:
 - time_range: mode="preset", preset="ytd"
 - params.top_k=5
 
+For spending_trend:
+- time_range: based on user request or mode="relative", last=6, unit="months"
+- params.granularity only if the user names one; params.category only if the user names one
+
+For merchant_search:
+- time_range: based on user request, or null when no period is stated
+- params.query=<merchant words>, params.limit=50
+
 For transactions_list:
 - time_range: based on user request or mode="relative", last=30, unit="days"
 - params.limit=50 or user-specified number
@@ -138,11 +158,53 @@ Defaults (when is_banking_domain=true and user did not specify):
 - transactions_list => mode="relative", last=30, unit="days", params.limit=50
 - recurring_payments => mode="relative", last=3, unit="months", params.min_occurrences=3
 - top_spending_ytd => mode="preset", preset="ytd", params.top_k=5
+- spending_trend => mode="relative", last=6, unit="months"
 
 Output ONLY JSON.
 """
 
 
+# Compact variant (~1/3 of the tokens). Same rules, no repetition.
+# Kept byte-identical across calls and sent as the first message, so Ollama can reuse
+# the evaluated prefix from its KV cache (with keep_alive); only the user turn changes.
+QUERY_SPEC_SYSTEM_PROMPT_COMPACT = """
+Classify a bank customer's message. Output ONLY this JSON, no markdown:
+{"is_banking_domain": true|false|null, "clarification_needed": false, "query": {"intent": "...", "time_range": {...}|null, "params": {...}}}
+
+is_banking_domain: true for anything about money, spending, transactions, payments, charges, bills, subscriptions, recurring, income, disputes, unrecognized charges. false for non-financial topics (weather, sports, news, greetings). null for gibberish.
+
+intent (first match wins):
+1. "recognize"/"dispute"/"unknown"/"what is this" + transaction or charge => "unrecognized_transaction"; time_range=null; params.transaction_id=<id like t007 if present, else null>
+2. "subscription"/"recurring"/"bill"/"monthly charges"/"monthly payments" => "recurring_payments"; time_range={"mode":"relative","last":3,"unit":"months"}; params.min_occurrences=3. "monthly" here is NOT a time filter.
+3. "top spending"/"biggest"/"most spending"/"where does my money go"/"spending categories"/"what do I spend on" => "top_spending_ytd"; time_range={"mode":"preset","preset":"ytd"}; params.top_k=5
+4. spending over time: "trend"/"over time"/"per month"/"by week"/"daily spending"/"monthly spending" => "spending_trend"; time_range from the stated period, else {"mode":"relative","last":6,"unit":"months"}; params.granularity="day"|"week"|"month" if stated; params.category if a category is named
+5. charges at one named merchant ("at Whole Foods", "from Amazon", "my Uber charges") => "merchant_search"; params.query=<merchant words>; time_range from the stated period, else null
+6. otherwise => "transactions_list"
+
+transactions_list:
+- A COUNT ("10 transactions", "last 50 transactions", "recent 10") => time_range=null, params={"limit": N, "limit_only": true}
+- A PERIOD => time_range as below, params.limit=50 (or the stated count), no limit_only
+- Neither => time_range={"mode":"relative","last":30,"unit":"days"}, params.limit=50
+
+time_range:
+- "this year"/"ytd"/"year to date" => {"mode":"preset","preset":"ytd"}
+- "this month" => {"mode":"preset","preset":"this_month"}
+- "last month" => {"mode":"preset","preset":"last_month"}
+- "last N days|weeks|months|years", "past year", "last week" => {"mode":"relative","last":N,"unit":"days"|"weeks"|"months"|"years"}
+
+Examples:
+"Show me my last 50 transactions" => transactions_list, time_range=null, params={"limit":50,"limit_only":true}
+"transactions from last week" => transactions_list, {"mode":"relative","last":1,"unit":"weeks"}
+"what are my subscriptions?" => recurring_payments
+"how much did I spend per month this year?" => spending_trend, {"mode":"preset","preset":"ytd"}, params={"granularity":"month"}
+"how much did I spend at whole foods last month?" => merchant_search, {"mode":"preset","preset":"last_month"}, params={"query":"whole foods"}
+"""
+
+PROMPT_VARIANTS = {
+    "full": QUERY_SPEC_SYSTEM_PROMPT,
+    "compact": QUERY_SPEC_SYSTEM_PROMPT_COMPACT,
+}
+
 # QUERY_SPEC_SYSTEM_PROMPT = """
 # Output ONLY JSON. No markdown. No extra keys.
 
@@ -1,113 +1,202 @@
-import re
-from typing import Any, Optional, cast
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
 
-from src.config import OLLAMA_MODEL, OLLAMA_URL
-from src.llm import query_spec_call_llm
+from src.config import (
+    LLM_LATENCY_BUDGET_S,
+    OLLAMA_MODEL,
+    OLLAMA_URL,
+    PROMPT_VARIANT,
+    SPEC_CACHE_MIN_SIMILARITY,
+    SPEC_CACHE_SIZE,
+)
+from src.llm import LLM_GATEWAY, LlmOverloaded
+from src.logs import get_logger
+from src.message_features import MessageFeatures, extract_features
+from src.metrics import record_stage, stage
 from src.schemas import ConversationContext, QuerySpec, TimeRange
-from src.prompts import QUERY_SPEC_SYSTEM_PROMPT
+from src.prompts import PROMPT_VARIANTS
+from src.spec_cache import SpecCache
+
+logger = get_logger(__name__)
+
+# Resolved once: the exact same string on every call keeps the prompt prefix cacheable
+SYSTEM_PROMPT = PROMPT_VARIANTS[PROMPT_VARIANT]
+
+# LLM answers of earlier messages, reused for near-duplicates instead of another LLM call
+SPEC_CACHE = SpecCache(SPEC_CACHE_SIZE, SPEC_CACHE_MIN_SIMILARITY)
 
 async def compile_queryspec(message: str, context: Optional[ConversationContext] = None) -> QuerySpec:
     if not OLLAMA_MODEL or not OLLAMA_URL:
         raise ValueError("OLLAMA_MODEL and OLLAMA_URL must be set")
+    # One scan of the message feeds every fix below and the rules fallback
+    text = (message or "").lower()
+    features = extract_features(text)
+    if SPEC_CACHE.enabled:
+        with stage("compile.reuse"):
+            reused = SPEC_CACHE.lookup(text, features)
+        if reused is not None:
+            return _postprocess(reused, features, context)
     try:
-        llm_response = await query_spec_call_llm(QUERY_SPEC_SYSTEM_PROMPT, message)
-        
-        # If intent is unrecognized_transaction and context has selectedTransactionId, inject it
-        if llm_response.intent == "unrecognized_transaction" and context and context.selectedTransactionId:
-            # Create new QuerySpec with updated params (Pydantic models are immutable)
-            updated_params: dict[str, Any] = {**llm_response.params, "transaction_id": context.selectedTransactionId}
-            llm_response = QuerySpec(
-                is_banking_domain=llm_response.is_banking_domain,
-                intent=llm_response.intent,
-                time_range=llm_response.time_range,
-                params=updated_params
-            )
-        
-        # Post-processing: Essential fixes only
-        message_lower = message.lower()
-        
-        # Fix 1: Year to date queries should show all transactions
-        if ("year to date" in message_lower or "ytd" in message_lower or "this year" in message_lower):
-            updated_params = {k: v for k, v in llm_response.params.items() if k not in ["limit_only", "limit"]}
-            updated_params["limit"] = 1000
-            llm_response = QuerySpec(
-                is_banking_domain=llm_response.is_banking_domain,
-                intent=llm_response.intent,
-                time_range=TimeRange(mode="preset", preset="ytd"),
-                params=updated_params
-            )
-        
-        # Fix 1b: Clean up preset time ranges (this_month, last_month)
-        # If preset is set, ensure mode="preset" and clear relative fields
-        if llm_response.time_range and llm_response.time_range.preset in ["this_month", "last_month"]:
-            llm_response = QuerySpec(
-                is_banking_domain=llm_response.is_banking_domain,
-                intent=llm_response.intent,
-                time_range=TimeRange(
-                    mode="preset",
-                    preset=llm_response.time_range.preset,
-                    last=None,
-                    unit=None
-                ),
-                params=llm_response.params
-            )
-        
-        # Fix 1c: Force preset mode for "last month" phrase (LLM often misclassifies this)
-        if "last month" in message_lower and llm_response.time_range:
-            if llm_response.time_range.mode == "relative" and llm_response.time_range.last == 30 and llm_response.time_range.unit == "days":
-                # LLM incorrectly interpreted "last month" as "last 30 days"
-                llm_response = QuerySpec(
-                    is_banking_domain=llm_response.is_banking_domain,
-                    intent=llm_response.intent,
-                    time_range=TimeRange(mode="preset", preset="last_month", last=None, unit=None),
-                    params=llm_response.params
-                )
-        
-        # Fix 2: Ensure count-based queries have time_range=null and include the limit
-        # But first check if we need to CLEAR limit_only if there's actually a time range
-        has_time_pattern = _parse_time_range(message_lower) is not None
-        has_count_pattern = _parse_limit(message_lower) is not None
-        
-        if has_time_pattern and llm_response.params.get("limit_only"):
-            # LLM incorrectly set limit_only for a time-based query - fix it
-            updated_params = {k: v for k, v in llm_response.params.items() if k != "limit_only"}
-            llm_response = QuerySpec(
-                is_banking_domain=llm_response.is_banking_domain,
-                intent=llm_response.intent,
-                time_range=llm_response.time_range if llm_response.time_range else _parse_time_range(message_lower),
-                params=updated_params
-            )
-        elif llm_response.params.get("limit_only") or (has_count_pattern and not has_time_pattern):
-            # This is a count-based query
-            updated_params = llm_response.params.copy()
-            updated_params["limit_only"] = True
-            if "limit" not in updated_params or updated_params["limit"] is None:
-                parsed_limit = _parse_limit(message_lower)
-                updated_params["limit"] = parsed_limit if parsed_limit else 50
-            llm_response = QuerySpec(
-                is_banking_domain=llm_response.is_banking_domain,
-                intent=llm_response.intent,
-                time_range=None,
-                params=updated_params
-            )
-        
-        return llm_response
+        with stage("compile.llm"):
+            llm_response = await LLM_GATEWAY.call(SYSTEM_PROMPT, message, timeout=LLM_LATENCY_BUDGET_S or None)
+        spec = _postprocess(llm_response, features, context)
+        if SPEC_CACHE.enabled:
+            SPEC_CACHE.store(text, features, llm_response)
+        return spec
+    except LlmOverloaded as e:
+       # Shed by the gateway (queue, breaker open, budget spent): expected under load or
+       # while Ollama is down, don't log at warning per request. The rules answer takes
+       # microseconds, so it is always the one ready when the LLM is not
+       logger.debug("LLM gateway shed request, using rules-based", extra={"reason": str(e)})
+       with stage("compile.rules"):
+           return _compile_rules(message, context, features)
     except Exception as e:
-       print(f"LLM query spec failed: {e}, falling back to rules-based")
-       return _compile_rules(message, context)
+       logger.warning("LLM query spec failed, falling back to rules-based", extra={"error": str(e)})
+       with stage("compile.rules"):
+           return _compile_rules(message, context, features)
+
+
+def _postprocess(spec: QuerySpec, features: MessageFeatures, context: Optional[ConversationContext]) -> QuerySpec:
+    post_t0 = time.perf_counter()
+    draft = QuerySpecDraft.from_spec(spec)
+    for rule in POSTPROCESS_RULES:
+        rule(draft, features, context)
+    result = draft.validate()
+    record_stage("compile.postprocess", time.perf_counter() - post_t0)
+    return result
+
+
+# ----------------------------
+# LLM post-processing rules
+# ----------------------------
+# Each rule edits a plain-dict draft of the LLM's QuerySpec in place; the draft is
+# validated into a QuerySpec once, after the last rule. Rules run in list order and
+# see the edits of the rules before them.
+
+@dataclass
+class QuerySpecDraft:
+    is_banking_domain: Optional[bool]
+    intent: str
+    time_range: Optional[Dict[str, Any]]
+    params: Dict[str, Any]
+
+    @classmethod
+    def from_spec(cls, spec: QuerySpec) -> "QuerySpecDraft":
+        return cls(
+            is_banking_domain=spec.is_banking_domain,
+            intent=spec.intent,
+            time_range=spec.time_range.model_dump() if spec.time_range else None,
+            params=dict(spec.params),
+        )
+
+    def validate(self) -> QuerySpec:
+        return QuerySpec.model_validate({
+            "is_banking_domain": self.is_banking_domain,
+            "intent": self.intent,
+            "time_range": self.time_range,
+            "params": self.params,
+        })
+
+
+PostprocessRule = Callable[[QuerySpecDraft, MessageFeatures, Optional[ConversationContext]], None]
+
+
+def inject_selected_transaction(draft: QuerySpecDraft, features: MessageFeatures,
+                                context: Optional[ConversationContext]) -> None:
+    # If intent is unrecognized_transaction and context has selectedTransactionId, inject it
+    if draft.intent == "unrecognized_transaction" and context and context.selectedTransactionId:
+        draft.params["transaction_id"] = context.selectedTransactionId
+
+
+def fix_ytd(draft: QuerySpecDraft, features: MessageFeatures,
+            context: Optional[ConversationContext]) -> None:
+    # Fix 1: Year to date queries should show all transactions
+    if features.has("year to date", "ytd", "this year"):
+        draft.params.pop("limit_only", None)
+        draft.params.pop("limit", None)
+        draft.params["limit"] = 1000
+        draft.time_range = {"mode": "preset", "preset": "ytd"}
 
 
-def _compile_rules(message: str, context: Optional[ConversationContext]) -> QuerySpec:
-    text = (message or "").lower().strip()
+def fix_month_presets(draft: QuerySpecDraft, features: MessageFeatures,
+                      context: Optional[ConversationContext]) -> None:
+    # Fix 1b: Clean up preset time ranges (this_month, last_month)
+    # If preset is set, ensure mode="preset" and clear relative fields
+    tr = draft.time_range
+    if tr and tr.get("preset") in ["this_month", "last_month"]:
+        draft.time_range = {"mode": "preset", "preset": tr["preset"]}
 
-    # ---- 1) intent detection (only 4) ----
+
+def fix_last_month_phrase(draft: QuerySpecDraft, features: MessageFeatures,
+                          context: Optional[ConversationContext]) -> None:
+    # Fix 1c: Force preset mode for "last month" phrase (LLM often misclassifies this)
+    tr = draft.time_range
+    if features.has("last month") and tr:
+        if tr.get("mode") == "relative" and tr.get("last") == 30 and tr.get("unit") == "days":
+            # LLM incorrectly interpreted "last month" as "last 30 days"
+            draft.time_range = {"mode": "preset", "preset": "last_month"}
+
+
+def fix_limit_only(draft: QuerySpecDraft, features: MessageFeatures,
+                   context: Optional[ConversationContext]) -> None:
+    # Fix 2: Ensure count-based queries have time_range=null and include the limit
+    # But first check if we need to CLEAR limit_only if there's actually a time range
+    has_time_pattern = features.has_time_phrase
+    has_count_pattern = features.limit is not None
+
+    if has_time_pattern and draft.params.get("limit_only"):
+        # LLM incorrectly set limit_only for a time-based query - fix it
+        del draft.params["limit_only"]
+        if not draft.time_range:
+            draft.time_range = features.time_range_fields
+    elif draft.params.get("limit_only") or (has_count_pattern and not has_time_pattern):
+        # This is a count-based query
+        draft.params["limit_only"] = True
+        if draft.params.get("limit") is None:
+            draft.params["limit"] = features.limit if features.limit else 50
+        draft.time_range = None
+
+
+def fix_trend_granularity(draft: QuerySpecDraft, features: MessageFeatures,
+                          context: Optional[ConversationContext]) -> None:
+    # Fix 3: Keep the bucket size the user asked for ("per week", "daily") on spending trends
+    if draft.intent == "spending_trend" and features.granularity and "granularity" not in draft.params:
+        draft.params["granularity"] = features.granularity
+
+
+def fix_search_query(draft: QuerySpecDraft, features: MessageFeatures,
+                     context: Optional[ConversationContext]) -> None:
+    # Fix 4: merchant_search needs the words to look up; take them from the message if the LLM left them out
+    if draft.intent == "merchant_search" and not draft.params.get("query") and features.search_term:
+        draft.params["query"] = features.search_term
+        draft.params["merchant_only"] = True
+
+
+POSTPROCESS_RULES: List[PostprocessRule] = [
+    inject_selected_transaction,
+    fix_ytd,
+    fix_month_presets,
+    fix_last_month_phrase,
+    fix_limit_only,
+    fix_trend_granularity,
+    fix_search_query,
+]
+
+
+def _compile_rules(
+    message: str,
+    context: Optional[ConversationContext],
+    features: Optional[MessageFeatures] = None,
+) -> QuerySpec:
+    f = features or extract_features((message or "").lower())
+
+    # ---- 1) intent detection (only 6) ----
     if (
-        "don't recognize" in text
-        or "dont recognize" in text
-        or "unrecognized" in text
-        or ("what is this" in text and ("charge" in text or "transaction" in text))
+        f.has("don't recognize", "dont recognize", "unrecognized")
+        or (f.has("what is this") and f.has("charge", "transaction"))
     ):
-        tx_id = _extract_tx_id(text) or (context.selectedTransactionId if context else None)
+        tx_id = f.tx_id or (context.selectedTransactionId if context else None)
         return QuerySpec(
             is_banking_domain=True,
             intent="unrecognized_transaction",
@@ -115,7 +204,7 @@ def _compile_rules(message: str, context: Optional[ConversationContext]) -> Quer
             params={"transaction_id": tx_id},
         )
 
-    if "recurring" in text or "subscription" in text or "subscriptions" in text:
+    if f.has("recurring", "subscription"):
         return QuerySpec(
             is_banking_domain=True,
             intent="recurring_payments",
@@ -123,7 +212,7 @@ def _compile_rules(message: str, context: Optional[ConversationContext]) -> Quer
             params={"min_occurrences": 3},
         )
 
-    if ("top" in text and ("spend" in text or "spending" in text)) and ("year" in text or "ytd" in text or "this year" in text):
+    if f.has("top") and f.has("spend") and f.has("year", "ytd"):
         return QuerySpec(
             is_banking_domain=True,
             intent="top_spending_ytd",
@@ -131,10 +220,27 @@ def _compile_rules(message: str, context: Optional[ConversationContext]) -> Quer
             params={"top_k": 5},
         )
 
+    if f.asks_trend:
+        return QuerySpec(
+            is_banking_domain=True,
+            intent="spending_trend",
+            time_range=f.time_range or _default_time("spending_trend"),
+            params={"granularity": f.granularity} if f.granularity else {},
+        )
+
+    if f.search_term:
+        return QuerySpec(
+            is_banking_domain=True,
+            intent="merchant_search",
+            time_range=f.time_range,
+            # A guessed phrase: only a merchant name counts, else it is answered as a list
+            params={"query": f.search_term, "limit": 50, "merchant_only": True},
+        )
+
     # transactions list: if they mention transactions at all
-    if "transaction" in text or "transactions" in text:
-        tr = _parse_time_range(text)
-        parsed_limit = _parse_limit(text)
+    if f.has("transaction"):
+        tr = f.time_range
+        parsed_limit = f.limit
         limit = parsed_limit if parsed_limit is not None else 50
         
         # If user is asking for a specific count and no time range mentioned,
@@ -168,51 +274,6 @@ def _default_time(intent: str) -> TimeRange:
         return TimeRange(mode="preset", preset="ytd")
     if intent == "recurring_payments":
         return TimeRange(mode="relative", last=3, unit="months")
+    if intent == "spending_trend":
+        return TimeRange(mode="relative", last=6, unit="months")
     return TimeRange(mode="relative", last=30, unit="days")
-
-
-def _parse_time_range(text: str) -> Optional[TimeRange]:
-    if "this year" in text or "ytd" in text or "year to date" in text:
-        return TimeRange(mode="preset", preset="ytd")
-    if "this month" in text:
-        return TimeRange(mode="preset", preset="this_month")
-    if "last month" in text:
-        return TimeRange(mode="preset", preset="last_month")
-    # Handle "last week" without a number
-    if "last week" in text:
-        from src.schemas import TimeUnit
-        return TimeRange(mode="relative", last=1, unit=cast(TimeUnit, "weeks"))
-
-    m = re.search(r"\b(last|past|previous)\s+(\d+)\s+(day|days|week|weeks|month|months|year|years)\b", text)
-    if not m:
-        return None
-
-    n = int(m.group(2))
-    unit_word = m.group(3)
-    unit = {
-        "day": "days", "days": "days",
-        "week": "weeks", "weeks": "weeks",
-        "month": "months", "months": "months",
-        "year": "years", "years": "years",
-    }[unit_word]
-
-    from src.schemas import TimeUnit
-    return TimeRange(mode="relative", last=n, unit=cast(TimeUnit, unit))
-
-
-def _parse_limit(text: str) -> Optional[int]:
-    # Patterns: "last 10 transactions", "give me 20 transactions", "I need 15 transactions"
-    # Try pattern with verb/adjective first: "(give me|show|last|recent) N transactions"
-    m = re.search(r"\b(give\s+me|show\s+me|show|last|recent|my|need|want)\s+(\d+)\s+transactions?\b", text)
-    if m:
-        return int(m.group(2))
-    # Also try simple "N transactions" pattern
-    m = re.search(r"\b(\d+)\s+transactions?\b", text)
-    if m:
-        return int(m.group(1))
-    return None
-
-
-def _extract_tx_id(text: str) -> Optional[str]:
-    m = re.search(r"\b(t\d{3})\b", text)
-    return m.group(1) if m else None
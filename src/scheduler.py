@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from src.metrics import Counter, Gauge, record_stage, register
+
+SCHEDULER_EVENTS = register(Counter("scheduler_events_total", "Rate-limited requests and fair-queue waits", label="event"))
+SCHEDULER_STATE = register(Gauge("scheduler", "Fair-queue waiters, in-flight slots and waiting accounts per stage", label="state"))
+
+# Account the current request runs for (set at /chat admission): stages that don't take an
+# account id (the LLM gateway) queue under it. Tasks spawned afterwards inherit it
+_TENANT: ContextVar[str] = ContextVar("tenant", default="")
+
+
+def set_tenant(account_id: str) -> None:
+    _TENANT.set(account_id)
+
+
+def current_tenant() -> str:
+    return _TENANT.get()
+
+
+# ----------------------------
+# Per-account rate limit
+# ----------------------------
+
+class RateLimiter:
+    """
+    Token bucket per account: `burst` tokens, refilled at `rate_per_s`. A request costs
+    one token per message. Idle accounts' buckets (full again) are dropped once more
+    than `max_accounts` are kept, so memory follows the active accounts only.
+    """
+
+    def __init__(self, rate_per_s: float, burst: float, max_accounts: int = 100_000):
+        self.rate_per_s = rate_per_s
+        self.burst = max(burst, 1.0)
+        self.max_accounts = max_accounts
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # account -> (tokens, as of monotonic time)
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_s > 0
+
+    def try_acquire(self, account_id: str, cost: float = 1.0) -> float:
+        """0.0 if admitted (tokens taken), else the seconds until `cost` tokens are there."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        tokens, at = self._buckets.get(account_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - at) * self.rate_per_s)
+        cost = min(cost, self.burst)  # a request larger than the burst is admitted from a full bucket
+        if tokens < cost:
+            self._buckets[account_id] = (tokens, now)
+            SCHEDULER_EVENTS.inc("throttled")
+            return (cost - tokens) / self.rate_per_s
+        self._buckets[account_id] = (tokens - cost, now)
+        if len(self._buckets) > self.max_accounts:
+            self._drop_full(now)
+        return 0.0
+
+    def _drop_full(self, now: float) -> None:
+        refill = self.burst / self.rate_per_s
+        self._buckets = {a: b for a, b in self._buckets.items() if now - b[1] < refill}
+
+
+# ----------------------------
+# Fair queuing
+# ----------------------------
+
+class Preempted(Exception):
+    """A queued wait given up to make room for another account's (FairQueue.shed_newest)."""
+
+
+class _Waiter:
+    __slots__ = ("tenant", "future")
+
+    def __init__(self, tenant: str, future: "asyncio.Future[None]"):
+        self.tenant = tenant
+        self.future = future
+
+
+class FairQueue:
+    """
+    A semaphore of `capacity` slots whose waiters are served in start-time fair queuing
+    order across accounts instead of arrival order: each wait gets the tag
+    max(virtual time, the account's last finish tag), the account's finish tag moves on by
+    cost / weight, and a freed slot goes to the smallest tag. An account with a burst of
+    waiters gets its weighted share of the slots; the others are served in between rather
+    than behind the whole burst. `fair=False` serves in arrival order (plain semaphore).
+
+    `weights` maps account ids to weights (default 1.0).
+    """
+
+    def __init__(self, name: str, capacity: int, weights: Optional[Mapping[str, float]] = None, fair: bool = True):
+        self.name = name
+        self.capacity = max(capacity, 1)
+        self.weights = dict(weights or {})
+        self.fair = fair
+        self._free = self.capacity
+        self._heap: List[Tuple[float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._finish: Dict[str, float] = {}
+        self._waiting: Dict[str, int] = {}
+
+    def locked(self) -> bool:
+        return self._free <= 0
+
+    @property
+    def waiting_total(self) -> int:
+        return sum(self._waiting.values())
+
+    def waiting(self, tenant: str) -> int:
+        return self._waiting.get(tenant, 0)
+
+    def waiting_tenants(self) -> int:
+        return len(self._waiting)
+
+    def most_waiting(self) -> Optional[str]:
+        """The account with the most queued waits (None if nobody waits)."""
+        return max(self._waiting, key=self._waiting.__getitem__, default=None)
+
+    def ahead_of(self, tenant: str) -> int:
+        """About how many current waiters a new wait of `tenant` would be served after."""
+        if not self.fair:
+            return self.waiting_total
+        mine = self._waiting.get(tenant, 0) + 1
+        return sum(min(n, mine) for n in self._waiting.values())
+
+    async def acquire(self, tenant: str, cost: float = 1.0) -> None:
+        """Take a slot (without yielding if one is free and nobody waits)."""
+        if self._free > 0 and not self._heap:
+            self._free -= 1
+            if self.fair:
+                self._vtime = self._tag(tenant, cost)
+            self._set_state()
+            return
+        start = self._tag(tenant, cost) if self.fair else float(next(self._seq))
+        waiter = _Waiter(tenant, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (start, next(self._seq), waiter))
+        self._waiting[tenant] = self._waiting.get(tenant, 0) + 1
+        SCHEDULER_EVENTS.inc(f"{self.name}_queued")
+        self._set_state()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if not waiter.future.done() or waiter.future.cancelled():
+                # Given up (a cancelled task also cancels the future it was awaiting)
+                waiter.future.cancel()
+                self._left(tenant)
+            elif waiter.future.exception() is None:
+                self.release()  # handed a slot just as the wait was given up
+            raise
+
+    def release(self) -> None:
+        while self._heap:
+            start, _, waiter = heapq.heappop(self._heap)
+            if waiter.future.done():  # cancelled while queued
+                continue
+            self._left(waiter.tenant)
+            if self.fair:
+                self._vtime = start
+            waiter.future.set_result(None)
+            return
+        self._free = min(self._free + 1, self.capacity)
+        self._set_state()
+
+    def shed_newest(self, tenant: str) -> bool:
+        """
+        Fail the newest queued wait of `tenant` with Preempted (False if it has none). Its
+        fair-queuing tag is given back, so the account is not charged for it.
+        """
+        newest: Optional[Tuple[float, int, _Waiter]] = None
+        for entry in self._heap:
+            if entry[2].tenant == tenant and not entry[2].future.done() and (newest is None or entry[1] > newest[1]):
+                newest = entry
+        if newest is None:
+            return False
+        start, _, waiter = newest
+        if self.fair:
+            self._finish[tenant] = start
+        waiter.future.set_exception(Preempted(f"{self.name} queue full"))
+        self._left(tenant)
+        SCHEDULER_EVENTS.inc(f"{self.name}_shed")
+        return True
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, cost: float = 1.0) -> AsyncIterator[None]:
+        """Hold a slot for the block; the wait (if any) is recorded as stage '<name>.queue'."""
+        t0 = time.perf_counter()
+        await self.acquire(tenant, cost)
+        waited = time.perf_counter() - t0
+        if waited > 0.0005:
+            record_stage(f"{self.name}.queue", waited)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _tag(self, tenant: str, cost: float) -> float:
+        start = max(self._vtime, self._finish.get(tenant, 0.0))
+        self._finish[tenant] = start + cost / self.weights.get(tenant, 1.0)
+        if len(self._finish) > 4 * self.capacity + 1024:
+            # Accounts whose tag is behind the virtual time are idle; forgetting them is free
+            self._finish = {t: f for t, f in self._finish.items() if f > self._vtime}
+        return start
+
+    def _left(self, tenant: str) -> None:
+        n = self._waiting.get(tenant, 0) - 1
+        if n > 0:
+            self._waiting[tenant] = n
+        else:
+            self._waiting.pop(tenant, None)
+        self._set_state()
+
+    def _set_state(self) -> None:
+        SCHEDULER_STATE.set(f"{self.name}_waiting", self.waiting_total)
+        SCHEDULER_STATE.set(f"{self.name}_in_flight", self.capacity - self._free)
+        SCHEDULER_STATE.set(f"{self.name}_accounts_waiting", len(self._waiting))
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional, Union
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, model_validator
 
 # =========================
 # Tool data schemas
@@ -21,6 +21,107 @@ class Transaction(BaseModel):
     isPending: bool = False
     paymentRail: Optional[Literal["Card", "ACH", "Zelle", "Wire", "Check", "ATM"]] = None
     cardLast4: Optional[str] = None
+    signedAmount: Optional[float] = None
+    description: Optional[str] = None
+
+    # Derived once per row when the model is built (store load / tool fetch), never serialized.
+    # Properties read __pydantic_private__ directly: BaseModel.__getattr__ for private attrs is ~40x slower.
+    _date_ordinal: int = PrivateAttr(0)
+    _date_iso: str = PrivateAttr("")
+    _amount_text: str = PrivateAttr("")
+    _is_posted_debit: bool = PrivateAttr(False)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._set_derived()
+
+    def _set_derived(self) -> None:
+        d = self.postedAt.date()
+        # Assign the private dict in one go; per-attribute BaseModel.__setattr__ dominates load time
+        object.__setattr__(self, "__pydantic_private__", {
+            "_date_ordinal": d.toordinal(),
+            "_date_iso": d.isoformat(),
+            "_amount_text": f"${self.amount:,.2f}",
+            "_is_posted_debit": self.direction == "debit" and not self.isPending,
+        })
+
+    @classmethod
+    def from_typed(cls, values: Dict[str, Any]) -> "Transaction":
+        """
+        Build from values that already have their field types (every field present,
+        merchant a Merchant), skipping validation: for decoders whose wire format fixes
+        each value's type. model_construct does the same but is several times slower per row.
+        """
+        tx = cls.__new__(cls)
+        object.__setattr__(tx, "__dict__", values)
+        object.__setattr__(tx, "__pydantic_fields_set__", set(values))
+        object.__setattr__(tx, "__pydantic_extra__", None)
+        # Not model_post_init: pydantic wraps it to first fill private defaults we overwrite anyway
+        tx._set_derived()
+        return tx
+
+    @property
+    def dateOrdinal(self) -> int:
+        return self.__pydantic_private__["_date_ordinal"]  # type: ignore[index]
+
+    @property
+    def dateIso(self) -> str:
+        """postedAt as YYYY-MM-DD"""
+        return self.__pydantic_private__["_date_iso"]  # type: ignore[index]
+
+    @property
+    def amountText(self) -> str:
+        """amount formatted like compute.money()"""
+        return self.__pydantic_private__["_amount_text"]  # type: ignore[index]
+
+    @property
+    def isPostedDebit(self) -> bool:
+        return self.__pydantic_private__["_is_posted_debit"]  # type: ignore[index]
+
+# Validates a whole JSON array in one pydantic-core pass (no json.loads + per-row model_validate)
+TRANSACTIONS_ADAPTER: TypeAdapter[List[Transaction]] = TypeAdapter(List[Transaction])
+
+class TransactionSearch(BaseModel):
+    # Rows whose merchant name / category / subcategory / description match every query word
+    query: str
+    matched: int              # all matches in the range; transactions holds the newest `limit`
+    postedDebitTotal: float   # spend over all matches
+    transactions: List[Transaction]
+
+class MerchantHistory(BaseModel):
+    # The transaction's merchant before it: rows with the same merchant name and direction
+    transactionId: str
+    merchant: str
+    direction: Literal["debit", "credit"]
+    priorCount: int
+    priorTotal: float
+    priorMean: Optional[float] = None        # None when priorCount == 0 (also min/max/dates)
+    priorMin: Optional[float] = None
+    priorMax: Optional[float] = None
+    firstSeen: Optional[str] = None          # YYYY-MM-DD
+    lastSeen: Optional[str] = None
+    laterCount: int = 0                      # rows at the merchant after this one
+    cardSeenBefore: Optional[bool] = None    # None when the transaction has no card / rail
+    railSeenBefore: Optional[bool] = None
+
+Granularity = Literal["day", "week", "month"]
+# Shortest length of each bucket, in days, and the cap on buckets per series (a day
+# granularity over ~5.5 years)
+GRANULARITY_DAYS = {"day": 1, "week": 7, "month": 28}
+SERIES_MAX_BUCKETS = 2000
+
+class SpendingBucket(BaseModel):
+    start: str   # YYYY-MM-DD: first day of the day / ISO week / month (clipped to the range)
+    total: float
+
+class SpendingSeries(BaseModel):
+    # Posted debit totals of one account per bucket (from the store's daily prefix sums)
+    accountId: str
+    start: str   # YYYY-MM-DD inclusive
+    end: str     # YYYY-MM-DD inclusive
+    granularity: Granularity
+    category: Optional[str] = None
+    total: float
+    buckets: List[SpendingBucket]
 
 # =========================
 # Derived analytics
@@ -41,11 +142,13 @@ class CategoryTotal(BaseModel):
 
 # =========================
 # QuerySpec 
-# Only 4 intents supported for now:
+# Only 6 intents supported for now:
 # 1. “What are my top spendings this year?” * Output: category + merchant breakdown (UISpec chart + summary) 
 # 2. “List my transactions for the last 30 days” * Output: table (include transaction id) 
 # 3. “I don’t recognize this transaction” * Requires context: selectedTransactionId from previous table * Output: explain posted vs pending + holds, and return a Dispute Form (FormSpec) prefilled 
 # 4. “Show me recurring payments/subscriptions”
+# 5. “How has my spending changed per month?” * Output: line chart of posted debits per day/week/month
+# 6. “Show my Uber charges” / “How much at Whole Foods?” * Output: matching transactions (table) + total spent
 # =========================
 
 Intent = Literal[
@@ -53,6 +156,8 @@ Intent = Literal[
     "transactions_list",
     "recurring_payments",
     "unrecognized_transaction",
+    "spending_trend",
+    "merchant_search",
 ]
 
 
@@ -98,6 +203,9 @@ class QuerySpec(BaseModel):
     # transactions_list: {"n_days": 30}
     # unrecognized_transaction: {"transaction_id": "t011"} or {}
     # recurring_payments: {} (or {"min_occurrences": 3})
+    # spending_trend: {"granularity": "month"} (day | week | month, or omitted), optional "category"
+    # merchant_search: {"query": "whole foods", "limit": 50}; time_range null = whole history;
+    #   "merchant_only": true when the query is a phrase from the message, not the LLM's
 
 # =========================
 # Chat request context
@@ -112,6 +220,16 @@ class ChatRequest(BaseModel):
     accountId: str = "A123"
     message: str
     context: Optional[ConversationContext] = None
+    # Client-chosen conversation id: follow-ups ("show me more", "only the pending ones")
+    # are then answered from the previous list result instead of a new compile + fetch
+    sessionId: Optional[str] = Field(None, max_length=128)
+
+
+class ChatBatchRequest(BaseModel):
+    # Several messages for one account, e.g. the widgets of a dashboard
+    accountId: str = "A123"
+    messages: List[str] = Field(..., min_length=1, max_length=10)
+    context: Optional[ConversationContext] = None
 
 # =========================
 # UI spec
@@ -160,4 +278,9 @@ class UISpec(BaseModel):
 
 class ChatResponse(BaseModel):
     query: QuerySpec
-    ui: UISpec
\ No newline at end of file
+    ui: UISpec
+
+
+class ChatBatchResponse(BaseModel):
+    # One ChatResponse per request message, in request order
+    results: List[ChatResponse]
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from .schemas import Transaction
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Fuzzy matches: share at least this Jaccard similarity of padded trigrams with the query word
+FUZZY_MIN_SIMILARITY = 0.5
+# Words shorter than this only match exactly or as a prefix (too few trigrams to compare)
+FUZZY_MIN_LENGTH = 4
+
+
+def stem(word: str) -> str:
+    """Plural to singular, roughly: "groceries" -> "grocery", "charges" -> "charge"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric words, stemmed: "AMZN Mktp US" -> ["amzn", "mktp", "us"]."""
+    return [stem(w) for w in _TOKEN.findall(text.lower())]
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _row_text(t: Transaction) -> Tuple[str, str, str, str]:
+    m = t.merchant
+    return m.name, m.category, m.subcategory, t.description or ""
+
+
+class SearchIndex:
+    """
+    Inverted index over merchant name, category, subcategory and description of an
+    account's rows, in the order given (the store's newest-first time index), so
+    posting lists of row positions are already in time order.
+
+    Words are stemmed on both sides, so singular and plural match ("grocery" finds
+    "Groceries"). Exact words are looked up directly. Other query words are matched
+    against the vocabulary through a trigram index (typos, "starbuk" -> "starbucks") or
+    as a prefix ("whole" finds "wholefoods"); the vocabulary is small, so this never
+    touches rows. name_postings cover the merchant name only, for merchant_only lookups.
+    """
+
+    def __init__(self, rows: Sequence[Transaction]):
+        postings: Dict[str, List[int]] = {}
+        name_postings: Dict[str, List[int]] = {}
+        tokens_of: Dict[Tuple[str, str, str, str], Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+        for pos, t in enumerate(rows):
+            text = _row_text(t)
+            tokens = tokens_of.get(text)
+            if tokens is None:
+                # Merchants repeat: tokenize each distinct text once
+                tokens = tokens_of[text] = (
+                    tuple(dict.fromkeys(w for field in text for w in tokenize(field))),
+                    tuple(dict.fromkeys(tokenize(text[0]))),
+                )
+            for w in tokens[0]:
+                postings.setdefault(w, []).append(pos)
+            for w in tokens[1]:
+                name_postings.setdefault(w, []).append(pos)
+        self.postings = postings
+        self.name_postings = name_postings
+        self.vocabulary = sorted(postings)
+        self._trigram_words: Dict[str, List[str]] = {}
+        for w in self.vocabulary:
+            for g in _trigrams(w):
+                self._trigram_words.setdefault(g, []).append(w)
+
+    def terms(self, word: str) -> List[str]:
+        """Indexed words a query word stands for: itself, else prefix and fuzzy matches."""
+        if word in self.postings:
+            return [word]
+        i = bisect_left(self.vocabulary, word)
+        found = []
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(word):
+            found.append(self.vocabulary[i])
+            i += 1
+        if len(word) >= FUZZY_MIN_LENGTH:
+            grams = _trigrams(word)
+            shared: Dict[str, int] = {}
+            for g in grams:
+                for w in self._trigram_words.get(g, ()):
+                    shared[w] = shared.get(w, 0) + 1
+            for w, n in shared.items():
+                if n / (len(grams) + len(_trigrams(w)) - n) >= FUZZY_MIN_SIMILARITY and w not in found:
+                    found.append(w)
+        return found
+
+    def match(self, query: str, merchant_only: bool = False) -> List[int]:
+        """
+        Ascending positions of the rows matching every word of the query ([] if none);
+        with merchant_only, every word must match the merchant name.
+        """
+        postings = self.name_postings if merchant_only else self.postings
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        lists = []
+        for word in words:
+            terms = [w for w in self.terms(word) if w in postings]
+            if not terms:
+                return []
+            if len(terms) == 1:
+                lists.append(postings[terms[0]])
+            else:
+                lists.append(sorted(set().union(*(postings[w] for w in terms))))
+        lists.sort(key=len)
+        result = lists[0]
+        for other in lists[1:]:
+            result = _intersect(result, other)
+            if not result:
+                break
+        return result
+
+
+def _intersect(small: List[int], large: List[int]) -> List[int]:
+    members = set(large)
+    return [p for p in small if p in members]
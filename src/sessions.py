@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from src.metrics import Counter, Gauge, register
+from src.schemas import QuerySpec, Transaction
+
+SESSION_EVENTS = register(Counter("session_events_total", "Chat session lookups, follow-ups and evictions", label="event"))
+SESSION_STATE = register(Gauge("sessions", "Chat sessions kept and rows they reference", label="state"))
+
+# Intents whose answer is a list of rows a follow-up can page through or filter
+LIST_INTENTS = ("transactions_list", "merchant_search")
+
+
+# ----------------------------
+# Follow-up messages
+# ----------------------------
+# A follow-up is a whole short message about the previous answer ("show me more",
+# "only the pending ones", "over $50"); anything longer is compiled as a new question.
+
+@dataclass(frozen=True)
+class FollowUp:
+    kind: str                                   # "page" | "filter"
+    label: str = ""                             # filter description for the reply ("pending")
+    count: Optional[int] = None                 # page size asked for ("next 20")
+    keep: Optional[Callable[[Transaction], bool]] = None
+    needs_match: bool = False                   # label is a category / merchant name to look for
+
+
+_FILLER = re.compile(r"^(?:(?:ok|okay|and|now|then|so|can you|could you|please)\s+)*|(?:\s+please)?[\s?.!]*$")
+_PAGE = re.compile(
+    r"(?:show\s+(?:me\s+)?|give\s+me\s+|see\s+)?"
+    r"(?:(?:the\s+)?next(?:\s+(?P<next>\d+))?(?:\s+(?:page|ones|ones\s+please|transactions|rows))?"
+    r"|(?P<more>\d+\s+)?more(?:\s+(?:transactions|rows|results|of\s+them))?"
+    r"|(?:the\s+)?rest(?:\s+of\s+them)?)"
+)
+_ONLY = r"(?:show\s+(?:me\s+)?)?(?:(?:only|just)\s+)?(?:the\s+)?"
+_SUFFIX = r"(?:\s+(?:ones|transactions|charges|only))?"
+_STATUS = re.compile(_ONLY + r"(?P<status>pending|posted|debits?|credits?|deposits?|refunds?|incoming|outgoing)" + _SUFFIX)
+_AMOUNT = re.compile(
+    _ONLY + r"(?:ones\s+|transactions\s+)?"
+    r"(?P<op>over|above|more\s+than|greater\s+than|at\s+least|under|below|less\s+than|at\s+most)\s+"
+    r"\$?(?P<amount>\d+(?:,\d{3})*(?:\.\d+)?)(?:\s*(?:dollars|usd))?"
+)
+_NAMED = re.compile(r"(?:only|just)\s+(?:the\s+)?(?P<name>[a-z][a-z0-9 &'.-]{1,40}?)" + _SUFFIX)
+
+_STATUS_FILTERS = {
+    "pending": ("pending", lambda t: t.isPending),
+    "posted": ("posted", lambda t: not t.isPending),
+    "debit": ("debits", lambda t: t.direction == "debit"),
+    "outgoing": ("debits", lambda t: t.direction == "debit"),
+    "credit": ("credits", lambda t: t.direction == "credit"),
+    "deposit": ("credits", lambda t: t.direction == "credit"),
+    "refund": ("credits", lambda t: t.direction == "credit"),
+    "incoming": ("credits", lambda t: t.direction == "credit"),
+}
+
+
+def parse_follow_up(text: str) -> Optional[FollowUp]:
+    """The follow-up a lowercased message asks for, or None if it is a new question."""
+    text = _FILLER.sub("", text.strip())
+    m = _PAGE.fullmatch(text)
+    if m:
+        count = m.group("next") or (m.group("more") or "").strip()
+        return FollowUp("page", count=int(count) if count else None)
+    m = _STATUS.fullmatch(text)
+    if m:
+        label, keep = _STATUS_FILTERS[m.group("status").rstrip("s")]
+        return FollowUp("filter", label=label, keep=keep)
+    m = _AMOUNT.fullmatch(text)
+    if m:
+        amount = float(m.group("amount").replace(",", ""))
+        op = m.group("op")
+        if op in ("over", "above", "more than", "greater than"):
+            return FollowUp("filter", label=f"over ${amount:,.2f}", keep=lambda t: t.amount > amount)
+        if op == "at least":
+            return FollowUp("filter", label=f"${amount:,.2f} or more", keep=lambda t: t.amount >= amount)
+        if op == "at most":
+            return FollowUp("filter", label=f"${amount:,.2f} or less", keep=lambda t: t.amount <= amount)
+        return FollowUp("filter", label=f"under ${amount:,.2f}", keep=lambda t: t.amount < amount)
+    m = _NAMED.fullmatch(text)
+    if m:
+        name = m.group("name").strip()
+        return FollowUp(
+            "filter", label=name, needs_match=True,
+            keep=lambda t: name in (t.merchant.name.lower(), t.merchant.category.lower(), t.merchant.subcategory.lower()),
+        )
+    return None
+
+
+# ----------------------------
+# Session store
+# ----------------------------
+
+@dataclass
+class Session:
+    """
+    The last list answer of a conversation: its QuerySpec and a handle to the result set.
+
+    rows are the rows the answer was computed from (newest first), shared with the fetch
+    cache rather than copied; complete is False when more rows exist than were fetched.
+    filters narrow rows for follow-ups; shown is how many filtered rows were displayed.
+    """
+
+    account_id: str
+    query: QuerySpec
+    rows: List[Transaction]
+    complete: bool
+    shown: int
+    page_size: int
+    filters: Tuple[FollowUp, ...] = ()
+    expires_at: float = field(default=0.0)
+
+    def filtered(self) -> List[Transaction]:
+        rows = self.rows
+        for f in self.filters:
+            rows = [t for t in rows if f.keep(t)]  # type: ignore[misc]
+        return rows
+
+
+class SessionStore:
+    """
+    Sessions keyed by the client's session id, each bound to one account (a lookup with
+    another account id misses). Entries expire `ttl_s` after their last use; at most
+    `max_sessions` sessions and `max_rows` referenced rows are kept, least recently used
+    evicted first.
+    """
+
+    def __init__(self, *, ttl_s: float, max_sessions: int, max_rows: int):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.max_rows = max_rows
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._rows = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_sessions > 0 and self.ttl_s > 0
+
+    def get(self, session_id: str, account_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            SESSION_EVENTS.inc("miss")
+            return None
+        if session.expires_at <= time.monotonic():
+            self.drop(session_id, "expired")
+            return None
+        if session.account_id != account_id:
+            SESSION_EVENTS.inc("miss")
+            return None
+        session.expires_at = time.monotonic() + self.ttl_s
+        self._sessions.move_to_end(session_id)
+        SESSION_EVENTS.inc("hit")
+        return session
+
+    def put(self, session_id: str, session: Session) -> None:
+        self.drop(session_id)
+        session.expires_at = time.monotonic() + self.ttl_s
+        self._sessions[session_id] = session
+        self._rows += len(session.rows)
+        SESSION_EVENTS.inc("stored")
+        self._evict()
+
+    def resized(self, session_id: str, rows: List[Transaction], complete: bool) -> None:
+        """Swap in a larger fetch of the session's result set (after paging past its rows)."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        self._rows += len(rows) - len(session.rows)
+        session.rows, session.complete = rows, complete
+        self._evict()
+
+    def drop(self, session_id: str, event: Optional[str] = None) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._rows -= len(session.rows)
+            if event:
+                SESSION_EVENTS.inc(event)
+            self._set_state()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            session_id, oldest = next(iter(self._sessions.items()))
+            if oldest.expires_at <= now:
+                self.drop(session_id, "expired")
+            elif len(self._sessions) > self.max_sessions or self._rows > self.max_rows:
+                self.drop(session_id, "evicted")
+            else:
+                break
+        self._set_state()
+
+    def _set_state(self) -> None:
+        SESSION_STATE.set("sessions", len(self._sessions))
+        SESSION_STATE.set("rows", self._rows)
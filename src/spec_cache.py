@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from collections import Counter as Multiset
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from src.message_features import MessageFeatures
+from src.metrics import Counter, Gauge, register
+from src.schemas import QuerySpec
+
+SPEC_CACHE_EVENTS = register(Counter("spec_cache_events_total", "QuerySpec reuse cache lookups and updates", label="event"))
+SPEC_CACHE_STATE = register(Gauge("spec_cache", "QuerySpec reuse cache size", label="state"))
+
+# MinHash LSH: _BANDS bands of _ROWS signature values. Two messages share a bucket with
+# probability about 1 - (1 - J^_ROWS)^_BANDS for trigram Jaccard J: ~0.99 at J=0.5, ~0.8
+# at J=0.3. The signature is a one-permutation MinHash (each hashed trigram goes to bin
+# h % _BINS, keeping the minimum per bin): one pass over the trigrams instead of one per
+# hash function, ~70x cheaper at this message length
+_BANDS = 16
+_ROWS = 2
+_BINS = _BANDS * _ROWS
+
+_WORD = re.compile(r"[a-z0-9']+")
+_DIGITS = re.compile(r"\d+")
+
+# Words that change the answer without any parser picking them up ("for 2 weeks" vs
+# "for 2 months", "in march" vs "in april"): reuse only when both messages have the same
+_CALENDAR_WORDS = frozenset({
+    "day", "days", "week", "weeks", "month", "months", "year", "years", "quarter", "weekend",
+    "today", "yesterday", "tomorrow",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug",
+    "sep", "sept", "oct", "nov", "dec",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+})
+# Negation, ranking, direction and category words: at 0.8+ similarity they are what tells
+# "i do recognize" from "i don't recognize", "non recurring" from "recurring", "lowest"
+# from "top" and "gas" from "groceries". Pinned like the calendar words
+_MEANING_WORDS = frozenset({
+    "not", "no", "non", "never", "without", "except", "excluding", "other", "than",
+    "do", "don't", "dont", "didn't", "didnt", "doesn't", "isn't", "aren't",
+    "top", "most", "least", "highest", "lowest", "largest", "smallest", "biggest", "cheapest",
+    "max", "min", "maximum", "minimum", "first", "latest", "newest", "oldest", "earliest",
+    "more", "less", "over", "under", "above", "below", "increase", "decrease",
+    "pending", "posted", "debit", "credit", "debits", "credits", "incoming", "outgoing", "refund", "refunds",
+    "groceries", "grocery", "gas", "fuel", "dining", "restaurant", "restaurants", "food", "coffee",
+    "transport", "travel", "rideshare", "taxi", "shopping", "clothing", "housing", "rent",
+    "utilities", "utility", "electric", "internet", "phone", "health", "pharmacy", "medical",
+    "fitness", "gym", "entertainment", "music", "streaming", "income", "salary", "cash", "atm",
+    "insurance", "education", "pets", "bills", "fees", "transfers",
+})
+
+
+def normalize(text: str) -> str:
+    """Lowercase words, numbers masked: "Show me 10 transactions!" -> "show me # transactions"."""
+    return " ".join(_DIGITS.sub("#", w) for w in _WORD.findall(text.lower()))
+
+
+def _vector(normalized: str) -> Dict[int, int]:
+    """Hashed character trigrams (word boundaries included) -> counts."""
+    padded = f" {normalized} "
+    return dict(Multiset(zlib.crc32(padded[i:i + 3].encode()) for i in range(len(padded) - 2)))
+
+
+def _signature(vector: Dict[int, int]) -> List[int]:
+    bins = [-1] * _BINS
+    for h in vector:
+        i, v = h % _BINS, h // _BINS
+        if bins[i] < 0 or v < bins[i]:
+            bins[i] = v
+    # Densify: an empty bin takes the next non-empty bin's value (circularly), tagged with
+    # the distance so that it only matches a bin that was filled the same way.
+    # Callers pass a non-empty vector, so some bin is filled
+    sig = [0] * _BINS
+    nearest = 0
+    for i in range(2 * _BINS - 1, -1, -1):
+        if bins[i % _BINS] >= 0:
+            nearest = i
+        if i < _BINS:
+            sig[i] = bins[nearest % _BINS] * _BINS + (nearest - i)
+    return sig
+
+
+def _band_keys(vector: Dict[int, int]) -> Tuple[Tuple[int, ...], ...]:
+    if not vector:
+        return ()
+    sig = _signature(vector)
+    return tuple((band, *sig[band * _ROWS:(band + 1) * _ROWS]) for band in range(_BANDS))
+
+
+def _norm(vector: Dict[int, int]) -> float:
+    return math.sqrt(sum(c * c for c in vector.values()))
+
+
+def _cosine(a: Dict[int, int], norm_a: float, b: Dict[int, int], norm_b: float) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(c * b.get(h, 0) for h, c in a.items())
+    return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+
+def _slots(features: MessageFeatures) -> Tuple[bool, bool, bool]:
+    """Which values the message parsers found: a time phrase, a count, a transaction id."""
+    return features.time_range_fields is not None, features.limit is not None, features.tx_id is not None
+
+
+def _pinned_word(word: str) -> bool:
+    return word in _CALENDAR_WORDS or word in _MEANING_WORDS
+
+
+def _calendar_word(word: str) -> str:
+    return word[:-1] if word in ("days", "weeks", "months", "years") else word
+
+
+def _pinned(text: str, features: MessageFeatures) -> Tuple[str, ...]:
+    """
+    Calendar, negation, ranking and category words and numbers in the message, minus
+    what the parsers extracted (those are re-extracted from the new message instead).
+    """
+    words = [_calendar_word(w) for w in _WORD.findall(text) if _pinned_word(w)]
+    tr = features.time_range_fields
+    if tr is not None:
+        unit = {"ytd": "year", "this_month": "month", "last_month": "month"}.get(tr.get("preset") or "")
+        unit = unit or _calendar_word(tr.get("unit") or "")
+        if unit in words:
+            words.remove(unit)
+    parsed = {str(v) for v in (features.rel_last, features.limit) if v is not None}
+    if features.tx_id:
+        parsed.add(features.tx_id[1:])
+    numbers = [n for n in _DIGITS.findall(text) if n not in parsed]
+    return tuple(sorted(words + numbers))
+
+
+@dataclass
+class _Entry:
+    spec: QuerySpec                 # the LLM's answer, before post-processing
+    vector: Dict[int, int]
+    norm: float
+    bands: Tuple[Tuple[int, ...], ...]
+    slots: Tuple[bool, bool, bool]
+    keywords: FrozenSet[str]        # the rules' keywords and merchant phrase: equal or no reuse
+    search_term: Optional[str]
+    pinned: Tuple[str, ...]
+    quoted: Tuple[str, ...]         # string params copied from the message ("whole foods", "groceries")
+
+
+class SpecCache:
+    """
+    Reuses the LLM's QuerySpec for messages that are (nearly) the same as an earlier one.
+
+    Messages are compared with numbers masked, as hashed character-trigram vectors: an
+    exact normalized match is a dict hit; otherwise MinHash LSH buckets give a few
+    candidates, and the most similar one is reused if its cosine similarity reaches
+    `min_similarity`. The spec is then re-fitted to the new message: its time range,
+    count and transaction id come from the message parsers, and compile_queryspec runs
+    the usual post-processing rules on it, exactly as on a fresh LLM answer.
+
+    A candidate is rejected when reuse could carry over the wrong values or answer another
+    question: the parsers found different slots, keywords or merchant phrase, the messages
+    differ in calendar, negation, ranking or category words or in unparsed numbers, or a
+    string param the LLM copied from the old message is missing from the new one.
+
+    At most `max_entries` messages are kept, least recently used evicted first.
+    """
+
+    def __init__(self, max_entries: int, min_similarity: float):
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, ...], Set[str]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(self, text: str, features: MessageFeatures) -> Optional[QuerySpec]:
+        """A spec for the lowercased message `text` from a similar earlier one, or None."""
+        key = normalize(text)
+        entry = self._entries.get(key)
+        event = "hit_exact"
+        if entry is None:
+            entry, key = self._nearest(key)
+            event = "hit_similar"
+        if entry is None:
+            SPEC_CACHE_EVENTS.inc("miss")
+            return None
+        if (entry.slots != _slots(features) or entry.keywords != features.keywords
+                or entry.search_term != features.search_term or entry.pinned != _pinned(text, features)
+                or any(q not in text for q in entry.quoted)):
+            SPEC_CACHE_EVENTS.inc("rejected")
+            return None
+        self._entries.move_to_end(key)
+        SPEC_CACHE_EVENTS.inc(event)
+        return _refit(entry, features)
+
+    def store(self, text: str, features: MessageFeatures, spec: QuerySpec) -> None:
+        """Remember the LLM's answer for the lowercased message `text`."""
+        key = normalize(text)
+        self._remove(key)
+        vector = _vector(key)
+        quoted = tuple(
+            v.lower() for k, v in spec.params.items()
+            if k != "transaction_id" and isinstance(v, str) and v and v.lower() in text
+        )
+        entry = _Entry(
+            spec, vector, _norm(vector), _band_keys(vector), _slots(features), features.keywords,
+            features.search_term, _pinned(text, features), quoted,
+        )
+        self._entries[key] = entry
+        for band in entry.bands:
+            self._buckets.setdefault(band, set()).add(key)
+        SPEC_CACHE_EVENTS.inc("stored")
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            SPEC_CACHE_EVENTS.inc("evicted")
+        SPEC_CACHE_STATE.set("entries", len(self._entries))
+
+    def _nearest(self, key: str) -> Tuple[Optional[_Entry], str]:
+        vector = _vector(key)
+        norm = _norm(vector)
+        candidates: Set[str] = set()
+        for band in _band_keys(vector):
+            candidates |= self._buckets.get(band, set())
+        best, best_key, best_score = None, key, self.min_similarity
+        for k in candidates:
+            entry = self._entries[k]
+            score = _cosine(vector, norm, entry.vector, entry.norm)
+            if score >= best_score:
+                best, best_key, best_score = entry, k, score
+        return best, best_key
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry.bands:
+            keys = self._buckets.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[band]
+
+
+def _refit(entry: _Entry, features: MessageFeatures) -> QuerySpec:
+    """The cached spec with the new message's parsed time range, count and transaction id."""
+    spec = entry.spec
+    has_time, has_limit, has_tx = entry.slots
+    time_range = spec.time_range
+    if has_time and time_range is not None:
+        time_range = features.time_range
+    params = dict(spec.params)
+    if has_limit and "limit" in params:
+        params["limit"] = features.limit
+    if has_tx and "transaction_id" in params:
+        params["transaction_id"] = features.tx_id
+    return spec.model_copy(update={"time_range": time_range, "params": params})
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .schemas import Granularity, Transaction
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _next_month(d: date) -> date:
+    return d.replace(year=d.year + 1, month=1, day=1) if d.month == 12 else d.replace(month=d.month + 1, day=1)
+
+
+class DailySpend:
+    """
+    Running totals of an account's posted debits (integer cents), one entry per day.
+
+    prefix[k] is the spend of days first..first+k-1, overall and per category (keys
+    lowercased), so the spend of any day range is prefix[j] - prefix[i]: two lookups,
+    whatever the number of rows. A series of B buckets is B + 1 lookups.
+
+    Instances are not mutated after construction; extended() returns a new one, so
+    readers on other threads never see arrays of different lengths.
+    """
+
+    def __init__(self, first: int, total: List[int], by_category: Dict[str, List[int]]):
+        self.first = first  # day ordinal of the first covered day (prefix[1] - prefix[0])
+        self.total = total
+        self.by_category = by_category
+
+    @property
+    def days(self) -> int:
+        return len(self.total) - 1
+
+    @classmethod
+    def build(cls, rows: Iterable[Transaction]) -> "DailySpend":
+        daily = _daily_cents(rows)
+        if not daily:
+            return cls(0, [0], {})
+        first = min(d for d, _ in daily)
+        return cls(first, [0], {})._with(daily)
+
+    def extended(self, rows: Iterable[Transaction]) -> Optional["DailySpend"]:
+        """
+        A copy with `rows` added, if none of them is dated before the last day already
+        covered (an append); None otherwise (rebuild instead).
+        """
+        daily = _daily_cents(rows)
+        if self.days and daily and min(d for d, _ in daily) < self.first + self.days - 1:
+            return None
+        return self._with(daily)
+
+    def _with(self, daily: List[Tuple[int, Dict[str, int]]]) -> "DailySpend":
+        if not daily:
+            return self
+        first = self.first if self.days else min(d for d, _ in daily)
+        last = max(max(d for d, _ in daily), first + self.days - 1)
+        n = last - first + 1
+        # Per-day deltas, then one cumulative pass per array (carrying the old last value)
+        deltas: Dict[Optional[str], List[int]] = {}
+        for day, cents_by_cat in daily:
+            k = day - first
+            for cat, cents in cents_by_cat.items():
+                for key in (None, cat):
+                    arr = deltas.get(key)
+                    if arr is None:
+                        arr = deltas[key] = [0] * n
+                    arr[k] += cents
+        k0 = min(d for d, _ in daily) - first
+        total = _accumulate(self.total, deltas.get(None), n, k0)
+        by_category = {
+            cat: _accumulate(self.by_category.get(cat, [0] * (self.days + 1)), deltas.get(cat), n, k0)
+            for cat in {*self.by_category, *(c for c in deltas if c is not None)}
+        }
+        return DailySpend(first, total, by_category)
+
+    def _prefix(self, category: Optional[str]) -> Optional[List[int]]:
+        return self.total if category is None else self.by_category.get(category.lower())
+
+    def _at(self, prefix: List[int], day: int) -> int:
+        """Spend of the covered days before `day`."""
+        k = min(max(day - self.first, 0), self.days)
+        return prefix[k]
+
+    def cents_between(self, start: date, end: date, category: Optional[str] = None) -> int:
+        """Posted debit cents dated start <= day < end."""
+        prefix = self._prefix(category)
+        if prefix is None:
+            return 0
+        return self._at(prefix, end.toordinal()) - self._at(prefix, start.toordinal())
+
+    def series(self, start: date, end: date, granularity: Granularity,
+               category: Optional[str] = None) -> List[Tuple[date, int]]:
+        """(bucket start, cents) for each day/ISO week/calendar month of start <= day < end."""
+        edges = bucket_edges(start, end, granularity)
+        prefix = self._prefix(category)
+        if prefix is None:
+            return [(d, 0) for d in edges[:-1]]
+        sums = [self._at(prefix, d.toordinal()) for d in edges]
+        return [(edges[i], sums[i + 1] - sums[i]) for i in range(len(edges) - 1)]
+
+
+def bucket_edges(start: date, end: date, granularity: Granularity) -> List[date]:
+    """start, each day/week (Monday)/month boundary inside the range, end."""
+    if end <= start:
+        return [start, start]
+    edges = [start]
+    if granularity == "day":
+        edge = start + timedelta(days=1)
+        step = timedelta(days=1)
+    elif granularity == "week":
+        edge = start + timedelta(days=7 - start.weekday())
+        step = timedelta(days=7)
+    else:
+        edge = _next_month(_month_start(start))
+        step = None
+    while edge < end:
+        edges.append(edge)
+        edge = edge + step if step is not None else _next_month(edge)
+    edges.append(end)
+    return edges
+
+
+def _daily_cents(rows: Iterable[Transaction]) -> List[Tuple[int, Dict[str, int]]]:
+    by_day: Dict[int, Dict[str, int]] = {}
+    for t in rows:
+        if t.isPostedDebit:
+            cats = by_day.setdefault(t.dateOrdinal, {})
+            cat = t.merchant.category.lower()
+            cats[cat] = cats.get(cat, 0) + round(t.amount * 100)
+    return list(by_day.items())
+
+
+def _accumulate(prefix: List[int], deltas: Optional[List[int]], n: int, k0: int) -> List[int]:
+    """prefix (m + 1 entries) carried out to n + 1 entries, plus running deltas from day k0 on."""
+    out = prefix + [prefix[-1]] * (n + 1 - len(prefix))
+    if deltas is not None:
+        running = 0
+        for k in range(k0, n):
+            running += deltas[k]
+            out[k + 1] += running
+    return out
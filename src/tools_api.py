@@ -1,48 +1,166 @@
 # from __future__ import annotations
 
-from datetime import date
-from fastapi import APIRouter, HTTPException, Query
+from datetime import date, timedelta
+from typing import Optional
 
-from src.schemas import Transaction
-from src.mock_store import find_transaction, get_transactions
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+
+from src.schemas import (
+    GRANULARITY_DAYS,
+    SERIES_MAX_BUCKETS,
+    Granularity,
+    MerchantHistory,
+    SpendingBucket,
+    SpendingSeries,
+    Transaction,
+    TransactionSearch,
+)
+from src.mock_store import (
+    data_version,
+    find_transaction,
+    merchant_history,
+    read_transactions,
+    search_transactions,
+    spending,
+)
+from src.wire import (
+    BINARY_MEDIA_TYPE,
+    Shape,
+    accepts_binary,
+    encode_columns,
+    encode_columns_binary,
+    encode_rows,
+    parse_fields,
+)
 router = APIRouter(prefix="/tool", tags=["tool-api"])   
 
+DATA_VERSION_HEADER = "X-Data-Version"
+
 @router.get("/transactions", response_model=list[Transaction])
 @router.get("/transactions")
 def list_transactions(
     accountId: str = Query(..., description="Bank account id"),
-    start: date = Query(..., description="YYYY-MM-DD inclusive"),
-    end: date = Query(..., description="YYYY-MM-DD inclusive"),
+    start: Optional[date] = Query(None, description="YYYY-MM-DD inclusive; omit with end for the newest `limit` rows"),
+    end: Optional[date] = Query(None, description="YYYY-MM-DD inclusive"),
     includePending: bool = Query(True, description="Include pending transactions"),
     limit: int = Query(500, ge=1, le=5000),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (e.g. amount,merchant.name); postedAt, direction, amount and isPending are always included"),
+    shape: Shape = Query("rows", description="rows: array of objects; columns: one array per field, merchants dictionary-encoded"),
+    accept: Optional[str] = Header(None, description=f"{BINARY_MEDIA_TYPE}: binary columns (see wire.py) instead of JSON"),
 ):
     """
     Sequence:
     1) Validate accountId is non-empty.
-    2) Load all transactions for accountId from JSON via mock_store.get_transactions(accountId).
-    3) Filter to date range (inclusive):
-       - tx.postedAt.date() >= start AND tx.postedAt.date() <= end
-    4) Filter out pending if includePending is False.
-    5) Sort by postedAt.
-    6) Apply limit.
-    7) Return list[Transaction].
+    2) Read from the account's time index via mock_store.read_transactions():
+       - rows are kept newest first (by postedAt), so a date range
+         start <= tx date <= end is a slice (either bound may be omitted;
+         both omitted = the newest rows of the whole history)
+       - pending rows are skipped if includePending is False
+       - reading stops after `limit` rows
+    3) Serialize only the requested `fields`, directly (store rows are already validated):
+       - Accept lists application/vnd.txn-columns: binary columns, `shape` is ignored
+       - otherwise JSON rows (list[Transaction]) or columns (wire.TransactionColumns)
+    4) Return it with the data version the rows came from in X-Data-Version.
     """
     if not accountId:
         raise HTTPException(status_code=400, detail="accountId is required")
-    all_txs = get_transactions(accountId)
-    # Filter by date range
-    filtered_txs = [
-        tx for tx in all_txs
-        if start <= tx.postedAt.date() <= end
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    version, txs = read_transactions(accountId, start, end, include_pending=includePending, limit=limit)
+    # Skip FastAPI's response_model re-validation; rows were validated once by mock_store
+    headers = {DATA_VERSION_HEADER: version, "Vary": "Accept"}
+    if accepts_binary(accept):
+        return Response(content=encode_columns_binary(txs, projection), media_type=BINARY_MEDIA_TYPE, headers=headers)
+    encode = encode_columns if shape == "columns" else encode_rows
+    return Response(content=encode(txs, projection), media_type="application/json", headers=headers)
+
+@router.get("/search", response_model=TransactionSearch)
+def search(
+    accountId: str = Query(..., description="Bank account id"),
+    q: str = Query(..., min_length=1, description="Words to find in merchant name, category, subcategory or description"),
+    start: Optional[date] = Query(None, description="YYYY-MM-DD inclusive; omit for the whole history"),
+    end: Optional[date] = Query(None, description="YYYY-MM-DD inclusive"),
+    includePending: bool = Query(True, description="Include pending transactions"),
+    limit: int = Query(50, ge=1, le=500, description="Rows to return (matched and postedDebitTotal cover all matches)"),
+    merchantOnly: bool = Query(False, description="Match the merchant name only"),
+):
+    """
+    Sequence:
+    1) Validate accountId is non-empty.
+    2) Look the words up in the account's search index (mock_store.search_transactions()):
+       exact words, else prefix / trigram (fuzzy) matches; every word must match (in the
+       merchant name, with merchantOnly). Posting lists are in time order, so the date
+       range is a bisect, not a scan.
+    3) Return the newest `limit` matches plus the count and spend of all of them, with the
+       data version in X-Data-Version.
+    """
+    if not accountId:
+        raise HTTPException(status_code=400, detail="accountId is required")
+    version, rows = search_transactions(
+        accountId, q, start, end, include_pending=includePending, merchant_only=merchantOnly,
+    )
+    result = TransactionSearch.model_construct(
+        query=q,
+        matched=len(rows),
+        postedDebitTotal=sum(round(t.amount * 100) for t in rows if t.isPostedDebit) / 100,
+        transactions=rows[:limit],
+    )
+    # Store rows are already validated (see list_transactions)
+    return Response(content=result.model_dump_json(), media_type="application/json",
+                    headers={DATA_VERSION_HEADER: version})
+
+@router.get("/spending-series", response_model=SpendingSeries)
+def get_spending_series(
+    accountId: str = Query(..., description="Bank account id"),
+    start: date = Query(..., description="YYYY-MM-DD inclusive"),
+    end: date = Query(..., description="YYYY-MM-DD inclusive"),
+    granularity: Granularity = Query("month", description="Bucket size: day, week (Monday-based) or month"),
+    category: Optional[str] = Query(None, description="Only this merchant category (case-insensitive)"),
+):
+    """
+    Sequence:
+    1) Validate accountId, start <= end and the bucket count.
+    2) Read each bucket total from the account's daily prefix sums of posted debits
+       (mock_store.spending()): two lookups per bucket, independent of the row count.
+    3) Return the series with the data version it came from in X-Data-Version.
+    """
+    if not accountId:
+        raise HTTPException(status_code=400, detail="accountId is required")
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    days = (end - start).days + 1
+    if days // GRANULARITY_DAYS[granularity] > SERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"more than {SERIES_MAX_BUCKETS} buckets; use a coarser granularity")
+    version, spend = spending(accountId)
+    end_excl = end + timedelta(days=1)
+    buckets = [
+        SpendingBucket(start=d.isoformat(), total=cents / 100)
+        for d, cents in spend.series(start, end_excl, granularity, category)
     ]
-    # Filter out pending if needed
-    if not includePending:
-        filtered_txs = [tx for tx in filtered_txs if not tx.isPending]
-    # Sort newest first
-    sorted_txs = sorted(filtered_txs, key=lambda tx: tx.postedAt, reverse=True)
-    # Apply limit
-    limited_txs = sorted_txs[:limit]
-    return limited_txs
+    series = SpendingSeries(
+        accountId=accountId,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        granularity=granularity,
+        category=category,
+        total=spend.cents_between(start, end_excl, category) / 100,
+        buckets=buckets,
+    )
+    return Response(content=series.model_dump_json(), media_type="application/json",
+                    headers={DATA_VERSION_HEADER: version})
+
+@router.get("/data-version")
+def get_data_version(accountId: str = Query(..., description="Bank account id")):
+    """
+    Current data version of an account (changes whenever its transactions change).
+    Cheap: no data is loaded. Callers caching transaction rows compare it with the
+    X-Data-Version they were served.
+    """
+    if not accountId:
+        raise HTTPException(status_code=400, detail="accountId is required")
+    return {"accountId": accountId, "version": data_version(accountId)}
 
 @router.get("/transactions/{txId}", response_model=Transaction)
 def get_transaction_by_id(
@@ -54,7 +172,7 @@ def get_transaction_by_id(
     1) Validate accountId and txId are non-empty.
     2) Load transaction via mock_store.find_transaction(accountId, txId).
     3) If not found, raise HTTP 404.
-    4) Return Transaction (Pydantic model or dict).
+    4) Return Transaction (serialized directly, see list_transactions).
     """
 
     if not accountId or not txId:
@@ -62,4 +180,24 @@ def get_transaction_by_id(
     tx = find_transaction(accountId, txId)
     if not tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    return tx
\ No newline at end of file
+    return Response(content=tx.model_dump_json(), media_type="application/json")
+
+@router.get("/transactions/{txId}/merchant-history", response_model=MerchantHistory)
+def get_merchant_history(
+    txId: str,
+    accountId: str = Query(..., description="Bank account id"),
+):
+    """
+    Sequence:
+    1) Validate accountId and txId are non-empty.
+    2) Look the transaction up in the account's merchant index (mock_store.merchant_history()):
+       count, total, mean, min/max, first/last seen and card / rail use of the earlier rows
+       at the same merchant, in the same direction. Running statistics, no scan.
+    3) If not found, raise HTTP 404.
+    """
+    if not accountId or not txId:
+        raise HTTPException(status_code=400, detail="accountId and txId are required")
+    history = merchant_history(accountId, txId)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return Response(content=history.model_dump_json(), media_type="application/json")
@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple, get_args
+
+from pydantic import BaseModel
+
+from src.schemas import TRANSACTIONS_ADAPTER, Merchant, Transaction
+
+# ----------------------------
+# /tool/transactions field projection
+# ----------------------------
+
+# Names accepted by fields= ("merchant" alone means all three merchant.* fields)
+TRANSACTION_FIELDS: Tuple[str, ...] = (
+    "id", "accountId", "postedAt", "direction", "amount",
+    "merchant.name", "merchant.category", "merchant.subcategory",
+    "isPending", "paymentRail", "cardLast4", "signedAmount", "description",
+)
+# Always sent: Transaction derives its cached values (dateIso, amountText, isPostedDebit...) from them
+CORE_FIELDS: Tuple[str, ...] = ("postedAt", "direction", "amount", "isPending")
+
+# Stand-ins for required Transaction fields that were not requested. Rows decoded from a
+# projection must only go to code that reads the requested fields.
+_PLACEHOLDERS: Dict[str, Any] = {"id": "", "accountId": "", "name": "", "category": "", "subcategory": ""}
+
+Shape = Literal["rows", "columns"]
+
+
+def parse_fields(raw: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    "amount,merchant.name" -> the requested fields plus CORE_FIELDS, in TRANSACTION_FIELDS
+    order; None/"" -> None (every field). Raises ValueError on an unknown name.
+    """
+    if not raw:
+        return None
+    wanted = set(CORE_FIELDS)
+    for name in (part.strip() for part in raw.split(",")):
+        if not name:
+            continue
+        if name == "merchant":
+            wanted.update(f for f in TRANSACTION_FIELDS if f.startswith("merchant."))
+        elif name in TRANSACTION_FIELDS:
+            wanted.add(name)
+        else:
+            raise ValueError(f"unknown field: {name}")
+    return tuple(f for f in TRANSACTION_FIELDS if f in wanted)
+
+
+def format_fields(fields: Sequence[str]) -> str:
+    """Inverse of parse_fields, for building the query string."""
+    return ",".join(f for f in TRANSACTION_FIELDS if f in fields)
+
+
+# ----------------------------
+# Row shape (default)
+# ----------------------------
+
+def _row_include(fields: Sequence[str]) -> Dict[str, Any]:
+    include: Dict[str, Any] = {}
+    for f in fields:
+        top, _, sub = f.partition(".")
+        if sub:
+            include.setdefault(top, {})[sub] = True
+        else:
+            include[top] = True
+    return include
+
+
+def encode_rows(txs: List[Transaction], fields: Optional[Sequence[str]] = None) -> bytes:
+    """JSON array of Transaction objects, optionally with only `fields` per object."""
+    if fields is None:
+        return TRANSACTIONS_ADAPTER.dump_json(txs)
+    return TRANSACTIONS_ADAPTER.dump_json(txs, include={"__all__": _row_include(fields)})  # type: ignore[arg-type]
+
+
+# ----------------------------
+# Columnar shape
+# ----------------------------
+
+class MerchantColumns(BaseModel):
+    # Distinct merchants as parallel arrays; only the requested merchant.* fields are present
+    name: Optional[List[str]] = None
+    category: Optional[List[str]] = None
+    subcategory: Optional[List[str]] = None
+
+
+class TransactionColumns(BaseModel):
+    """
+    shape=columns response: one array per requested field, `count` long, row i being
+    the i-th element of each. Merchants are dictionary encoded: merchantIndex[i] points
+    into the merchants table, so a repeated merchant is sent once.
+    """
+
+    count: int
+    fields: List[str]
+    id: Optional[List[str]] = None
+    accountId: Optional[List[str]] = None
+    postedAt: Optional[List[datetime]] = None
+    direction: Optional[List[Literal["debit", "credit"]]] = None
+    amount: Optional[List[float]] = None
+    isPending: Optional[List[bool]] = None
+    paymentRail: Optional[List[Optional[str]]] = None
+    cardLast4: Optional[List[Optional[str]]] = None
+    signedAmount: Optional[List[Optional[float]]] = None
+    description: Optional[List[Optional[str]]] = None
+    merchantIndex: Optional[List[int]] = None
+    merchants: Optional[MerchantColumns] = None
+
+
+def encode_columns(txs: List[Transaction], fields: Optional[Sequence[str]] = None) -> bytes:
+    fields = tuple(fields) if fields is not None else TRANSACTION_FIELDS
+    columns: Dict[str, Any] = {"count": len(txs), "fields": list(fields)}
+    merchant_fields = [f.partition(".")[2] for f in fields if f.startswith("merchant.")]
+    for f in fields:
+        if not f.startswith("merchant."):
+            columns[f] = [getattr(t, f) for t in txs]
+    if merchant_fields:
+        index: Dict[Tuple[str, ...], int] = {}
+        table: List[Tuple[str, ...]] = []
+        refs: List[int] = []
+        for t in txs:
+            key = tuple(getattr(t.merchant, f) for f in merchant_fields)
+            i = index.get(key)
+            if i is None:
+                i = index[key] = len(table)
+                table.append(key)
+            refs.append(i)
+        columns["merchantIndex"] = refs
+        columns["merchants"] = MerchantColumns.model_construct(
+            **{f: [row[k] for row in table] for k, f in enumerate(merchant_fields)}
+        )
+    # Store rows are already validated; skip re-validating them into the response model
+    return TransactionColumns.model_construct(**columns).model_dump_json(exclude_none=True).encode()
+
+
+def decode_columns(body: bytes) -> List[Transaction]:
+    """
+    Columnar response -> Transactions. Every cell is type-checked (by TransactionColumns,
+    then by the Transaction schema), and merchant rows become one shared Merchant each.
+    """
+    cols = TransactionColumns.model_validate_json(body)
+    n = cols.count
+    unknown = [f for f in cols.fields if f not in TRANSACTION_FIELDS]
+    if unknown:
+        raise ValueError(f"columnar response has unknown fields: {unknown}")
+    fields = [f for f in cols.fields if not f.startswith("merchant.")]
+    missing = [f for f in CORE_FIELDS if f not in fields]
+    if missing:
+        raise ValueError(f"columnar response is missing core fields: {missing}")
+
+    arrays: Dict[str, List[Any]] = {}
+    for f in fields:
+        values = getattr(cols, f, None)
+        if values is None or len(values) != n:
+            raise ValueError(f"column {f!r} is missing or not {n} long")
+        arrays[f] = values
+
+    if cols.merchantIndex is not None and cols.merchants is not None:
+        table = cols.merchants
+        size = max((len(v) for v in (table.name, table.category, table.subcategory) if v is not None), default=0)
+        merchants = [
+            Merchant(
+                name=table.name[i] if table.name is not None else _PLACEHOLDERS["name"],
+                category=table.category[i] if table.category is not None else _PLACEHOLDERS["category"],
+                subcategory=table.subcategory[i] if table.subcategory is not None else _PLACEHOLDERS["subcategory"],
+            )
+            for i in range(size)
+        ]
+        refs = cols.merchantIndex
+        if len(refs) != n:
+            raise ValueError(f"column 'merchantIndex' is not {n} long")
+    else:
+        merchants = [Merchant(name="", category="", subcategory="")]
+        refs = [0] * n
+
+    base = {k: v for k, v in _PLACEHOLDERS.items() if k in ("id", "accountId") and k not in arrays}
+    names = list(arrays)
+    rows = [
+        {**base, **dict(zip(names, values)), "merchant": merchants[m]}
+        for values, m in zip(zip(*arrays.values()), refs)
+    ]
+    return TRANSACTIONS_ADAPTER.validate_python(rows)
+
+
+# ----------------------------
+# Binary columnar shape
+# ----------------------------
+# Negotiated with `Accept: application/vnd.txn-columns` (JSON stays the default). Same
+# columns as TransactionColumns, little-endian, fixed width where possible:
+#
+#   header     "TXC1", count u32, field mask u16 (bit i = TRANSACTION_FIELDS[i]), merchants u32
+#   per requested field, in TRANSACTION_FIELDS order (merchant.* last):
+#     postedAt      i64[count] µs since 1970-01-01 (wall clock), i32[count] UTC offset s (_NAIVE: none)
+#     direction     u8[count] (0 debit, 1 credit)
+#     amount        f64[count]
+#     isPending     u8[count]
+#     signedAmount  u8[count] present, f64[count]
+#     strings       u32 distinct, u32[distinct] utf-8 lengths, utf-8 bytes, i32[count] index (-1: None)
+#   merchantIndex i32[count], then each requested merchant.* as a string column merchants long
+#
+# Every cell is fixed by its column type, so the decoder builds Transactions with
+# Transaction.from_typed instead of a validation pass; the few checks left (enum codes,
+# index bounds, sizes) are done per column.
+
+BINARY_MEDIA_TYPE = "application/vnd.txn-columns"
+
+_MAGIC = b"TXC1"
+_HEADER = struct.Struct("<4sIHI")
+_COUNT = struct.Struct("<I")
+_NAIVE = -(2 ** 31)
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_SWAP = sys.byteorder != "little"
+_FLOAT_FIELDS = ("amount",)
+_STRING_FIELDS = ("id", "accountId", "paymentRail", "cardLast4", "description")
+_PAYMENT_RAILS = frozenset(get_args(get_args(Transaction.model_fields["paymentRail"].annotation)[0]))
+
+
+def accepts_binary(accept: Optional[str]) -> bool:
+    """True if an Accept header lists BINARY_MEDIA_TYPE (with a non-zero q)."""
+    for media_range in (accept or "").split(","):
+        media_type, *params = (p.strip() for p in media_range.split(";"))
+        if media_type.lower() == BINARY_MEDIA_TYPE:
+            return not any(p.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000") for p in params)
+    return False
+
+
+def _put(out: bytearray, typecode: str, values: Any) -> None:
+    a = array(typecode, values)
+    if _SWAP:
+        a.byteswap()
+    out += a.tobytes()
+
+
+def _put_strings(out: bytearray, values: Sequence[Optional[str]]) -> None:
+    index: Dict[str, int] = {}
+    refs: List[int] = []
+    for v in values:
+        if v is None:
+            refs.append(-1)
+            continue
+        i = index.get(v)
+        if i is None:
+            i = index[v] = len(index)
+        refs.append(i)
+    encoded = [v.encode() for v in index]
+    out += _COUNT.pack(len(encoded))
+    _put(out, "I", [len(b) for b in encoded])
+    out += b"".join(encoded)
+    _put(out, "i", refs)
+
+
+def encode_columns_binary(txs: List[Transaction], fields: Optional[Sequence[str]] = None) -> bytes:
+    fields = tuple(fields) if fields is not None else TRANSACTION_FIELDS
+    mask = sum(1 << i for i, f in enumerate(TRANSACTION_FIELDS) if f in fields)
+    merchant_fields = [f.partition(".")[2] for f in TRANSACTION_FIELDS if f in fields and f.startswith("merchant.")]
+    table: Dict[Tuple[str, ...], int] = {}
+    refs: List[int] = []
+    if merchant_fields:
+        for t in txs:
+            key = tuple(getattr(t.merchant, f) for f in merchant_fields)
+            refs.append(table.setdefault(key, len(table)))
+
+    out = bytearray(_HEADER.pack(_MAGIC, len(txs), mask, len(table)))
+    for f in TRANSACTION_FIELDS:
+        if f not in fields or f.startswith("merchant."):
+            continue
+        if f == "postedAt":
+            micros, offsets = [], []
+            for t in txs:
+                at = t.postedAt
+                off = at.utcoffset()
+                micros.append((at.replace(tzinfo=None) - _EPOCH) // _MICROSECOND)
+                offsets.append(_NAIVE if off is None else int(off.total_seconds()))
+            _put(out, "q", micros)
+            _put(out, "i", offsets)
+        elif f == "direction":
+            _put(out, "B", [t.direction == "credit" for t in txs])
+        elif f == "isPending":
+            _put(out, "B", [t.isPending for t in txs])
+        elif f == "signedAmount":
+            values = [t.signedAmount for t in txs]
+            _put(out, "B", [v is not None for v in values])
+            _put(out, "d", [0.0 if v is None else v for v in values])
+        elif f in _FLOAT_FIELDS:
+            _put(out, "d", [getattr(t, f) for t in txs])
+        else:
+            _put_strings(out, [getattr(t, f) for t in txs])
+    if merchant_fields:
+        _put(out, "i", refs)
+        for k in range(len(merchant_fields)):
+            _put_strings(out, [key[k] for key in table])
+    return bytes(out)
+
+
+class _Reader:
+    def __init__(self, body: bytes):
+        self.view = memoryview(body)
+        self.pos = 0
+
+    def take(self, typecode: str, n: int) -> List[Any]:
+        a = array(typecode)
+        size = a.itemsize * n
+        if self.pos + size > len(self.view):
+            raise ValueError("binary columnar response is truncated")
+        a.frombytes(self.view[self.pos:self.pos + size])
+        self.pos += size
+        if _SWAP:
+            a.byteswap()
+        return a.tolist()
+
+    def strings(self, n: int, nullable: bool = True) -> List[Optional[str]]:
+        (k,) = self.take("I", 1)
+        lengths = self.take("I", k)
+        values: List[Optional[str]] = []
+        for length in lengths:
+            end = self.pos + length
+            if end > len(self.view):
+                raise ValueError("binary columnar response is truncated")
+            values.append(str(self.view[self.pos:end], "utf-8"))
+            self.pos = end
+        refs = self.take("i", n)
+        if refs and (min(refs) < (-1 if nullable else 0) or max(refs) >= k):
+            raise ValueError("binary columnar response has a string index out of range")
+        values.append(None)  # refs of -1 land here
+        return [values[r] for r in refs]
+
+
+def decode_columns_binary(body: bytes) -> List[Transaction]:
+    """Binary columnar response -> Transactions; raises ValueError on malformed input."""
+    r = _Reader(body)
+    if len(body) < _HEADER.size:
+        raise ValueError("binary columnar response is truncated")
+    magic, n, mask, merchant_count = _HEADER.unpack_from(body)
+    if magic != _MAGIC:
+        raise ValueError("not a binary columnar response")
+    if mask >> len(TRANSACTION_FIELDS):
+        raise ValueError("binary columnar response has unknown fields")
+    r.pos = _HEADER.size
+    fields = [f for i, f in enumerate(TRANSACTION_FIELDS) if mask >> i & 1]
+    missing = [f for f in CORE_FIELDS if f not in fields]
+    if missing:
+        raise ValueError(f"binary columnar response is missing core fields: {missing}")
+
+    columns: Dict[str, List[Any]] = {}
+    for f in fields:
+        if f.startswith("merchant."):
+            continue
+        if f == "postedAt":
+            micros = r.take("q", n)
+            zones: Dict[int, Optional[tzinfo]] = {_NAIVE: None}
+            posted = []
+            for us, off in zip(micros, r.take("i", n)):
+                tz = zones.get(off, _NAIVE)
+                if tz is _NAIVE:
+                    tz = zones[off] = timezone(timedelta(seconds=off))
+                posted.append((_EPOCH + timedelta(microseconds=us)).replace(tzinfo=tz))
+            columns[f] = posted
+        elif f == "direction":
+            codes = r.take("B", n)
+            if codes and max(codes) > 1:
+                raise ValueError("binary columnar response has an unknown direction code")
+            columns[f] = ["credit" if c else "debit" for c in codes]
+        elif f == "isPending":
+            columns[f] = [bool(c) for c in r.take("B", n)]
+        elif f == "signedAmount":
+            present = r.take("B", n)
+            columns[f] = [v if p else None for p, v in zip(present, r.take("d", n))]
+        elif f in _FLOAT_FIELDS:
+            columns[f] = r.take("d", n)
+        else:
+            columns[f] = r.strings(n, nullable=f not in ("id", "accountId"))
+    if not _PAYMENT_RAILS.issuperset(v for v in columns.get("paymentRail", ()) if v is not None):
+        raise ValueError("binary columnar response has an unknown paymentRail")
+
+    merchant_fields = [f.partition(".")[2] for f in fields if f.startswith("merchant.")]
+    if merchant_fields:
+        refs = r.take("i", n)
+        if refs and (min(refs) < 0 or max(refs) >= merchant_count):
+            raise ValueError("binary columnar response has a merchant index out of range")
+        table = {f: r.strings(merchant_count, nullable=False) for f in merchant_fields}
+        merchants = [
+            Merchant.model_construct(**{f: table[f][i] if f in table else _PLACEHOLDERS[f]
+                                        for f in ("name", "category", "subcategory")})
+            for i in range(merchant_count)
+        ]
+    else:
+        merchants = [Merchant.model_construct(name="", category="", subcategory="")]
+        refs = [0] * n
+    if r.pos != len(body):
+        raise ValueError("binary columnar response has trailing bytes")
+
+    # Field order of the model; fields not sent get their placeholder or default
+    for f, info in Transaction.model_fields.items():
+        if f not in columns and f != "merchant":
+            columns[f] = [_PLACEHOLDERS[f] if f in _PLACEHOLDERS else info.default] * n
+    columns["merchant"] = [merchants[m] for m in refs]
+    names = list(Transaction.model_fields)
+    build = Transaction.from_typed
+    return [build(dict(zip(names, values))) for values in zip(*(columns[f] for f in names))]
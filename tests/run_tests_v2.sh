@@ -22,13 +22,16 @@ test_query() {
     local message="$2"
     local expected_intent="$3"
     local expected_pattern="$4"
+    local session_id="$5"  # optional: follow-ups continue the previous answer of this session
+    local session_field=""
+    [ -n "$session_id" ] && session_field=",\"sessionId\":\"$session_id\""
     
     echo "TEST: $test_name"
     echo "Query: \"$message\""
     
     response=$(curl -s -X POST "$ENDPOINT" \
         -H "Content-Type: application/json" \
-        -d "{\"accountId\":\"A123\",\"message\":\"$message\"}")
+        -d "{\"accountId\":\"A123\",\"message\":\"$message\"$session_field}")
     
     if [ -z "$response" ]; then
         echo "❌ FAILED - No response"
@@ -167,6 +170,45 @@ test_query "YTD" "transactions ytd" "top_spending_ytd" "Total spending"
 test_query "Last 7 days" "last 7 days" "transactions_list" ""
 test_query "Recent transactions" "recent transactions" "transactions_list" ""
 
+# 7. LIST FILTERS, NOT MERCHANTS
+echo "=========================================="
+echo "7. LIST FILTERS, NOT MERCHANTS"
+echo "=========================================="
+test_query "Latest N" "show my latest 10 transactions" "transactions_list" ""
+test_query "Debit" "show my debit transactions" "transactions_list" ""
+test_query "Credit card" "list my credit card transactions last month" "transactions_list" ""
+test_query "Large" "show my large transactions" "transactions_list" ""
+test_query "Online" "my online purchases this year" "transactions_list" ""
+test_query "Month name" "show transactions from march" "transactions_list" ""
+test_query "Time of day" "what are my transactions at night" "transactions_list" ""
+test_query "Category noun" "show my grocery transactions" "transactions_list" ""
+test_query "Category noun, time" "show my restaurant transactions last month" "transactions_list" "\*\*last month\*\*"
+test_query "From a place" "show transactions from work" "transactions_list" ""
+test_query "From an account" "payments from savings" "transactions_list" ""
+test_query "Subcategory" "show my rent payments" "transactions_list" ""
+test_query "Merchant" "show my uber charges" "merchant_search" ""
+test_query "Merchant, plural" "show my amazon purchases" "merchant_search" ""
+
+# 8. SPENDING TRENDS
+echo "=========================================="
+echo "8. SPENDING TRENDS"
+echo "=========================================="
+test_query "Trend by month" "how did my spending change by month over the last 2 years?" "spending_trend" "per month"
+test_query "Daily trend, long range" "daily spending over the last 10 years" "spending_trend" "per week"
+
+# 9. FOLLOW-UPS (same sessionId: they page or narrow the previous list)
+echo "=========================================="
+echo "9. FOLLOW-UPS"
+echo "=========================================="
+SESSION="run-tests-$$"
+test_query "Follow-up: list" "show my transactions for the last 2 years" "transactions_list" "showing \*\*50\*\*" "$SESSION"
+test_query "Follow-up: next N" "next 20" "transactions_list" "Showing \*\*51–70\*\*" "$SESSION"
+test_query "Follow-up: more" "show me more" "transactions_list" "" "$SESSION"
+test_query "Follow-up: only pending" "only the pending ones" "transactions_list" "(pending)" "$SESSION"
+test_query "Follow-up: list again" "show my transactions for the last 2 years" "transactions_list" "" "$SESSION"
+test_query "Follow-up: amount" "over \$50" "transactions_list" "(over \$50.00)" "$SESSION"
+test_query "Follow-up: no match" "only zzzcorp" "transactions_list" "Here are your transactions" "$SESSION"
+
 echo "============================================"
 echo "Test Suite Complete"
 echo "============================================"